@@ -1,27 +1,266 @@
-import openai
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
+import copy
 import json
 import os
+import time
+import asyncio
+import hashlib
 from datetime import datetime
 import logging
+import threading
 from dotenv import load_dotenv
+from modules.metrics import LatencyRecorder
+from modules.kb_retriever import KnowledgeRetriever
+from modules.kb_snapshot import Snapshot, SnapshotWriter
+from modules.kb_watcher import SourceWatcher
+from modules.response_cache import ResponseCache
+from modules.llm_backend import LLMBackend, LLMBackendError, STREAM_META_MARKER, create_backend
+from modules.llm_client import LLMClient
+from modules.request_coalescer import RequestCoalescer
+from modules.conversation_memory import ConversationMemory
+from modules.query_router import QueryRouter
+from modules.enrichment import EnrichmentStore
+from modules.cancellation import CancellationRegistry
+from modules.prefetcher import Prefetcher, prefetching
+from modules.suggestion_tables import SuggestionTables
+from modules.model_policy import MODEL_PRICES, ModelPolicy
+from modules.telemetry import Telemetry
+from modules.priority_scheduler import (
+    PRIORITY_CRITICAL, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NAMES, PRIORITY_NORMAL, request_priority
+)
+from modules.context_analyzer import ContextAnalyzer
+from modules.spell_correct import WORD, SpellCorrector
+from modules.slo_guard import SLOGuard
+from sentiment_analyzer import SentimentAnalyzer
+from modules.structured_output import (
+    ANALYSIS_SCHEMA, ANSWER_SCHEMA, COMBINED_SCHEMA, STREAM_META_SCHEMA, SUGGESTIONS_SCHEMA,
+    StructuredOutputError, StructuredOutputParser
+)
+
+PIPELINE_MODES = ('single_call', 'sequential')
+
+# Company config fields the knowledge base, retrieval index and system prompt are built from
+SNAPSHOT_SOURCE_KEYS = ('name', 'products', 'faqs')
+
+# Agent-side steps for multi-step requests; build_suggestion_tables.py reads them too
+SERVICE_WORKFLOWS = {
+    'refund_request': {
+        'steps': [
+            'Verify purchase',
+            'Check refund eligibility',
+            'Process refund',
+            'Send confirmation'
+        ],
+        'required_info': [
+            'Order number',
+            'Purchase date',
+            'Reason for refund'
+        ]
+    },
+    'technical_support': {
+        'steps': [
+            'Identify issue',
+            'Try basic troubleshooting',
+            'Escalate if needed',
+            'Follow up'
+        ],
+        'required_info': [
+            'Product name',
+            'Issue description',
+            'Steps already tried'
+        ]
+    }
+}
+
 
 class AICustomerServiceBot:
-    def __init__(self, company_data: Dict):
+    def __init__(
+        self,
+        company_data: Dict,
+        pipeline_mode: Optional[str] = None,
+        backend: Optional[LLMBackend] = None,
+        llm_client: Optional[LLMClient] = None
+    ):
         load_dotenv()
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        openai.api_key = self.openai_api_key
+        
+        # Model provider (OpenAI by default, local stand-ins for offline load tests)
+        # behind a client that can be shared between bots to enforce global limits
+        if llm_client is None:
+            backend = backend or create_backend(
+                company_data.get('llm_backend'),
+                self.openai_api_key
+            )
+            llm_client = LLMClient(backend, **company_data.get('llm_client', {}))
+        if llm_client.telemetry is None:
+            llm_client.telemetry = Telemetry(prices=MODEL_PRICES, **company_data.get('telemetry', {}))
+        self.llm = llm_client
+        self.telemetry = llm_client.telemetry
+        
+        # Latency SLO: hedge slow calls (optionally on an alternate backend) and
+        # answer from local rules once the deadline passes
+        self.slo = SLOGuard(**company_data.get('slo', {}))
+        self.hedge_llm = LLMClient(
+            create_backend(self.slo.hedge_backend, self.openai_api_key),
+            telemetry=self.telemetry,
+            **company_data.get('llm_client', {})
+        ) if self.slo.hedge_backend else llm_client
+        self.backend = llm_client.backend
+        
+        # Small model for analysis/suggestions, large one for the answer, per tenant
+        self.models = ModelPolicy.from_config(company_data.get('models'))
         
         self.company_data = company_data
         self.conversation_history = {}
+        self.memory = ConversationMemory(**company_data.get('memory', {}))
+        self._summarizing = set()
+        # Model summaries discarded because an extractive fold replaced their base meanwhile
+        self.stale_summaries = 0
+        self._background_tasks = set()
+        # Typo correction for routing and intent detection; one index shared with every matcher
+        self.spelling = SpellCorrector(**company_data.get('spelling', {}))
         self.knowledge_base = self._initialize_knowledge_base()
         
+        # single_call: one structured call returns analysis, answer and suggestions
+        # sequential: separate analysis, answer and suggestion calls
+        self.pipeline_mode = pipeline_mode or company_data.get('pipeline_mode', 'single_call')
+        if self.pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {self.pipeline_mode}")
+        self.latency = LatencyRecorder()
+        
+        # Response cache keyed on normalized query, tenant and KB/config version
+        self.tenant_id = str(company_data.get('tenant_id') or company_data.get('name')
+                             or company_data.get('company_name') or 'default')
+        self.kb_version = self._compute_kb_version()
+        cache_config = company_data.get('cache', {})
+        self.response_cache = ResponseCache(
+            max_entries=cache_config.get('max_entries', 1000),
+            ttl_seconds=cache_config.get('ttl_seconds', 3600),
+            db_path=cache_config.get('path', 'data/response_cache.db'),
+            max_disk_entries=cache_config.get('max_disk_entries', 10000)
+        ) if cache_config.get('enabled', True) else None
+        
+        # Identical concurrent context-free turns share one LLM computation
+        self.coalescer = RequestCoalescer()
+        
+        # Greetings, hours, pricing, contact and exact FAQ matches are answered locally
+        routing_config = dict(company_data.get('routing', {}))
+        self.router = QueryRouter(
+            company_data,
+            self.retriever,
+            spelling=self.spelling,
+            **routing_config
+        ) if routing_config.pop('enabled', True) else None
+        
+        # Suggestions, related and supporting info are computed after the answer is returned
+        self.enrichment_config = {
+            'enabled': True,
+            'max_pending': 50,
+            'skip_queue_depth': 10,
+            **company_data.get('enrichment', {})
+        }
+        # Work started for a client is cancelled when it disconnects
+        self.cancellation = CancellationRegistry()
+        self.enrichment = EnrichmentStore(
+            max_entries=self.enrichment_config.get('max_entries', 1000),
+            ttl_seconds=self.enrichment_config.get('ttl_seconds', 300),
+            cancellation=self.cancellation
+        )
+        
+        # Follow-up suggestions per topic, precomputed by build_suggestion_tables.py
+        self.suggestion_tables = SuggestionTables(**company_data.get('suggestions', {}))
+        
+        # Answers and retrieval for the likeliest next questions are warmed after each reply
+        self.prefetcher = Prefetcher(**company_data.get('prefetch', {}))
+        
+        # Urgency and sentiment signals decide which model calls go first under load
+        self.sentiment_analyzer = SentimentAnalyzer()
+        self.context_analyzer = ContextAnalyzer(spelling=self.spelling)
+        
+        # Tolerant parsing of model JSON; one repair call only for irrecoverable output
+        self.output_parser = StructuredOutputParser()
+        self.repair_outputs = company_data.get('structured_output', {}).get('repair', True)
+        
         # Set up logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
+        
+        # Pick up edits to the company config file without a restart
+        self._reload_lock = threading.Lock()
+        self.kb_reloads = 0
+        reload_config = company_data.get('hot_reload', {})
+        self.kb_watcher = SourceWatcher(
+            [reload_config['path']],
+            self._reload_from_files,
+            reload_config.get('interval_seconds', 2.0)
+        ) if reload_config.get('enabled') and reload_config.get('path') else None
+        if self.kb_watcher:
+            self.kb_watcher.start()
 
     def _initialize_knowledge_base(self) -> Dict:
         """Initialize knowledge base with company information"""
+        # Index sections once so prompts only carry the relevant ones
+        retrieval = self.company_data.get('retrieval', {})
+        self.retriever = KnowledgeRetriever(
+            top_k=retrieval.get('top_k', 3),
+            max_tokens=retrieval.get('max_tokens', 800)
+        )
+        self.prompt_fragments = {}
+        
+        # A snapshot compiled from this same config skips formatting and indexing
+        snapshot = self._open_snapshot()
+        if snapshot is not None:
+            self.retriever.load(snapshot.json('bot/retriever'))
+            self.prompt_fragments = snapshot.json('bot/prompts')
+            knowledge_base = snapshot.json('bot/knowledge_base')
+        else:
+            knowledge_base = self._build_knowledge_base()
+            self.retriever.index(knowledge_base)
+        self._add_vocabulary(knowledge_base)
+        return knowledge_base
+
+    def _add_vocabulary(self, knowledge_base: Dict):
+        """Teach the spelling corrector the words customers may misspell; a reload replaces them"""
+        self.spelling.set_words('knowledge_base', WORD.findall(json.dumps(knowledge_base).lower()))
+        self.spelling.set_words('products', (
+            word for product in self.company_data.get('products', [])
+            for word in WORD.findall(product.get('name', '').lower())
+        ), weight=5)
+
+    def _open_snapshot(self) -> Optional[Snapshot]:
+        """The configured snapshot, if it exists and was compiled from the current company data"""
+        path = self.company_data.get('snapshot', {}).get('path')
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            snapshot = Snapshot(path)
+        except ValueError as e:
+            logging.getLogger(__name__).warning(f"Ignoring snapshot {path}: {str(e)}")
+            return None
+        if 'bot/source' not in snapshot or snapshot.json('bot/source') != self._snapshot_source():
+            logging.getLogger(__name__).warning(
+                f"Snapshot {path} was compiled from different content, building the knowledge base; "
+                f"rerun build_kb_snapshot.py"
+            )
+            return None
+        return snapshot
+
+    def _snapshot_source(self) -> str:
+        """Hash of the company content a snapshot was compiled from"""
+        # Only what the compiled blocks are built from; cache, SLO or model settings don't invalidate it
+        payload = json.dumps({key: self.company_data.get(key) for key in SNAPSHOT_SOURCE_KEYS},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def add_to_snapshot(self, writer: SnapshotWriter):
+        """Add the formatted knowledge base, retrieval index and prompts to a snapshot being compiled"""
+        writer.add_json('bot/source', self._snapshot_source())
+        writer.add_json('bot/knowledge_base', self.knowledge_base)
+        writer.add_json('bot/retriever', self.retriever.export())
+        writer.add_json('bot/prompts', {'system': self._get_system_prompt()})
+
+    def _build_knowledge_base(self) -> Dict:
+        """Knowledge base sections from the current company data"""
         return {
             "products": self._format_product_knowledge(),
             "policies": self._format_policy_knowledge(),
@@ -30,6 +269,61 @@ class AICustomerServiceBot:
             "workflows": self._load_service_workflows()
         }
 
+    def reload_knowledge_base(self, company_data: Optional[Dict] = None) -> Dict:
+        """Apply changed company content without a restart.
+
+        Only the sections that changed are reindexed, and each piece of state
+        is swapped as one reference, so requests in flight keep a consistent
+        view. Settings read at startup (models, cache, limits) still need a
+        restart.
+        """
+        with self._reload_lock:
+            if company_data is not None:
+                self.company_data = company_data
+            knowledge_base = self._build_knowledge_base()
+            changes = self.retriever.update(knowledge_base)
+            self._add_vocabulary(knowledge_base)
+            self.prompt_fragments = {}
+            self.knowledge_base = knowledge_base
+            previous = self.kb_version
+            # New cache keys from here on; entries under the old version simply age out
+            self.kb_version = self._compute_kb_version()
+            if self.kb_version != previous:
+                self.prefetcher.invalidate()
+                self.kb_reloads += 1
+            self.logger.info(f"Knowledge base {previous} -> {self.kb_version}: {changes or 'no changes'}")
+            return {'previous_version': previous, 'version': self.kb_version, 'changes': changes}
+
+    def _reload_from_files(self, paths: List[str]):
+        """SourceWatcher callback: re-read the company config file"""
+        with open(paths[0], 'r') as f:
+            company_data = json.load(f)
+        self.reload_knowledge_base(company_data)
+
+    def close(self):
+        """Stop the knowledge base watcher"""
+        if self.kb_watcher:
+            self.kb_watcher.stop()
+
+    def _compute_kb_version(self) -> str:
+        """Hash the knowledge base and prompt config so cache entries follow content changes"""
+        payload = json.dumps({
+            'knowledge_base': self.knowledge_base,
+            'system_prompt': self._get_system_prompt(),
+            'pipeline_mode': self.pipeline_mode,
+            'models': self.models.to_dict()
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def _get_relevant_knowledge(self, user_input: str) -> str:
+        """Get the top-k knowledge base sections for the prompt"""
+        sections = self.prefetcher.get_retrieval(user_input)
+        if sections is None:
+            sections = self.retriever.retrieve(user_input)
+        if not sections:
+            return "No matching knowledge base entries."
+        return json.dumps(sections)
+
     def _format_product_knowledge(self) -> Dict:
         """Format product information for AI context"""
         products = {}
@@ -115,50 +409,41 @@ class AICustomerServiceBot:
 
     def _load_service_workflows(self) -> Dict:
         """Load customer service workflows"""
-        return {
-            'refund_request': {
-                'steps': [
-                    'Verify purchase',
-                    'Check refund eligibility',
-                    'Process refund',
-                    'Send confirmation'
-                ],
-                'required_info': [
-                    'Order number',
-                    'Purchase date',
-                    'Reason for refund'
-                ]
-            },
-            'technical_support': {
-                'steps': [
-                    'Identify issue',
-                    'Try basic troubleshooting',
-                    'Escalate if needed',
-                    'Follow up'
-                ],
-                'required_info': [
-                    'Product name',
-                    'Issue description',
-                    'Steps already tried'
-                ]
-            }
-        }
+        return copy.deepcopy(SERVICE_WORKFLOWS)
 
     async def generate_response(self, user_input: str, user_id: str) -> Dict:
         """Generate AI-enhanced response"""
+        start = time.perf_counter()
+        latency_key = self.pipeline_mode
         try:
             # Get conversation context
             context = self._get_conversation_context(user_id)
             
-            # Analyze input
-            analysis = await self._analyze_input(user_input)
+            # Context-free turns can be answered from the shared cache and
+            # coalesced with identical in-flight requests
+            shared_key = None
+            if not context['messages']:
+                shared_key = ResponseCache.make_key(user_input, self.tenant_id, self.kb_version)
+                cached = await self.response_cache.get(shared_key) if self.response_cache else None
+                if cached is not None:
+                    latency_key = 'cache_hit'
+                    self._update_context(user_id, user_input, cached)
+                    return cached
             
-            # Generate response using AI
-            response_data = await self._generate_ai_response(
-                user_input,
-                analysis,
-                context
-            )
+            if shared_key:
+                response_data = await self.coalescer.run(
+                    shared_key,
+                    lambda: self._generate_shared_response(user_input, context, shared_key)
+                )
+            else:
+                # The question may have been predicted and answered already
+                response_data = await self.prefetcher.take_answer(
+                    user_id, user_input, context.get('turn_count', 0)
+                )
+                if response_data is not None:
+                    latency_key = 'prefetch_hit'
+                else:
+                    response_data = await self._run_pipeline(user_input, context)
             
             # Update conversation context
             self._update_context(user_id, user_input, response_data)
@@ -171,6 +456,197 @@ class AICustomerServiceBot:
                 'response': "I apologize, but I encountered an error. Please try again.",
                 'error': str(e)
             }
+        finally:
+            self.latency.record(latency_key, time.perf_counter() - start)
+
+    async def _run_pipeline(self, user_input: str, context: Dict) -> Dict:
+        """Produce a response with the configured pipeline mode"""
+        if self.pipeline_mode == 'single_call':
+            # Analysis, answer and suggestions in one round trip
+            return await self._generate_combined_response(
+                user_input,
+                context
+            )
+        
+        # Analyze input
+        analysis = await self._analyze_input(user_input)
+        
+        # Generate response using AI
+        return await self._generate_ai_response(
+            user_input,
+            analysis,
+            context
+        )
+
+    async def _generate_shared_response(self, user_input: str, context: Dict, key: str) -> Dict:
+        """Compute a context-free response once and store it for later requests"""
+        response_data = await self._run_pipeline(user_input, context)
+        if self.response_cache and not response_data.get('error') and not response_data.get('fallback'):
+            await self.response_cache.set(key, response_data)
+        return response_data
+
+    async def _complete(
+        self,
+        stage: str,
+        system_prompt: str,
+        prompt: str,
+        model: Optional[str] = None
+    ) -> str:
+        """Send one chat completion through the shared LLM client, hedged per the SLO"""
+        model = model or self.models.model_for(stage)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        start = time.perf_counter()
+        try:
+            result = await self.slo.call(
+                stage,
+                lambda: self.llm.complete(model, messages, stage=stage, tenant=self.tenant_id),
+                lambda: self.hedge_llm.complete(
+                    self.slo.hedge_model or model, messages, stage=stage, tenant=self.tenant_id
+                )
+            )
+        finally:
+            self.latency.record(f"stage_{stage}", time.perf_counter() - start)
+        return result.content
+
+    async def _parse_model_output(self, stage: str, content: str, schema: Dict):
+        """Parse a model reply for a stage, repairing it with one call if it can't be recovered"""
+        start = time.perf_counter()
+        try:
+            parsed = self.output_parser.parse(stage, content, schema)
+            self.telemetry.record_parse(stage, time.perf_counter() - start)
+            return parsed
+        except StructuredOutputError as e:
+            self.telemetry.record_parse(stage, time.perf_counter() - start, ok=False)
+            if not self.repair_outputs:
+                raise
+            error = str(e)
+        
+        self.logger.warning(f"Unusable {stage} output ({error}), requesting a repair")
+        repaired = await self._complete(
+            'repair',
+            "You fix malformed JSON. Return only valid JSON.",
+            self.output_parser.repair_prompt(stage, content, schema, error)
+        )
+        try:
+            parsed = self.output_parser.parse(stage, repaired, schema, record=False)
+        except StructuredOutputError:
+            self.output_parser.record_repair(stage, ok=False)
+            raise
+        self.output_parser.record_repair(stage, ok=True)
+        return parsed
+
+    def _fallback_response(self, user_input: str) -> Dict:
+        """Rule-based answer used when the model is unavailable or overloaded"""
+        faqs = [
+            data for name, data in self.retriever.retrieve(user_input).items()
+            if name.startswith('faqs/') and data.get('answer')
+        ]
+        if faqs:
+            return {
+                'response': faqs[0]['answer'],
+                'status': 'resolved',
+                'confidence': 0.9,
+                'suggestions': [faq['question'] for faq in faqs[1:]] or ["Is there anything else I can help you with?"],
+                'fallback': True
+            }
+        
+        contact = self.company_data.get('support_email', 'our support team')
+        return {
+            'response': ("I'm having trouble looking that up right now. "
+                         f"Please try again in a moment or contact {contact}."),
+            'status': 'escalated',
+            'confidence': 0.5,
+            'suggestions': ["Try again in a moment", f"Contact {contact}"],
+            'fallback': True
+        }
+
+    def get_latency_report(self) -> Dict:
+        """Get p50/p95 latency per pipeline mode"""
+        return self.latency.report()
+
+    def get_metrics(self) -> Dict:
+        """Collect runtime metrics from the bot's components"""
+        return {
+            'latency': self.get_latency_report(),
+            'cache': self.response_cache.get_stats() if self.response_cache else None,
+            'llm_client': self.llm.get_stats(),
+            'coalescing': self._get_coalescing_stats(),
+            'routing': self.router.get_stats() if self.router else None,
+            'enrichment': self.enrichment.get_stats(),
+            'telemetry': self.telemetry.get_stats(),
+            'structured_output': self.output_parser.get_stats(),
+            'slo': self.slo.get_stats(),
+            'cancellation': self._get_cancellation_stats(),
+            'prefetch': self.prefetcher.get_stats(),
+            'suggestion_tables': self.suggestion_tables.get_stats(),
+            'spelling': self.spelling.get_stats(),
+            'memory': {
+                'summarizing': len(self._summarizing),
+                'stale_summaries': self.stale_summaries
+            },
+            'knowledge_base': {
+                'version': self.kb_version,
+                'sections': len(self.retriever.sections),
+                'reloads': self.kb_reloads,
+                'watcher': self.kb_watcher.get_stats() if self.kb_watcher else None
+            }
+        }
+
+    def _get_cancellation_stats(self) -> Dict:
+        """Work cancelled for departed clients plus the model calls and tokens it saved"""
+        stats = self.cancellation.get_stats()
+        llm_stats = self.llm.stats
+        stats['llm_calls_cancelled'] = llm_stats['cancelled']
+        stats['tokens_saved'] = llm_stats['tokens_saved']
+        return stats
+
+    def cancel_requests(self, owner: str) -> int:
+        """Cancel in-flight responses and background work started for a client"""
+        cancelled = self.cancellation.cancel(owner)
+        if cancelled:
+            self.logger.info(f"Cancelled {cancelled} task(s) for {owner}")
+        return cancelled
+
+    def _get_coalescing_stats(self) -> Dict:
+        """Coalescer counters plus the model calls they saved"""
+        stats = self.coalescer.get_stats()
+        calls_per_turn = 1 if self.pipeline_mode == 'single_call' else 2
+        stats['llm_calls_saved'] = stats['coalesced'] * calls_per_turn
+        return stats
+
+    async def _generate_combined_response(self, user_input: str, context: Dict) -> Dict:
+        """Generate analysis, response and suggestions with a single AI call"""
+        try:
+            prompt = self._create_combined_prompt(user_input, context)
+            
+            content = await self._complete(
+                'combined',
+                self._get_system_prompt(),
+                prompt
+            )
+            
+            response_data = await self._parse_model_output('combined', content, COMBINED_SCHEMA)
+            
+            # Analysis is only used to shape the answer, keep the payload
+            # identical to the sequential pipeline
+            response_data.pop('analysis', None)
+            return response_data
+            
+        except LLMBackendError as e:
+            self.logger.warning(f"LLM unavailable, using fallback answer: {str(e)}")
+            return self._fallback_response(user_input)
+        except StructuredOutputError as e:
+            self.logger.warning(f"Unusable model output, using fallback answer: {str(e)}")
+            return self._fallback_response(user_input)
+        except Exception as e:
+            self.logger.error(f"Error generating combined response: {str(e)}")
+            return {
+                'response': "I apologize, but I encountered an error. Please try again.",
+                'error': str(e)
+            }
 
     async def _analyze_input(self, user_input: str) -> Dict:
         """Analyze user input using AI"""
@@ -190,16 +666,14 @@ class AICustomerServiceBot:
             """
             
             # Get AI analysis
-            response = await openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a customer service analysis expert."},
-                    {"role": "user", "content": prompt}
-                ]
+            content = await self._complete(
+                'analysis',
+                "You are a customer service analysis expert.",
+                prompt
             )
             
             # Parse and return analysis
-            return json.loads(response.choices[0].message.content)
+            return await self._parse_model_output('analysis', content, ANALYSIS_SCHEMA)
             
         except Exception as e:
             self.logger.error(f"Error analyzing input: {str(e)}")
@@ -221,26 +695,21 @@ class AICustomerServiceBot:
             )
             
             # Get AI response
-            response = await openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            # Parse response
-            response_data = json.loads(response.choices[0].message.content)
-            
-            # Add follow-up suggestions
-            response_data['suggestions'] = await self._generate_followup_suggestions(
-                user_input,
-                response_data,
-                analysis
+            content = await self._complete(
+                'answer',
+                self._get_system_prompt(),
+                prompt
             )
             
-            return response_data
+            # Parse response; follow-up suggestions are added by background enrichment
+            return await self._parse_model_output('answer', content, ANSWER_SCHEMA)
             
+        except LLMBackendError as e:
+            self.logger.warning(f"LLM unavailable, using fallback answer: {str(e)}")
+            return self._fallback_response(user_input)
+        except StructuredOutputError as e:
+            self.logger.warning(f"Unusable model output, using fallback answer: {str(e)}")
+            return self._fallback_response(user_input)
         except Exception as e:
             self.logger.error(f"Error generating AI response: {str(e)}")
             return {
@@ -248,6 +717,136 @@ class AICustomerServiceBot:
                 'error': str(e)
             }
 
+    async def stream_response(self, user_input: str, user_id: str) -> AsyncIterator[Dict]:
+        """Stream reply tokens as they arrive, then a final frame with the structured fields"""
+        start = time.perf_counter()
+        latency_key = 'stream'
+        trace = self.telemetry.start_trace('stream', user_id)
+        try:
+            context = self._get_conversation_context(user_id)
+            
+            routed = self._route_locally(user_input, user_id)
+            if routed is not None:
+                latency_key = f"stream_{routed['routed']}"
+                yield {'type': 'token', 'content': routed['response']}
+                yield {'type': 'final', 'data': routed}
+                return
+            
+            cache_key = None
+            response_data = None
+            if self.response_cache and not context['messages']:
+                cache_key = self.response_cache.make_key(user_input, self.tenant_id, self.kb_version)
+                response_data = await self.response_cache.get(cache_key)
+                if response_data is not None:
+                    latency_key = 'cache_hit'
+                    yield {'type': 'token', 'content': response_data.get('response', '')}
+            elif context['messages']:
+                response_data = await self.prefetcher.take_answer(
+                    user_id, user_input, context.get('turn_count', 0)
+                )
+                if response_data is not None:
+                    latency_key = 'prefetch_hit'
+                    yield {'type': 'token', 'content': response_data.get('response', '')}
+            
+            if response_data is None:
+                try:
+                    priority = self._request_priority(user_input, user_id)
+                    async for frame in self._stream_model_reply(user_input, context, start, priority):
+                        if frame['type'] == 'token':
+                            yield frame
+                            # Each step may run in a fresh context (e.g. driven from a web thread)
+                            self.telemetry.resume_trace(trace)
+                        else:
+                            response_data = frame['data']
+                except LLMBackendError as e:
+                    self.logger.warning(f"LLM unavailable, using fallback answer: {str(e)}")
+                    response_data = self._fallback_response(user_input)
+                    yield {'type': 'token', 'content': response_data['response']}
+                
+                if cache_key and not response_data.get('fallback'):
+                    await self.response_cache.set(cache_key, response_data)
+            
+            self._update_context(user_id, user_input, response_data)
+            response_data = await self._finalize_response(user_input, response_data, user_id)
+            self._schedule_prefetch(user_id, response_data.get('topic'), response_data.get('suggestions'))
+            yield {'type': 'final', 'data': response_data}
+            
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {str(e)}")
+            yield {
+                'type': 'final',
+                'data': {
+                    'response': "I apologize, but I encountered an error. Please try again.",
+                    'error': str(e)
+                }
+            }
+        finally:
+            self.latency.record(latency_key, time.perf_counter() - start)
+            self.telemetry.finish_trace(trace, tier=latency_key)
+
+    async def _stream_model_reply(
+        self,
+        user_input: str,
+        context: Dict,
+        start: float,
+        priority: int = PRIORITY_NORMAL
+    ) -> AsyncIterator[Dict]:
+        """Yield token frames from the model, then a 'reply' frame with the parsed response"""
+        stream = self.llm.stream(
+            self.models.model_for('stream'),
+            [
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": self._create_streaming_prompt(user_input, context)}
+            ],
+            stage='stream',
+            tenant=self.tenant_id,
+            priority=priority
+        )
+        
+        raw_parts = []
+        pending = ''
+        answer_done = False
+        first_token = True
+        async for delta in stream:
+            raw_parts.append(delta)
+            if answer_done:
+                continue
+            
+            pending += delta
+            marker_at = pending.find(STREAM_META_MARKER)
+            if marker_at >= 0:
+                answer_done = True
+                text, pending = pending[:marker_at], ''
+            else:
+                # Hold back anything that could be the start of the marker
+                safe = len(pending) - (len(STREAM_META_MARKER) - 1)
+                if safe <= 0:
+                    continue
+                text, pending = pending[:safe], pending[safe:]
+            
+            if text:
+                if first_token:
+                    self.latency.record('stream_first_token', time.perf_counter() - start)
+                    self.telemetry.record_span('first_token', time.perf_counter() - start)
+                    first_token = False
+                yield {'type': 'token', 'content': text}
+        
+        if pending:
+            yield {'type': 'token', 'content': pending}
+        
+        answer, _, meta_text = ''.join(raw_parts).partition(STREAM_META_MARKER)
+        # The reply was already streamed, so no repair call for the trailing fields
+        parse_start = time.perf_counter()
+        try:
+            meta = self.output_parser.parse('stream', meta_text or '{}', STREAM_META_SCHEMA)
+            self.telemetry.record_parse('stream', time.perf_counter() - parse_start)
+        except StructuredOutputError:
+            self.telemetry.record_parse('stream', time.perf_counter() - parse_start, ok=False)
+            self.logger.error("Could not parse streamed response fields")
+            meta = {}
+        response_data = {**meta, 'response': answer.strip()}
+        yield {'type': 'reply', 'data': response_data}
+
     def _create_response_prompt(
         self,
         user_input: str,
@@ -262,10 +861,10 @@ class AICustomerServiceBot:
         {json.dumps(analysis, indent=2)}
         
         Conversation Context:
-        {json.dumps(context, indent=2)}
+        {json.dumps(self.memory.render(context), indent=2)}
         
-        Company Knowledge Base:
-        {json.dumps(self.knowledge_base, indent=2)}
+        Relevant Knowledge Base Sections:
+        {self._get_relevant_knowledge(user_input)}
         
         Generate a response that:
         1. Addresses the user's primary intent
@@ -282,8 +881,70 @@ class AICustomerServiceBot:
         - Confidence level
         """
 
+    def _create_combined_prompt(self, user_input: str, context: Dict) -> str:
+        """Create prompt that asks for analysis, response and suggestions at once"""
+        return f"""
+        User Input: "{user_input}"
+        
+        Conversation Context:
+        {json.dumps(self.memory.render(context), indent=2)}
+        
+        Relevant Knowledge Base Sections:
+        {self._get_relevant_knowledge(user_input)}
+        
+        First analyze the inquiry (primary intent, secondary intents, sentiment,
+        urgency level, required information, suggested actions), then generate
+        a response that:
+        1. Addresses the user's primary intent
+        2. Is professional and helpful
+        3. Includes relevant information from the knowledge base
+        4. Provides next steps or suggestions
+        5. Maintains conversation context
+        
+        Return a single JSON object with the keys:
+        - "analysis": the analysis above
+        - "response": main response text
+        - "related_info": related information
+        - "required_actions": list of required actions
+        - "topic": short topic name
+        - "status": resolved/pending/escalated
+        - "confidence": confidence level between 0 and 1
+        - "suggestions": 3 follow-up suggestions as a list of strings
+        """
+
+    def _create_streaming_prompt(self, user_input: str, context: Dict) -> str:
+        """Create prompt whose reply text can be streamed before the structured fields"""
+        return f"""
+        User Input: "{user_input}"
+        
+        Conversation Context:
+        {json.dumps(self.memory.render(context), indent=2)}
+        
+        Relevant Knowledge Base Sections:
+        {self._get_relevant_knowledge(user_input)}
+        
+        Generate a response that:
+        1. Addresses the user's primary intent
+        2. Is professional and helpful
+        3. Includes relevant information from the knowledge base
+        4. Provides next steps or suggestions
+        5. Maintains conversation context
+        
+        Write the customer-facing reply as plain text first. Then, on a new
+        line, write {STREAM_META_MARKER} followed by a single JSON object with
+        the keys:
+        - "related_info": related information
+        - "required_actions": list of required actions
+        - "topic": short topic name
+        - "status": resolved/pending/escalated
+        - "confidence": confidence level between 0 and 1
+        - "suggestions": 3 follow-up suggestions as a list of strings
+        """
+
     def _get_system_prompt(self) -> str:
         """Get system prompt for AI"""
+        if 'system' in self.prompt_fragments:
+            return self.prompt_fragments['system']
         return f"""
         You are an advanced customer service AI assistant for {self.company_data.get('name', 'our company')}.
         
@@ -308,6 +969,9 @@ class AICustomerServiceBot:
         analysis: Dict
     ) -> List[str]:
         """Generate relevant follow-up suggestions"""
+        table = self.suggestion_tables.lookup(analysis.get('intent') or response.get('topic'))
+        if table:
+            return table
         try:
             prompt = f"""
             Based on:
@@ -324,15 +988,13 @@ class AICustomerServiceBot:
             """
             
             # Get AI suggestions
-            response = await openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a customer service expert."},
-                    {"role": "user", "content": prompt}
-                ]
+            content = await self._complete(
+                'suggestions',
+                "You are a customer service expert.",
+                prompt
             )
             
-            return json.loads(response.choices[0].message.content)
+            return await self._parse_model_output('suggestions', content, SUGGESTIONS_SCHEMA)
             
         except Exception as e:
             self.logger.error(f"Error generating suggestions: {str(e)}")
@@ -347,6 +1009,7 @@ class AICustomerServiceBot:
                 'pending_actions': [],
                 'satisfaction_level': None
             }
+            self.memory.init_context(self.conversation_history[user_id])
         return self.conversation_history[user_id]
 
     def _update_context(
@@ -357,25 +1020,65 @@ class AICustomerServiceBot:
     ):
         """Update conversation context"""
         context = self.conversation_history[user_id]
+        context['turn_count'] = context.get('turn_count', 0) + 1
         
-        # Add message to history
-        context['messages'].append({
-            'user_input': user_input,
-            'response': response_data,
-            'timestamp': datetime.now().isoformat()
-        })
+        # Add message to history; turns over the token budget wait for summarization
+        if self.memory.add_turn(context, user_input, response_data):
+            self._schedule_summary(user_id)
         
         # Update topic if changed
         if response_data.get('topic'):
+            self.prefetcher.observe(context['current_topic'], response_data['topic'])
             context['current_topic'] = response_data['topic']
         
         # Update pending actions
         if response_data.get('required_actions'):
             context['pending_actions'].extend(response_data['required_actions'])
+            context['pending_actions'] = context['pending_actions'][-10:]
+
+    def _schedule_summary(self, user_id: str):
+        """Fold evicted turns into the running summary off the request path"""
+        if user_id in self._summarizing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to run on, fold extractively right away
+            context = self.conversation_history[user_id]
+            turns = list(context['pending_summary'])
+            self.memory.apply_summary(context, self.memory.extractive_summary(context['summary'], turns))
+            self.memory.remove_folded(context, turns)
+            return
         
-        # Limit history size
-        if len(context['messages']) > 10:
-            context['messages'] = context['messages'][-10:]
+        self._summarizing.add(user_id)
+        task = loop.create_task(self._summarize_context(user_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _summarize_context(self, user_id: str):
+        """Summarize pending turns for a user until none are left"""
+        request_priority.set(PRIORITY_LOW)
+        try:
+            context = self.conversation_history.get(user_id)
+            while context and context['pending_summary']:
+                turns = list(context['pending_summary'])
+                base, version = context['summary'], context.get('summary_version', 0)
+                try:
+                    summary = await self._complete(
+                        'summary',
+                        "You summarize customer service conversations.",
+                        self.memory.summary_prompt(base, turns)
+                    )
+                except LLMBackendError as e:
+                    self.logger.warning(f"Summarization failed, using extractive summary: {str(e)}")
+                    summary = self.memory.extractive_summary(base, turns)
+                # add_turn may have folded these turns extractively meanwhile; keep that fold
+                if self.memory.apply_summary(context, summary, version):
+                    self.memory.remove_folded(context, turns)
+                else:
+                    self.stale_summaries += 1
+        finally:
+            self._summarizing.discard(user_id)
 
     async def handle_complex_query(
         self,
@@ -384,30 +1087,231 @@ class AICustomerServiceBot:
         additional_context: Optional[Dict] = None
     ) -> Dict:
         """Handle complex customer service scenarios"""
+        start = time.perf_counter()
+        tier = 'llm'
+        response_data = {}
+        trace = self.telemetry.start_trace('chat', user_id)
+        priority = PRIORITY_NORMAL
+        priority_token = None
         try:
-            # Get base response
-            response_data = await self.generate_response(query, user_id)
+            # Answer locally when the router is confident enough
+            routed = self._route_locally(query, user_id)
+            if routed is not None:
+                tier = routed['routed']
+                response_data = routed
+                return routed
             
-            # Check if escalation is needed
-            if self._needs_escalation(response_data):
-                return await self._handle_escalation(query, response_data, user_id)
+            # Model calls made for this request queue by its priority
+            priority = self._request_priority(query, user_id)
+            priority_token = request_priority.set(priority)
             
-            # Check if workflow is needed
-            if self._needs_workflow(response_data):
-                return await self._handle_workflow(query, response_data, user_id)
-            
-            # Add enhancement's if needed
-            if self._needs_enhancement(response_data):
-                response_data = await self._enhance_response(response_data, query, user_id)
+            # Get base response, within the tenant's latency SLO
+            work = asyncio.ensure_future(self._answer_with_model(query, user_id))
+            try:
+                await asyncio.wait({work}, timeout=self.slo.deadline if self.slo.enabled else None)
+            except asyncio.CancelledError:
+                work.cancel()
+                raise
             
+            self.slo.record_request(degraded=not work.done())
+            if work.done():
+                response_data = work.result()
+            else:
+                tier = 'degraded'
+                response_data = self._degraded_response(query, work)
             return response_data
             
         except Exception as e:
             self.logger.error(f"Error handling complex query: {str(e)}")
-            return {
+            response_data = {
                 'response': "I apologize, but I encountered an error. Please try again.",
                 'error': str(e)
             }
+            return response_data
+        finally:
+            if priority_token is not None:
+                request_priority.reset(priority_token)
+            self.latency.record(f"tier_{tier}", time.perf_counter() - start)
+            self.telemetry.finish_trace(
+                trace,
+                tier=tier,
+                priority=PRIORITY_NAMES[priority],
+                status=response_data.get('status'),
+                fallback=bool(response_data.get('fallback')),
+                error=response_data.get('error')
+            )
+
+    async def _answer_with_model(self, query: str, user_id: str) -> Dict:
+        """Model answer with escalation, workflow and enrichment applied"""
+        response_data = await self.generate_response(query, user_id)
+        response_data = await self._finalize_response(query, response_data, user_id)
+        self._schedule_prefetch(user_id, response_data.get('topic'), response_data.get('suggestions'))
+        return response_data
+
+    def _schedule_prefetch(
+        self,
+        user_id: str,
+        topic: Optional[str],
+        suggestions: Optional[List[str]] = None,
+        version: Optional[int] = None
+    ):
+        """Warm retrieval and answers for the questions likely to come next, within budget"""
+        context = self.conversation_history.get(user_id)
+        if not self.prefetcher.enabled or not context or prefetching.get():
+            return
+        current = context.get('turn_count', 0)
+        if version is not None and version != current:
+            # The customer has already moved on
+            return
+        
+        queue_depth = self.llm.queue_depth if self.llm.breaker.state == 'closed' else float('inf')
+        budget = self.prefetcher.answer_budget(user_id, current, queue_depth)
+        questions = self.prefetcher.predict(topic, suggestions)
+        for question in questions[:self.prefetcher.max_retrievals_per_turn]:
+            if not self.prefetcher.has_retrieval(question):
+                self.prefetcher.warm_retrieval(question, self.retriever.retrieve(question))
+            if budget > 0 and not self.prefetcher.has_answer(user_id, question, current):
+                task = self.prefetcher.start_answer(
+                    user_id, question, current, self._prefetch_answer(question, context)
+                )
+                self.cancellation.track(task)
+                budget -= 1
+
+    async def _prefetch_answer(self, question: str, context: Dict) -> Dict:
+        """Answer a predicted question against the conversation as it stands"""
+        request_priority.set(PRIORITY_LOW)
+        prefetching.set(True)
+        return await self._run_pipeline(question, context)
+
+    def _degraded_response(self, query: str, work: asyncio.Future) -> Dict:
+        """Local answer for a turn past its deadline; the model answer follows asynchronously"""
+        response_data = self.router.best_effort(query) if self.router else None
+        if self.enrichment.pending >= self.enrichment_config['max_pending']:
+            # Background work is at its limit: answer locally now and drop the model call
+            work.cancel()
+            response_data = response_data or self._fallback_response(query)
+            response_data.update({
+                'degraded': True,
+                'completion': 'skipped',
+                'response_id': self.enrichment.skip()
+            })
+            return response_data
+        if response_data is None:
+            fallback = self._fallback_response(query)
+            if fallback['status'] == 'resolved':
+                response_data = fallback
+            else:
+                response_data = {
+                    'response': ("This is taking a little longer than usual. "
+                                 "I'll share the full answer here as soon as it's ready."),
+                    'confidence': 0.5,
+                    'suggestions': []
+                }
+        
+        response_data.update({
+            'status': 'pending',
+            'degraded': True,
+            'completion': 'pending',
+            'response_id': self.enrichment.start(self._complete_after_deadline(work))
+        })
+        return response_data
+
+    async def _complete_after_deadline(self, work: asyncio.Future) -> Dict:
+        """Finish a degraded turn in the background; clients poll or get it pushed"""
+        try:
+            response_data = await work
+        except Exception:
+            self.slo.record_async_completion(ok=False)
+            raise
+        self.slo.record_async_completion(ok=not response_data.get('error'))
+        return response_data
+
+    def _request_priority(self, user_input: str, user_id: str) -> int:
+        """Scheduling priority from escalation state, urgency and sentiment"""
+        context = self.conversation_history.get(user_id, {})
+        if context.get('escalated'):
+            return PRIORITY_CRITICAL
+        
+        sentiment = self.sentiment_analyzer.analyze(user_input)
+        signals = self.context_analyzer.analyze(user_input)
+        urgent = sentiment.get('urgent', 0) > 0 or signals['urgency']
+        negative = sentiment.get('negative', 0) > 0 or signals['sentiment'] == 'negative'
+        if urgent and negative:
+            return PRIORITY_CRITICAL
+        if urgent or negative:
+            return PRIORITY_HIGH
+        return PRIORITY_NORMAL
+
+    def _route_locally(self, query: str, user_id: str) -> Optional[Dict]:
+        """Template or FAQ answer from the router, recorded in the conversation"""
+        if not self.router:
+            return None
+        # Follow-ups and escalated conversations need the context only the model sees
+        context = self.conversation_history.get(user_id)
+        if context and (context.get('turn_count') or context.get('escalated')):
+            return None
+        response_data = self.router.route(query)
+        if response_data is not None:
+            self._get_conversation_context(user_id)
+            self._update_context(user_id, query, response_data)
+        return response_data
+
+    async def _finalize_response(
+        self,
+        query: str,
+        response_data: Dict,
+        user_id: str
+    ) -> Dict:
+        """Apply escalation, workflow and enhancement handling to a base response"""
+        # Check if escalation is needed
+        if self._needs_escalation(response_data):
+            return await self._handle_escalation(query, response_data, user_id)
+        
+        # Check if workflow is needed
+        if self._needs_workflow(response_data):
+            return await self._handle_workflow(query, response_data, user_id)
+        
+        # Table suggestions cost nothing, so they go out with the answer
+        if not response_data.get('suggestions'):
+            table = self.suggestion_tables.lookup(response_data.get('topic'))
+            if table:
+                response_data['suggestions'] = table
+        
+        # Add enhancements in the background rather than before answering
+        if self._needs_enhancement(response_data):
+            self._schedule_enrichment(query, response_data, user_id)
+        
+        return response_data
+
+    def _schedule_enrichment(self, query: str, response_data: Dict, user_id: str):
+        """Start enrichment off the request path, or skip it under load"""
+        if self._should_skip_enrichment():
+            response_data['response_id'] = self.enrichment.skip()
+            response_data['enrichment'] = 'skipped'
+            return
+        
+        response_data['response_id'] = self.enrichment.start(
+            self._enhance_response(dict(response_data), query, user_id)
+        )
+        response_data['enrichment'] = 'pending'
+
+    def _should_skip_enrichment(self) -> bool:
+        """Enrichment is optional, drop it when the model is saturated or failing"""
+        config = self.enrichment_config
+        return (
+            not config['enabled'] or
+            self.enrichment.pending >= config['max_pending'] or
+            self.llm.queue_depth >= config['skip_queue_depth'] or
+            self.llm.breaker.state != 'closed'
+        )
+
+    def get_enrichment(self, response_id: str) -> Optional[Dict]:
+        """Status and enrichment fields for a previously returned response"""
+        return self.enrichment.get(response_id)
+
+    async def wait_for_enrichment(self, response_id: str, timeout: float = 30) -> Optional[Dict]:
+        """Wait for a response's enrichment so it can be pushed to the client"""
+        return await self.enrichment.wait(response_id, timeout)
 
     def _needs_escalation(self, response_data: Dict) -> bool:
         """Check if query needs escalation"""
@@ -431,6 +1335,16 @@ class AICustomerServiceBot:
             response_data.get('confidence', 1.0) < 0.9
         )
 
+    def _get_escalation_reason(self, response_data: Dict) -> str:
+        """Explain why a response was escalated"""
+        if response_data.get('fallback'):
+            return 'AI assistant unavailable'
+        if response_data.get('status') == 'escalated':
+            return 'Escalated by assistant'
+        if response_data.get('confidence', 1.0) < 0.7:
+            return 'Low confidence response'
+        return 'Urgent request'
+
     async def _handle_escalation(
         self,
         query: str,
@@ -478,14 +1392,19 @@ class AICustomerServiceBot:
         query: str,
         user_id: str
     ) -> Dict:
-        """Enhance response with additional information"""
+        """Collect the fields that enhance a response with additional information"""
+        # Runs as its own task, so this only lowers the priority of enrichment calls
+        request_priority.set(PRIORITY_LOW)
+        version = self.conversation_history.get(user_id, {}).get('turn_count')
+        enhancements = {}
+        
         # Add related information
         if not response_data.get('related_info'):
-            response_data['related_info'] = await self._find_related_info(query)
+            enhancements['related_info'] = self._find_related_info(query)
         
         # Add suggestions if missing
         if not response_data.get('suggestions'):
-            response_data['suggestions'] = await self._generate_followup_suggestions(
+            enhancements['suggestions'] = self._generate_followup_suggestions(
                 query,
                 response_data,
                 {'intent': response_data.get('topic')}
@@ -493,6 +1412,25 @@ class AICustomerServiceBot:
         
         # Add confidence boosting information
         if response_data.get('confidence', 1.0) < 0.9:
-            response_data['supporting_info'] = await self._get_supporting_info(query)
+            enhancements['supporting_info'] = self._get_supporting_info(query)
         
-        return response_data
\ No newline at end of file
+        # Run the enhancement calls concurrently rather than back to back
+        results = dict(zip(enhancements.keys(), await asyncio.gather(*enhancements.values())))
+        if results.get('suggestions'):
+            # Offered follow-ups are the likeliest next questions
+            self._schedule_prefetch(user_id, response_data.get('topic'), results['suggestions'], version)
+        return results
+
+    async def _find_related_info(self, query: str) -> List[str]:
+        """Find knowledge base sections related to the query"""
+        return [
+            name for name in self.retriever.retrieve(query)
+            if not name.startswith('faqs/')
+        ]
+
+    async def _get_supporting_info(self, query: str) -> List[Dict]:
+        """Get FAQ entries that support the response"""
+        return [
+            data for name, data in self.retriever.retrieve(query).items()
+            if name.startswith('faqs/')
+        ]
\ No newline at end of file
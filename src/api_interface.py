@@ -2,9 +2,17 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 from ai_enhanced_bot import AICustomerServiceBot
+from modules.llm_backend import create_backend
+from modules.llm_client import LLMClient
+from dotenv import load_dotenv
+import os
 
+load_dotenv()
 app = FastAPI()
 
+# One client for every request so concurrency limits and the breaker are global
+llm_client = LLMClient(create_backend(api_key=os.getenv('OPENAI_API_KEY')))
+
 class Query(BaseModel):
     text: str
     user_id: str
@@ -27,7 +35,7 @@ async def chat_endpoint(query: Query):
     }
     
     try:
-        bot = AICustomerServiceBot(company_data)
+        bot = AICustomerServiceBot(company_data, llm_client=llm_client)
         response = await bot.handle_complex_query(
             query.text,
             query.user_id,
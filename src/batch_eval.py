@@ -0,0 +1,238 @@
+"""Offline batch evaluation: replay historical questions through the bot.
+
+Run from the src directory:
+    python batch_eval.py --source ../chat.db --output eval/run1.jsonl
+    python batch_eval.py --source questions.jsonl --output eval/run2.jsonl --concurrency 50
+    python batch_eval.py --source ../chat.db --output eval/run2.jsonl --compare eval/run1.jsonl
+
+The output JSONL doubles as the checkpoint: rerunning with the same output
+skips ids already written, so an interrupted run resumes where it stopped.
+"""
+from typing import Dict, Iterator, Optional
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.llm_backend import LocalBackend
+from modules.llm_client import track_request_usage
+from modules.metrics import LatencyRecorder
+
+
+def read_chat_db(path: str, limit: Optional[int] = None) -> Iterator[Dict]:
+    """Yield user messages from the chat_history table, oldest first"""
+    query = 'SELECT id, message FROM chat_history WHERE message IS NOT NULL ORDER BY id'
+    if limit:
+        query += f' LIMIT {int(limit)}'
+    with sqlite3.connect(path) as conn:
+        for row_id, message in conn.execute(query):
+            yield {'id': str(row_id), 'message': message}
+
+
+def read_jsonl(path: str, limit: Optional[int] = None) -> Iterator[Dict]:
+    """Yield {'id', 'message'} items; 'question' is accepted for 'message'"""
+    with open(path, 'r') as f:
+        count = 0
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            message = item.get('message') or item.get('question')
+            if not message:
+                continue
+            yield {'id': str(item.get('id', line_number)), 'message': message}
+            count += 1
+            if limit and count >= limit:
+                break
+
+
+def read_source(path: str, limit: Optional[int] = None) -> Iterator[Dict]:
+    if path.endswith('.db') or path.endswith('.sqlite'):
+        return read_chat_db(path, limit)
+    return read_jsonl(path, limit)
+
+
+def load_results(path: str) -> Dict[str, Dict]:
+    """Records already written to an output file, keyed by id"""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted run is simply redone
+                continue
+            results[record['id']] = record
+    return results
+
+
+async def evaluate_one(bot: AICustomerServiceBot, item: Dict, enrichment_timeout: float) -> Dict:
+    """Run one message through the bot and describe the outcome"""
+    usage = track_request_usage()
+    start = time.perf_counter()
+    # Every item gets its own user so answers don't depend on run order
+    response = await bot.handle_complex_query(item['message'], f"eval-{item['id']}")
+    latency = time.perf_counter() - start
+
+    enrichment = None
+    if response.get('enrichment') == 'pending' and enrichment_timeout > 0:
+        enrichment = await bot.wait_for_enrichment(response['response_id'], enrichment_timeout)
+
+    return {
+        'id': item['id'],
+        'message': item['message'],
+        'response': response.get('response'),
+        'status': 'error' if response.get('error') else response.get('status', 'unknown'),
+        'topic': response.get('topic'),
+        'confidence': response.get('confidence'),
+        'routed': response.get('routed', 'llm'),
+        'fallback': bool(response.get('fallback')),
+        'suggestions': response.get('suggestions') or (enrichment or {}).get('data', {}).get('suggestions', []),
+        'error': response.get('error'),
+        'latency_ms': round(latency * 1000, 2),
+        'llm_calls': usage['calls'],
+        'prompt_tokens': usage['prompt_tokens'],
+        'completion_tokens': usage['completion_tokens']
+    }
+
+
+async def run_batch(
+    bot: AICustomerServiceBot,
+    items: Iterator[Dict],
+    output: str,
+    concurrency: int = 20,
+    enrichment_timeout: float = 30
+) -> Dict:
+    """Evaluate items with bounded concurrency, appending results to output as they finish"""
+    done = set(load_results(output))
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = Counter(skipped=0, processed=0)
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(output, 'a+') as out:
+        # End a torn last line so the first new record starts on its own
+        if out.tell():
+            out.seek(out.tell() - 1)
+            if out.read(1) != '\n':
+                out.write('\n')
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                record = await evaluate_one(bot, item, enrichment_timeout)
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                counts['processed'] += 1
+                if counts['processed'] % 100 == 0:
+                    print(f"{counts['processed']} processed")
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        # Feed lazily so thousands of messages never sit in memory at once
+        for item in items:
+            if item['id'] in done:
+                counts['skipped'] += 1
+                continue
+            done.add(item['id'])
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    return dict(counts)
+
+
+def summarize(results: Dict[str, Dict]) -> Dict:
+    """Status distribution, latency percentiles and token totals for a run"""
+    latency = LatencyRecorder(max_samples=max(len(results), 1))
+    for record in results.values():
+        latency.record('request', record['latency_ms'] / 1000)
+    return {
+        'records': len(results),
+        'statuses': dict(Counter(r['status'] for r in results.values())),
+        'tiers': dict(Counter(r['routed'] for r in results.values())),
+        'fallbacks': sum(1 for r in results.values() if r['fallback']),
+        'latency': latency.report().get('request', {}),
+        'llm_calls': sum(r['llm_calls'] for r in results.values()),
+        'prompt_tokens': sum(r['prompt_tokens'] for r in results.values()),
+        'completion_tokens': sum(r['completion_tokens'] for r in results.values())
+    }
+
+
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict]) -> Dict:
+    """Per-item differences between two runs over their shared ids"""
+    shared = [i for i in current if i in baseline]
+    status_changes = [
+        {'id': i, 'from': baseline[i]['status'], 'to': current[i]['status']}
+        for i in shared if current[i]['status'] != baseline[i]['status']
+    ]
+    return {
+        'shared': len(shared),
+        'response_changed': sum(1 for i in shared if current[i]['response'] != baseline[i]['response']),
+        'status_changed': len(status_changes),
+        'status_changes': status_changes[:20],
+        'tier_changed': sum(1 for i in shared if current[i]['routed'] != baseline[i]['routed']),
+        'token_delta': sum(
+            current[i]['prompt_tokens'] + current[i]['completion_tokens']
+            - baseline[i]['prompt_tokens'] - baseline[i]['completion_tokens']
+            for i in shared
+        )
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Offline batch evaluation of the AI bot')
+    parser.add_argument('--source', required=True, help='chat.db or a JSONL file of messages')
+    parser.add_argument('--output', required=True, help='Results JSONL (also the resume checkpoint)')
+    parser.add_argument('--config', default='../company_config.json', help='Company config file')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=None, help='Only the first N messages')
+    parser.add_argument('--mode', default=None, choices=['single_call', 'sequential'])
+    parser.add_argument('--backend', default='config', choices=['config', 'local'],
+                        help='Use the configured provider or the local stand-in')
+    parser.add_argument('--use-cache', action='store_true', help='Allow cached answers')
+    parser.add_argument('--enrichment-timeout', type=float, default=30,
+                        help='Seconds to wait for background suggestions (0 to skip)')
+    parser.add_argument('--compare', default=None, help='Earlier results JSONL to diff against')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        company_data = json.load(f)
+    if not args.use_cache:
+        # Regression runs need fresh answers, not ones cached by an older prompt
+        company_data['cache'] = {'enabled': False}
+    # Enrichment is part of the output, never skip it for queue depth
+    company_data['enrichment'] = {**company_data.get('enrichment', {}), 'skip_queue_depth': float('inf')}
+
+    backend = LocalBackend() if args.backend == 'local' else None
+    bot = AICustomerServiceBot(company_data, pipeline_mode=args.mode, backend=backend)
+
+    counts = await run_batch(
+        bot,
+        read_source(args.source, args.limit),
+        args.output,
+        args.concurrency,
+        args.enrichment_timeout
+    )
+
+    results = load_results(args.output)
+    summary = {**counts, **summarize(results)}
+    if args.compare:
+        summary['comparison'] = compare(results, load_results(args.compare))
+
+    with open(f"{os.path.splitext(args.output)[0]}.summary.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
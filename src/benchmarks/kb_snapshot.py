@@ -0,0 +1,113 @@
+"""Worker startup time and memory: building the knowledge base vs mapping a snapshot.
+
+Run from the src directory:
+    python -m benchmarks.kb_snapshot
+    python -m benchmarks.kb_snapshot --size 100000 --workers 4
+
+The products category is padded with synthetic catalog entries written to a
+products.json source. For each mode, several worker processes start at the
+same time and stay alive together, like web workers on one host: "build"
+parses the JSON sources and indexes them, "snapshot" maps the compiled file.
+RSS counts mapped pages in every process that touched them; PSS splits
+shared pages between the processes, so it shows the per-worker cost.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.kb_search import synthetic_catalog
+from modules.kb_snapshot import SnapshotWriter
+from modules.knowledge_base import KnowledgeBase
+
+QUERIES = ('wireless battery charger', 'refund warranty', 'cannot sign in')
+
+
+def memory_mb() -> dict:
+    """Resident and proportional set size of this process (Linux /proc)"""
+    usage = {'rss_mb': None, 'pss_mb': None}
+    for path, field, key in (('/proc/self/status', 'VmRSS:', 'rss_mb'),
+                             ('/proc/self/smaps_rollup', 'Pss:', 'pss_mb')):
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.startswith(field):
+                        usage[key] = round(int(line.split()[1]) / 1024, 1)
+                        break
+        except OSError:
+            pass
+    return usage
+
+
+def worker(mode: str, path: str):
+    baseline = memory_mb()
+    start = time.perf_counter()
+    if mode == 'snapshot':
+        kb = KnowledgeBase(snapshot=path)
+    else:
+        kb = KnowledgeBase(source_dir=path)
+    load_ms = (time.perf_counter() - start) * 1000
+    # Serve a few queries so the pages a worker really needs are resident
+    start = time.perf_counter()
+    for query in QUERIES:
+        kb.search(query, limit=10)
+        kb.semantic_search(query, k=5)
+    query_ms = (time.perf_counter() - start) * 1000 / len(QUERIES)
+    print(json.dumps({'load_ms': round(load_ms, 1), 'query_ms': round(query_ms, 2),
+                      'baseline': baseline, **memory_mb()}), flush=True)
+    # Stay alive until every worker has reported, so shared pages are counted as shared
+    sys.stdin.read()
+
+
+def run_workers(mode: str, path: str, count: int) -> list:
+    processes = [
+        subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.kb_snapshot', '--worker', mode, '--path', path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(count)
+    ]
+    reports = [json.loads(process.stdout.readline()) for process in processes]
+    for process in processes:
+        process.stdin.close()
+        process.wait()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Knowledge base snapshot benchmark')
+    parser.add_argument('--size', type=int, default=20000, help='Synthetic products to add')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--worker', choices=('build', 'snapshot'), help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker, args.path)
+        return
+
+    directory = tempfile.mkdtemp(prefix='kb_snapshot_')
+    products = dict(KnowledgeBase().categories['products'], **synthetic_catalog(args.size))
+    with open(os.path.join(directory, 'products.json'), 'w') as f:
+        json.dump(products, f)
+
+    start = time.perf_counter()
+    snapshot_path = os.path.join(directory, 'kb_snapshot.bin')
+    writer = SnapshotWriter()
+    KnowledgeBase(source_dir=directory).add_to_snapshot(writer)
+    writer.write(snapshot_path)
+    print(f"Compiled {len(products)} products in {time.perf_counter() - start:.1f}s, "
+          f"snapshot {os.path.getsize(snapshot_path) / 1024 / 1024:.1f} MB")
+
+    print(f"{'mode':>9} {'worker':>6} {'load ms':>9} {'query ms':>9} {'RSS MB':>8} {'PSS MB':>8} {'+RSS MB':>8}")
+    for mode, path in (('build', directory), ('snapshot', snapshot_path)):
+        for i, report in enumerate(run_workers(mode, path, args.workers)):
+            added = (round(report['rss_mb'] - report['baseline']['rss_mb'], 1)
+                     if report['rss_mb'] is not None else None)
+            print(f"{mode:>9} {i:>6} {report['load_ms']:>9} {report['query_ms']:>9} "
+                  f"{report['rss_mb']!s:>8} {report['pss_mb']!s:>8} {added!s:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compare a per-stage model policy with the all-GPT-4 baseline.
+
+Run from the src directory:
+    python -m benchmarks.model_tiers --runs 50
+    python -m benchmarks.model_tiers --runs 50 --backend config
+
+With the local backend each model gets its own simulated latency; token
+counts come from the provider's usage (or an estimate for the local
+stand-in) and cost from the per-1K-token price table in modules/model_policy.py.
+"""
+import argparse
+import asyncio
+import json
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.llm_backend import LocalBackend
+from modules.model_policy import DEFAULT_STAGE_MODELS, MODEL_PRICES as PRICES
+from benchmarks.pipeline_latency import SAMPLE_QUERIES
+
+# Every stage the policy knows about, so none silently falls back to its tiered model
+BASELINE = {'default': 'gpt-4', 'stages': {stage: 'gpt-4' for stage in DEFAULT_STAGE_MODELS}}
+
+
+def estimate_cost(usage: dict) -> float:
+    total = 0.0
+    for model, counts in usage.items():
+        prompt_price, completion_price = PRICES.get(model, PRICES['gpt-4'])
+        total += counts['prompt_tokens'] / 1000 * prompt_price
+        total += counts['completion_tokens'] / 1000 * completion_price
+    return round(total, 4)
+
+
+async def run_policy(company_data: dict, models: dict, mode: str, runs: int, backend=None) -> dict:
+    company_data = dict(
+        company_data,
+        models=models,
+        cache={'enabled': False},
+        routing={'enabled': False}
+    )
+    bot = AICustomerServiceBot(company_data, pipeline_mode=mode, backend=backend)
+    for i in range(runs):
+        response = await bot.handle_complex_query(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)], f"tiers-{i}")
+        # Background suggestions are model calls too, count them in the run
+        if response.get('enrichment') == 'pending':
+            await bot.wait_for_enrichment(response['response_id'])
+
+    report = bot.get_latency_report()
+    usage = bot.llm.get_stats()['usage']
+    return {
+        'request': report.get('tier_llm', {}),
+        'stages': {name[len('stage_'):]: stats for name, stats in report.items() if name.startswith('stage_')},
+        'usage': usage,
+        'tokens': sum(u['prompt_tokens'] + u['completion_tokens'] for u in usage.values()),
+        'cost_usd': estimate_cost(usage)
+    }
+
+
+def local_backend(args) -> LocalBackend:
+    large = {'distribution': 'lognormal', 'median_ms': args.large_median_ms, 'p95_ms': args.large_p95_ms}
+    small = {'distribution': 'lognormal', 'median_ms': args.small_median_ms, 'p95_ms': args.small_p95_ms}
+    return LocalBackend(
+        latency=large,
+        model_latency={model: small for model in PRICES if model != 'gpt-4'}
+    )
+
+
+def print_result(name: str, result: dict):
+    request = result['request']
+    print(f"\n{name}: request p50 {request.get('p50_ms', 0)} ms, p95 {request.get('p95_ms', 0)} ms, "
+          f"{result['tokens']} tokens, ${result['cost_usd']}")
+    print(f"  {'stage':<12} {'count':>6} {'p50 ms':>10} {'p95 ms':>10}")
+    for stage, stats in sorted(result['stages'].items()):
+        print(f"  {stage:<12} {stats['count']:>6} {stats['p50_ms']:>10} {stats['p95_ms']:>10}")
+    for model, usage in sorted(result['usage'].items()):
+        print(f"  {model:<16} calls {usage['calls']:>5}  prompt {usage['prompt_tokens']:>7}  "
+              f"completion {usage['completion_tokens']:>6}")
+
+
+def savings(baseline: float, value: float) -> str:
+    return f"{(1 - value / baseline) * 100:.1f}%" if baseline else 'n/a'
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Per-stage model tiering benchmark')
+    parser.add_argument('--config', default='../company_config.json', help='Company config file')
+    parser.add_argument('--runs', type=int, default=30, help='Requests per policy')
+    parser.add_argument('--mode', default='sequential', choices=['single_call', 'sequential'])
+    parser.add_argument('--backend', default='local', choices=['config', 'local'],
+                        help='Use the configured provider or the local stand-in')
+    parser.add_argument('--large-median-ms', type=float, default=800)
+    parser.add_argument('--large-p95-ms', type=float, default=2500)
+    parser.add_argument('--small-median-ms', type=float, default=250)
+    parser.add_argument('--small-p95-ms', type=float, default=700)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        company_data = json.load(f)
+
+    results = {}
+    for name, models in (('baseline', BASELINE), ('tiered', company_data.get('models'))):
+        backend = local_backend(args) if args.backend == 'local' else None
+        results[name] = await run_policy(company_data, models, args.mode, args.runs, backend)
+        print_result(name, results[name])
+
+    base, tiered = results['baseline'], results['tiered']
+    print(f"\nSavings vs all-GPT-4 ({args.mode}):")
+    for stage, stats in sorted(tiered['stages'].items()):
+        base_p50 = base['stages'].get(stage, {}).get('p50_ms', 0)
+        print(f"  {stage:<12} p50 {savings(base_p50, stats['p50_ms'])}")
+    print(f"  request p50  {savings(base['request'].get('p50_ms', 0), tiered['request'].get('p50_ms', 0))}")
+    print(f"  cost         {savings(base['cost_usd'], tiered['cost_usd'])}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""Compare p50/p95 latency of the single_call and sequential pipelines.
+
+Run from the src directory:
+    python -m benchmarks.pipeline_latency --runs 20
+    python -m benchmarks.pipeline_latency --runs 200 --backend local
+"""
+import argparse
+import asyncio
+import json
+from ai_enhanced_bot import AICustomerServiceBot, PIPELINE_MODES
+from modules.llm_backend import LocalBackend
+
+SAMPLE_QUERIES = [
+    "How long does shipping take?",
+    "I want to return my order, what do I need?",
+    "What is covered by the warranty?",
+    "I can't log in to my account",
+    "My payment was declined",
+    "The product shows an error message when I start it"
+]
+
+
+async def run_mode(company_data: dict, mode: str, runs: int, backend=None) -> dict:
+    # Caching would turn repeated sample queries into hits
+    company_data = dict(company_data, cache={'enabled': False})
+    bot = AICustomerServiceBot(company_data, pipeline_mode=mode, backend=backend)
+    for i in range(runs):
+        query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+        # A fresh user per run so conversation context doesn't grow
+        await bot.generate_response(query, f"bench-{mode}-{i}")
+    return bot.get_latency_report().get(mode, {})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Pipeline latency benchmark')
+    parser.add_argument('--config', default='../company_config.json', help='Company config file')
+    parser.add_argument('--runs', type=int, default=10, help='Requests per pipeline mode')
+    parser.add_argument('--backend', default='config', choices=['config', 'local'],
+                        help='Use the configured provider or the local stand-in')
+    parser.add_argument('--median-ms', type=float, default=800, help='Local backend median latency')
+    parser.add_argument('--p95-ms', type=float, default=2500, help='Local backend p95 latency')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        company_data = json.load(f)
+
+    print(f"{'mode':<12} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+    for mode in PIPELINE_MODES:
+        backend = None
+        if args.backend == 'local':
+            backend = LocalBackend(latency={
+                'distribution': 'lognormal',
+                'median_ms': args.median_ms,
+                'p95_ms': args.p95_ms
+            })
+        stats = await run_mode(company_data, mode, args.runs, backend)
+        print(f"{mode:<12} {stats.get('count', 0):>6} {stats.get('p50_ms', 0):>10} "
+              f"{stats.get('p95_ms', 0):>10} {stats.get('mean_ms', 0):>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
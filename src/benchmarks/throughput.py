@@ -0,0 +1,89 @@
+"""Offline throughput test of handle_complex_query against a local LLM stand-in.
+
+Run from the src directory:
+    python -m benchmarks.throughput --requests 500 --concurrency 50
+    python -m benchmarks.throughput --backend http --base-url http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.llm_backend import HTTPBackend, LocalBackend
+from modules.metrics import LatencyRecorder
+from benchmarks.pipeline_latency import SAMPLE_QUERIES
+
+
+async def run_load(bot: AICustomerServiceBot, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latency = LatencyRecorder(max_samples=requests)
+    statuses = Counter()
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await bot.handle_complex_query(
+                SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)],
+                f"load-{i}"
+            )
+            latency.record('request', time.perf_counter() - start)
+            statuses['error' if response.get('error') else response.get('status', 'unknown')] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': requests,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'latency': latency.report().get('request', {}),
+        'statuses': dict(statuses)
+    }
+
+
+def build_bot(company_data: dict, args, backend) -> AICustomerServiceBot:
+    company_data = dict(company_data, cache={'enabled': False})
+    return AICustomerServiceBot(company_data, pipeline_mode=args.mode, backend=backend)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Offline pipeline throughput test')
+    parser.add_argument('--config', default='../company_config.json', help='Company config file')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--mode', default='single_call', choices=['single_call', 'sequential'])
+    parser.add_argument('--backend', default='local', choices=['local', 'http'])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8765')
+    parser.add_argument('--median-ms', type=float, default=800)
+    parser.add_argument('--p95-ms', type=float, default=2500)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        company_data = json.load(f)
+
+    if args.backend == 'http':
+        backend = HTTPBackend(args.base_url)
+    else:
+        backend = LocalBackend(
+            latency={'distribution': 'lognormal', 'median_ms': args.median_ms, 'p95_ms': args.p95_ms},
+            failure_rate=args.failure_rate,
+            seed=args.seed
+        )
+
+    # Zero-latency pass isolates our own per-request overhead from the provider's
+    overhead = await run_load(
+        build_bot(company_data, args, LocalBackend(seed=args.seed)),
+        args.requests,
+        args.concurrency
+    )
+    load = await run_load(build_bot(company_data, args, backend), args.requests, args.concurrency)
+
+    print(json.dumps({'pipeline_overhead': overhead, 'simulated_load': load}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
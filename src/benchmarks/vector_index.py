@@ -0,0 +1,75 @@
+"""Build time, query latency and memory of the local vector index.
+
+Run from the src directory:
+    python -m benchmarks.vector_index
+    python -m benchmarks.vector_index --size 100000 --dims 256 --batch 32
+
+Entries are the synthetic catalog from benchmarks.kb_search. Every dtype is
+timed for single queries and for batches answered with one matrix product.
+"""
+import argparse
+import random
+import time
+from benchmarks.kb_search import WORDS, synthetic_catalog
+from modules.metrics import LatencyRecorder
+from modules.search_index import flatten_text
+from modules.vector_index import VectorIndex
+
+
+def catalog_items(size: int) -> list:
+    return [
+        (f"{key.replace('_', ' ')} {' '.join(flatten_text(value))}", 'products', {'key': key})
+        for key, value in synthetic_catalog(size).items()
+    ]
+
+
+def run(items: list, dim: int, dtype: str, queries: list, batch: int) -> dict:
+    index = VectorIndex(dim=dim, dtype=dtype)
+    start = time.perf_counter()
+    index.build(items)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    latency = LatencyRecorder(max_samples=len(queries))
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=10)
+        latency.record('single', time.perf_counter() - start)
+    for i in range(0, len(queries), batch):
+        chunk = queries[i:i + batch]
+        start = time.perf_counter()
+        index.search_batch(chunk, k=10)
+        # Per-query cost, so it compares directly with single queries
+        latency.record('batched', (time.perf_counter() - start) / len(chunk))
+
+    return {
+        'build_ms': round(build_ms, 1),
+        'memory_mb': round(index.memory_bytes / 1024 / 1024, 1),
+        'latency': latency.report()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vector index benchmark')
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--dims', type=int, nargs='+', default=[256])
+    parser.add_argument('--queries', type=int, default=128)
+    parser.add_argument('--batch', type=int, default=32, help='Queries per batched call')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    queries = [' '.join(rng.sample(WORDS, rng.randint(2, 6))) for _ in range(args.queries)]
+    items = catalog_items(args.size)
+
+    print(f"{'entries':>8} {'dim':>5} {'dtype':>8} {'build ms':>9} {'MB':>7} "
+          f"{'mode':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for dim in args.dims:
+        for dtype in ('float32', 'int8'):
+            result = run(items, dim, dtype, queries, args.batch)
+            for mode in ('single', 'batched'):
+                stats = result['latency'][mode]
+                print(f"{args.size:>8} {dim:>5} {dtype:>8} {result['build_ms']:>9} "
+                      f"{result['memory_mb']:>7} {mode:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compile the knowledge base, its search indexes, related-article graph and prompt fragments into one snapshot.
+
+Run from the src directory:
+    python build_kb_snapshot.py
+    python build_kb_snapshot.py --config ../company_config.json --output ../data/kb_snapshot.bin
+
+Workers map the file read-only instead of parsing and indexing at startup,
+so every process on a host shares one page-cache copy. Point the bot at it
+with "snapshot": {"path": ...} in the company config, and KnowledgeBase with
+KnowledgeBase(snapshot=...). The bot part is only used while the content it
+was compiled from (name, products, FAQs) is unchanged; rerun this after
+editing content. Operational settings can change without a rebuild.
+"""
+import argparse
+import json
+import os
+import time
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.kb_snapshot import SnapshotWriter
+from modules.knowledge_base import KnowledgeBase
+from modules.llm_backend import LocalBackend
+
+
+def compile_snapshot(path: str, bot: AICustomerServiceBot, knowledge_base: KnowledgeBase) -> dict:
+    writer = SnapshotWriter()
+    bot.add_to_snapshot(writer)
+    knowledge_base.add_to_snapshot(writer)
+    return writer.write(path, meta={
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'kb_version': bot.kb_version
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile a memory-mappable knowledge base snapshot')
+    parser.add_argument('--config', default='../company_config.json', help='Company config file')
+    parser.add_argument('--sources', default=None, help='Directory of <category>.json KnowledgeBase sources')
+    parser.add_argument('--output', default='../data/kb_snapshot.bin')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.config, 'r') as f:
+        company_data = json.load(f)
+    # Built from sources with no provider calls; only the knowledge base is needed
+    bot = AICustomerServiceBot(dict(company_data, snapshot={}, cache={'enabled': False}), backend=LocalBackend())
+    # Workers compare the snapshot against the config exactly as they load it
+    bot.company_data = company_data
+    knowledge_base = KnowledgeBase(source_dir=args.sources)
+
+    manifest = compile_snapshot(args.output, bot, knowledge_base)
+    print(f"Wrote {args.output}: {len(manifest['blocks'])} blocks, "
+          f"{os.path.getsize(args.output) / 1024:.1f} KiB, {len(knowledge_base.index)} entries, "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Build per-topic follow-up suggestion tables offline.
+
+Run from the src directory:
+    python build_suggestion_tables.py
+    python build_suggestion_tables.py --chats ../chat.db --output data/suggestion_tables.json
+
+Sources, strongest first: suggestions shown in historical chats (weighted by
+how often they appeared and how satisfied the customer was), the steps of the
+bot's service workflows a customer can take themselves, and the category
+suggestions of complete_bot.py. Without --output the table goes where the
+config's suggestions.path (default data/suggestion_tables.json) points.
+The artifact carries a content-hash version; the bot loads it at startup and
+only asks the model for suggestions on topics the table doesn't cover.
+"""
+from typing import Dict, Iterator, List, Tuple
+import argparse
+import ast
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from ai_enhanced_bot import SERVICE_WORKFLOWS
+from modules.suggestion_tables import REPO_ROOT, table_version, topic_key
+
+# complete_bot.py categories and the bot topics they correspond to
+CATEGORY_TOPICS = {
+    'technical': ['technical_support', 'technical_issue'],
+    'billing': ['billing'],
+    'account': ['account'],
+    'product': ['product_info', 'product_inquiry', 'pricing'],
+    'common': ['general_inquiry']
+}
+
+HISTORY_WEIGHT = 10.0
+WORKFLOW_WEIGHT = 5.0
+CATEGORY_WEIGHT = 3.0
+
+# Workflow steps the support team performs; offering them as customer suggestions makes no sense
+AGENT_ACTIONS = ('verify', 'process', 'escalate', 'send', 'identify', 'follow up')
+
+
+def read_chat_suggestions(path: str) -> Iterator[Tuple[str, List[str], float]]:
+    """Yield (topic, suggestions, weight) for every stored bot response with both"""
+    if not os.path.exists(path):
+        return
+    with sqlite3.connect(path) as conn:
+        for response, satisfaction in conn.execute(
+                'SELECT response, satisfaction FROM chat_history WHERE response IS NOT NULL'):
+            try:
+                data = json.loads(response)
+            except ValueError:
+                continue
+            if not isinstance(data, dict) or not data.get('topic') or not data.get('suggestions'):
+                continue
+            # Suggestions from conversations rated well count more
+            weight = 1.0 + (satisfaction or 0) / 5
+            yield data['topic'], [str(s) for s in data['suggestions'] if s], weight
+
+
+def workflow_suggestions(workflows: Dict) -> Dict[str, List[str]]:
+    """The steps of each service workflow a customer can take themselves"""
+    tables = {}
+    for name, workflow in workflows.items():
+        steps = [step for step in workflow.get('steps', [])
+                 if not step.lower().startswith(AGENT_ACTIONS)]
+        if steps:
+            tables[name] = steps
+    return tables
+
+
+def category_suggestions(path: str) -> Dict[str, List[str]]:
+    """Read the suggestion lists out of complete_bot.py without importing it"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read())
+    lists = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) and node.name == 'generate_suggestions':
+            for statement in node.body:
+                if isinstance(statement, ast.Assign) and isinstance(statement.targets[0], ast.Name):
+                    name = statement.targets[0].id
+                    if name == 'category_suggestions':
+                        lists.update(ast.literal_eval(statement.value))
+                    elif name == 'common_suggestions':
+                        lists['common'] = ast.literal_eval(statement.value)
+
+    tables = {}
+    for category, suggestions in lists.items():
+        # Chat-command hints like "!ticket" only make sense in the Discord bot
+        cleaned = [s.lstrip('• ').strip() for s in suggestions if '!' not in s]
+        for topic in CATEGORY_TOPICS.get(category, [category]):
+            tables[topic] = cleaned
+    return tables
+
+
+def build_tables(
+    chats: Iterator[Tuple[str, List[str], float]],
+    workflows: Dict[str, List[str]],
+    categories: Dict[str, List[str]],
+    per_topic: int = 3,
+    min_history: int = 2
+) -> Tuple[Dict[str, List[str]], Dict]:
+    """Rank suggestions per topic across sources; returns (tables, per-source counts)"""
+    history = defaultdict(lambda: defaultdict(float))
+    history_counts = defaultdict(lambda: defaultdict(int))
+    for topic, suggestions, weight in chats:
+        for suggestion in suggestions:
+            history[topic_key(topic)][suggestion] += weight
+            history_counts[topic_key(topic)][suggestion] += 1
+
+    scores = defaultdict(lambda: defaultdict(float))
+    for topic, suggestions in history.items():
+        for suggestion, weight in suggestions.items():
+            # One-off model suggestions are noise, recurring ones are the table
+            if history_counts[topic][suggestion] >= min_history:
+                scores[topic][suggestion] += HISTORY_WEIGHT + weight
+    for source, base in ((workflows, WORKFLOW_WEIGHT), (categories, CATEGORY_WEIGHT)):
+        for topic, suggestions in source.items():
+            for rank, suggestion in enumerate(suggestions):
+                scores[topic_key(topic)][suggestion] += base - rank * 0.1
+
+    tables = {}
+    for topic, ranked in sorted(scores.items()):
+        best = sorted(ranked.items(), key=lambda item: item[1], reverse=True)[:per_topic]
+        tables[topic] = [suggestion for suggestion, _ in best]
+    sources = {
+        'history_topics': len(history),
+        'history_suggestions': sum(len(s) for s in history.values()),
+        'workflow_topics': len(workflows),
+        'category_topics': len(categories)
+    }
+    return tables, sources
+
+
+def write_artifact(path: str, tables: Dict[str, List[str]], sources: Dict) -> Dict:
+    """Write the versioned artifact atomically so a running bot never reads half a file"""
+    artifact = {
+        'version': table_version(tables),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'sources': sources,
+        'tables': tables
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build per-topic follow-up suggestion tables')
+    parser.add_argument('--config', default='../company_config.json', help='Company config file')
+    parser.add_argument('--chats', default='../chat.db', help='chat.db with historical responses')
+    parser.add_argument('--complete-bot', default='../complete_bot.py', help='Source of category suggestions')
+    parser.add_argument('--output', help='Table file, relative to the repository root')
+    parser.add_argument('--per-topic', type=int, default=3, help='Suggestions kept per topic')
+    parser.add_argument('--min-history', type=int, default=2,
+                        help='Times a historical suggestion must recur to be kept')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        company_data = json.load(f)
+    # Written where the bot's SuggestionTables will look for it
+    output = args.output or company_data.get('suggestions', {}).get('path') or 'data/suggestion_tables.json'
+    output = os.path.join(REPO_ROOT, output)
+
+    tables, sources = build_tables(
+        read_chat_suggestions(args.chats),
+        workflow_suggestions(SERVICE_WORKFLOWS),
+        category_suggestions(args.complete_bot),
+        args.per_topic,
+        args.min_history
+    )
+    artifact = write_artifact(output, tables, sources)
+    print(f"Wrote {len(tables)} topics to {output} (version {artifact['version']})")
+    print(json.dumps(sources, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -43,10 +43,10 @@ class IntentAnalyzer:
             matches = re.findall(pattern, text, re.IGNORECASE)
             scores[intent] = len(matches) * 0.5
         
-        # Keyword matching
+        # Keyword matching on whole words, so "hi" does not match "this" or "shipment"
         for intent, keywords in self.intent_keywords.items():
             for keyword in keywords:
-                if keyword in text:
+                if re.search(rf"\b{re.escape(keyword)}\b", text):
                     scores[intent] += 0.3
         
         # Normalize scores
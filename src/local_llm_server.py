@@ -0,0 +1,120 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import threading
+import time
+import uuid
+from modules.llm_backend import LocalBackend, estimate_message_tokens
+
+# Local OpenAI-compatible stand-in for offline load tests. Point the bot at it
+# with {"llm_backend": {"type": "http", "base_url": "http://127.0.0.1:8765"}}
+
+backend = LocalBackend()
+backend_lock = threading.Lock()
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != '/v1/chat/completions':
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON'}})
+            return
+
+        messages = payload.get('messages', [])
+        model = payload.get('model', 'gpt-4')
+        stage = (payload.get('metadata') or {}).get('stage')
+
+        # The RNG is shared, so sampling is serialized to keep runs reproducible
+        with backend_lock:
+            delay, fail, content = backend.plan_call(messages, stage, model)
+        time.sleep(delay)
+
+        if fail:
+            self._send_json(backend.failure_status, {
+                'error': {'message': 'Injected failure', 'type': 'server_error'}
+            })
+            return
+
+        prompt_tokens = estimate_message_tokens(messages)
+        completion_tokens = max(1, len(content) // 4)
+        self._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet
+        pass
+
+
+def main():
+    global backend
+    parser = argparse.ArgumentParser(description='Local LLM stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--distribution', default='lognormal',
+                        choices=['fixed', 'uniform', 'normal', 'lognormal'])
+    parser.add_argument('--ms', type=float, default=800, help='Fixed latency')
+    parser.add_argument('--min-ms', type=float, default=300)
+    parser.add_argument('--max-ms', type=float, default=1500)
+    parser.add_argument('--mean-ms', type=float, default=800)
+    parser.add_argument('--stddev-ms', type=float, default=200)
+    parser.add_argument('--median-ms', type=float, default=800)
+    parser.add_argument('--p95-ms', type=float, default=2500)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--failure-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    backend = LocalBackend(
+        latency={
+            'distribution': args.distribution,
+            'ms': args.ms,
+            'min_ms': args.min_ms,
+            'max_ms': args.max_ms,
+            'mean_ms': args.mean_ms,
+            'stddev_ms': args.stddev_ms,
+            'median_ms': args.median_ms,
+            'p95_ms': args.p95_ms
+        },
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        seed=args.seed
+    )
+
+    server = ThreadingHTTPServer((args.host, args.port), CompletionHandler)
+    print(f"Local LLM server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
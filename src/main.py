@@ -12,6 +12,7 @@ from urllib.parse import urlparse
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
+from modules.spell_correct import shared_corrector
 
 # Load environment variables
 load_dotenv()
@@ -166,8 +167,12 @@ def handle_shopify_chat():
     
     return jsonify({'response': response})
 
+# Topic words the Shopify replies key on, so "shiping" or "refnd" still match
+spelling = shared_corrector()
+spelling.add_words(['shipping', 'return', 'refund', 'order', 'tracking', 'contact', 'product', 'items'], weight=10)
+
 def generate_shopify_response(message):
-    message = message.lower()
+    message = spelling.correct(message.lower())
     if 'shipping' in message:
         return "We offer free shipping on orders over $100. Standard shipping takes 3-5 business days."
     elif 'return' in message or 'refund' in message:
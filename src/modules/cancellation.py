@@ -0,0 +1,77 @@
+from typing import Awaitable, Dict, Optional
+from collections import defaultdict
+from contextvars import ContextVar
+import asyncio
+import time
+
+# Client connection or request the current work belongs to; tasks spawned by it inherit it
+request_owner: ContextVar[Optional[str]] = ContextVar('request_owner', default=None)
+
+
+class CancellationRegistry:
+    """Tracks model work per client connection or request so it stops when the client goes away"""
+
+    def __init__(self, tombstone_seconds: float = 300):
+        self.tasks = defaultdict(set)
+        # owner -> when it was cancelled, so work started after the cancel stops too
+        self.cancelled = {}
+        self.tombstone_seconds = tombstone_seconds
+        self.stats = defaultdict(int)
+
+    async def run(self, owner: str, work: Awaitable):
+        """Await work on behalf of owner; run it as its own task, since that task is what gets cancelled"""
+        if self.is_cancelled(owner):
+            # A cancel that landed between two steps of a stream stops the next one
+            if asyncio.iscoroutine(work):
+                work.close()
+            raise asyncio.CancelledError()
+        request_owner.set(owner)
+        self.track(asyncio.current_task(), owner)
+        return await work
+
+    def track(self, task: asyncio.Future, owner: Optional[str] = None) -> asyncio.Future:
+        """Cancel task along with its owner (the current request's owner by default)"""
+        owner = owner or request_owner.get()
+        if owner is None or task.done():
+            return task
+        if self.is_cancelled(owner):
+            task.cancel()
+            return task
+        self.tasks[owner].add(task)
+        task.add_done_callback(lambda t: self._discard(owner, t))
+        return task
+
+    def _discard(self, owner: str, task: asyncio.Future):
+        tasks = self.tasks.get(owner)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self.tasks[owner]
+
+    def is_cancelled(self, owner: Optional[str]) -> bool:
+        return owner is not None and owner in self.cancelled
+
+    def forget(self, owner: str):
+        """Drop owner's tombstone once its request is over, so the id can be used again"""
+        self.cancelled.pop(owner, None)
+
+    def cancel(self, owner: str) -> int:
+        """Cancel everything running for owner and anything it starts later; returns the number of tasks cancelled"""
+        now = time.monotonic()
+        for key in [key for key, at in self.cancelled.items() if now - at >= self.tombstone_seconds]:
+            self.cancelled.pop(key, None)
+        self.cancelled[owner] = now
+        tasks = self.tasks.pop(owner, set())
+        cancelled = sum(1 for task in tasks if not task.done() and task.cancel())
+        self.stats['owners_cancelled'] += 1 if cancelled else 0
+        self.stats['tasks_cancelled'] += cancelled
+        return cancelled
+
+    def get_stats(self) -> Dict:
+        return {
+            'owners_cancelled': self.stats['owners_cancelled'],
+            'tasks_cancelled': self.stats['tasks_cancelled'],
+            'owners_tracked': len(self.tasks),
+            'owners_tombstoned': len(self.cancelled),
+            'tasks_tracked': sum(len(tasks) for tasks in self.tasks.values())
+        }
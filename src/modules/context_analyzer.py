@@ -1,17 +1,29 @@
+from typing import Optional
+from modules.spell_correct import SpellCorrector, shared_corrector
+
+
 class ContextAnalyzer:
-    def __init__(self):
+    def __init__(self, spelling: Optional[SpellCorrector] = None):
         self.intent_patterns = {
             'product_inquiry': ['product', 'pricing', 'cost', 'plan'],
             'support': ['help', 'issue', 'problem', 'error'],
             'account': ['login', 'account', 'password', 'sign up'],
             'billing': ['bill', 'payment', 'charge', 'invoice']
         }
+        self.spelling = spelling or shared_corrector()
+        for patterns in self.intent_patterns.values():
+            self.spelling.add_words((word for pattern in patterns for word in pattern.split()), weight=10)
 
     def analyze(self, message: str, context: dict = None) -> dict:
         """Analyze user message and context"""
         message = message.lower()
+        corrected = self.spelling.correct(message)
+        intent = self._detect_intent(corrected)
+        if corrected != message:
+            self.spelling.record_intent('context', self._detect_intent(message) != intent)
+            message = corrected
         analysis = {
-            'intent': self._detect_intent(message),
+            'intent': intent,
             'urgency': self._detect_urgency(message),
             'sentiment': self._detect_sentiment(message)
         }
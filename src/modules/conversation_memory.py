@@ -0,0 +1,118 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+import json
+from modules.kb_retriever import estimate_tokens
+
+
+class ConversationMemory:
+    """Token-budgeted conversation memory: recent turns verbatim, older ones summarized"""
+
+    def __init__(
+        self,
+        max_tokens: int = 600,
+        summary_max_tokens: int = 200,
+        min_recent_turns: int = 2,
+        max_pending_turns: int = 6,
+        max_turn_chars: int = 600
+    ):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.min_recent_turns = min_recent_turns
+        self.max_pending_turns = max_pending_turns
+        self.max_turn_chars = max_turn_chars
+
+    def init_context(self, context: Dict):
+        context.setdefault('messages', [])
+        context.setdefault('summary', '')
+        context.setdefault('pending_summary', [])
+        # Bumped whenever the summary changes; a model summary started on an older one is stale
+        context.setdefault('summary_version', 0)
+
+    def add_turn(self, context: Dict, user_input: str, response_data: Dict) -> bool:
+        """Record a turn and evict old turns over budget; True if a summary is due"""
+        # Only what the model needs to continue the conversation, not the full payload
+        context['messages'].append({
+            'user': user_input[:self.max_turn_chars],
+            'assistant': str(response_data.get('response', ''))[:self.max_turn_chars],
+            'topic': response_data.get('topic'),
+            'status': response_data.get('status'),
+            'timestamp': datetime.now().isoformat()
+        })
+
+        while (len(context['messages']) > self.min_recent_turns
+               and self._turns_tokens(context['messages']) > self.max_tokens):
+            context['pending_summary'].append(context['messages'].pop(0))
+
+        # If summarization falls behind, fold cheaply so the prompt stays bounded
+        if len(context['pending_summary']) > self.max_pending_turns:
+            turns = context['pending_summary']
+            context['pending_summary'] = []
+            self.apply_summary(context, self.extractive_summary(context['summary'], turns))
+
+        return bool(context['pending_summary'])
+
+    def remove_folded(self, context: Dict, turns: List[Dict]):
+        """Drop turns from the pending list once their summary is applied"""
+        folded = {id(turn) for turn in turns}
+        context['pending_summary'] = [
+            turn for turn in context['pending_summary'] if id(turn) not in folded
+        ]
+
+    def apply_summary(self, context: Dict, summary: str, version: Optional[int] = None) -> bool:
+        """Store a new running summary, truncated to its token budget.
+
+        version is the summary_version the summary was started from. If the
+        summary changed since (an extractive fold while the model was running),
+        the result is dropped, since it lacks the folded turns; returns False.
+        """
+        if version is not None and version != context.get('summary_version', 0):
+            return False
+        context['summary'] = summary[:self.summary_max_tokens * 4].strip()
+        context['summary_version'] = context.get('summary_version', 0) + 1
+        return True
+
+    def extractive_summary(self, summary: str, turns: List[Dict]) -> str:
+        """Cheap summary used when no model summary is available"""
+        lines = [summary] if summary else []
+        for turn in turns:
+            topic = f" ({turn['topic']})" if turn.get('topic') else ''
+            lines.append(f"Customer asked{topic}: {turn['user'][:120]}")
+        # Keep the most recent lines when over budget
+        text = ' | '.join(lines)
+        return text[-self.summary_max_tokens * 4:]
+
+    def render(self, context: Dict) -> Dict:
+        """Bounded view of the conversation for the prompt"""
+        rendered = {
+            'summary': context.get('summary', ''),
+            'recent_turns': [
+                {'user': turn['user'], 'assistant': turn['assistant']}
+                for turn in context.get('messages', [])
+            ],
+            'current_topic': context.get('current_topic'),
+            'pending_actions': context.get('pending_actions', [])[-5:]
+        }
+        if context.get('pending_summary'):
+            # Not summarized yet: include a one-line digest of each turn
+            rendered['earlier_turns'] = [
+                turn['user'][:120] for turn in context['pending_summary']
+            ]
+        if context.get('escalated'):
+            rendered['escalated'] = True
+        return rendered
+
+    def summary_prompt(self, summary: str, turns: List[Dict]) -> str:
+        return f"""
+        Current summary of the conversation so far:
+        {summary or "(none)"}
+
+        Older turns to fold into the summary:
+        {json.dumps([{'user': t['user'], 'assistant': t['assistant']} for t in turns], indent=2)}
+
+        Write an updated summary in at most {self.summary_max_tokens * 3 // 4} words.
+        Keep order numbers, product names, the customer's problem and any
+        promised actions. Return plain text only.
+        """
+
+    def _turns_tokens(self, turns: List[Dict]) -> int:
+        return sum(estimate_tokens(turn['user']) + estimate_tokens(turn['assistant']) for turn in turns)
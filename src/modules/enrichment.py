@@ -0,0 +1,113 @@
+from typing import Awaitable, Dict, Optional
+from collections import OrderedDict, defaultdict
+import asyncio
+import threading
+import time
+import uuid
+from modules.cancellation import CancellationRegistry
+
+
+class EnrichmentStore:
+    """Tracks background enrichment per response so clients can collect it later"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 300,
+        cancellation: Optional[CancellationRegistry] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Enrichment for a client that has gone away is cancelled with the rest of its work
+        self.cancellation = cancellation
+        # response_id -> {'status', 'data', 'task', 'created_at'}
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = defaultdict(int)
+
+    def start(self, work: Awaitable) -> str:
+        """Run enrichment work as a background task and return its response id"""
+        response_id = uuid.uuid4().hex
+        task = asyncio.ensure_future(work)
+        if self.cancellation:
+            self.cancellation.track(task)
+        with self._lock:
+            self.entries[response_id] = {
+                'status': 'pending',
+                'data': None,
+                'task': task,
+                'created_at': time.time()
+            }
+            self._evict()
+            self.stats['scheduled'] += 1
+        task.add_done_callback(lambda t: self._finish(response_id, t))
+        return response_id
+
+    def skip(self) -> str:
+        """Record a response whose enrichment was skipped"""
+        response_id = uuid.uuid4().hex
+        with self._lock:
+            self.entries[response_id] = {
+                'status': 'skipped',
+                'data': {},
+                'task': None,
+                'created_at': time.time()
+            }
+            self._evict()
+            self.stats['skipped'] += 1
+        return response_id
+
+    def _finish(self, response_id: str, task: asyncio.Future):
+        with self._lock:
+            entry = self.entries.get(response_id)
+            if entry is None:
+                return
+            if task.cancelled():
+                entry['status'], entry['data'] = 'cancelled', {}
+                self.stats['cancelled'] += 1
+            elif task.exception() is not None:
+                entry['status'], entry['data'] = 'failed', {}
+                self.stats['failed'] += 1
+            else:
+                entry['status'], entry['data'] = 'done', task.result()
+                self.stats['completed'] += 1
+            entry['task'] = None
+
+    def _evict(self):
+        """Drop expired entries and the oldest ones beyond the size bound"""
+        cutoff = time.time() - self.ttl_seconds
+        excess = len(self.entries) - self.max_entries
+        for response_id, entry in list(self.entries.items()):
+            if excess <= 0 and entry['created_at'] > cutoff:
+                break
+            # Never drop work that is still running; finished entries behind it still go
+            if entry['task'] is not None:
+                continue
+            del self.entries[response_id]
+            excess -= 1
+
+    def get(self, response_id: str) -> Optional[Dict]:
+        """Status and, once finished, the enrichment fields for a response"""
+        with self._lock:
+            entry = self.entries.get(response_id)
+            if entry is None:
+                return None
+            return {'response_id': response_id, 'status': entry['status'], 'data': entry['data']}
+
+    async def wait(self, response_id: str, timeout: float) -> Optional[Dict]:
+        """Wait for a response's enrichment to finish, up to timeout seconds"""
+        with self._lock:
+            entry = self.entries.get(response_id)
+            task = entry['task'] if entry else None
+        if task is not None:
+            # asyncio.wait neither raises the task's error nor cancels it on timeout
+            await asyncio.wait({task}, timeout=timeout)
+        return self.get(response_id)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for entry in self.entries.values() if entry['task'] is not None)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'pending': self.pending}
@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional
+from collections import Counter, defaultdict
+import json
+import math
+import re
+
+STOP_WORDS = {
+    'the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but', 'to', 'of',
+    'in', 'for', 'my', 'me', 'i', 'you', 'your', 'it', 'do', 'does', 'can', 'how',
+    'what', 'with', 'be', 'are', 'this', 'that', 'please', 'we', 'our'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words"""
+    return [
+        token for token in re.findall(r'[a-z0-9]+', text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class KnowledgeRetriever:
+    def __init__(self, top_k: int = 3, max_tokens: int = 800):
+        self.top_k = top_k
+        self.max_tokens = max_tokens
+        # (sections, postings) replaced as one reference, so readers never see half an update
+        self.snapshot = ({}, {})
+        # Bumped on every applied change; the FAQ vectors and caches key on it
+        self.version = 0
+
+    @property
+    def sections(self) -> Dict[str, Dict]:
+        return self.snapshot[0]
+
+    @property
+    def postings(self) -> Dict[str, Dict[str, float]]:
+        return self.snapshot[1]
+
+    def index(self, knowledge_base: Dict):
+        """Split the knowledge base into sections and index them once"""
+        sections = {}
+        postings = defaultdict(dict)
+        for name, data in self._split_sections(knowledge_base):
+            sections[name], term_weights = self._section(name, data)
+            for term, weight in term_weights.items():
+                postings[term][name] = weight
+        self.snapshot = (sections, dict(postings))
+        self.version += 1
+
+    def export(self) -> Dict:
+        """Sections and postings as plain JSON-able data, for a compiled snapshot"""
+        sections, postings = self.snapshot
+        return {
+            'sections': {name: dict(section, terms=list(section['terms'])) for name, section in sections.items()},
+            'postings': postings
+        }
+
+    def load(self, state: Dict):
+        """Use sections and postings from export() instead of indexing again"""
+        sections = {name: dict(section, terms=tuple(section['terms'])) for name, section in state['sections'].items()}
+        self.snapshot = (sections, state['postings'])
+        self.version += 1
+
+    def update(self, knowledge_base: Dict) -> Dict[str, int]:
+        """Apply only the sections that changed since the last index or update"""
+        current = self.sections
+        new_sections = dict(self._split_sections(knowledge_base))
+        changes = {
+            name: data for name, data in new_sections.items()
+            if name not in current or current[name]['data'] != data
+        }
+        changes.update((name, None) for name in current if name not in new_sections)
+        return self.apply(changes)
+
+    def apply(self, changes: Dict[str, Optional[Dict]]) -> Dict[str, int]:
+        """Add, replace (data) or delete (None) sections by name, copying only what they touch"""
+        sections, postings = self.snapshot
+        sections = dict(sections)
+        postings = dict(postings)
+        copied = set()
+        counts = Counter()
+
+        def terms_of(term: str) -> Dict[str, float]:
+            # The live snapshot's inner dicts are shared, so copy each one before editing it
+            if term not in copied:
+                postings[term] = dict(postings.get(term, {}))
+                copied.add(term)
+            return postings[term]
+
+        for name, data in changes.items():
+            old = sections.pop(name, None)
+            if old is not None:
+                for term in old['terms']:
+                    docs = terms_of(term)
+                    docs.pop(name, None)
+                    if not docs:
+                        del postings[term]
+                        copied.discard(term)
+            if data is None:
+                counts['deleted' if old is not None else 'missing'] += 1
+                continue
+            sections[name], term_weights = self._section(name, data)
+            for term, weight in term_weights.items():
+                terms_of(term)[name] = weight
+            counts['updated' if old is not None else 'added'] += 1
+
+        if changes:
+            self.snapshot = (sections, postings)
+            self.version += 1
+        return dict(counts)
+
+    def _section(self, name: str, data: Dict) -> tuple:
+        """Section entry and its length-normalized term frequencies"""
+        text = json.dumps(data)
+        term_counts = Counter(tokenize(f"{name.replace('/', ' ')} {text}"))
+        length = sum(term_counts.values()) or 1
+        section = {
+            'data': data,
+            'tokens': estimate_tokens(text),
+            'terms': tuple(term_counts)
+        }
+        return section, {term: count / length for term, count in term_counts.items()}
+
+    def _split_sections(self, knowledge_base: Dict):
+        """Yield (section name, data) pairs at a useful granularity"""
+        for category, content in knowledge_base.items():
+            if isinstance(content, list):
+                for i, item in enumerate(content):
+                    yield f"{category}/{i}", item
+            elif isinstance(content, dict):
+                for key, value in content.items():
+                    # Troubleshooting guides are grouped one level deeper
+                    if category == 'troubleshooting' and isinstance(value, dict):
+                        for issue, guide in value.items():
+                            yield f"{category}/{key}/{issue}", guide
+                    else:
+                        yield f"{category}/{key}", value
+
+    def search(self, query: str) -> List[tuple]:
+        """Score every section matching the query, best first"""
+        return self._search(query, self.snapshot)
+
+    def _search(self, query: str, snapshot: tuple) -> List[tuple]:
+        sections, postings = snapshot
+        total = len(sections) or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + total / len(docs))
+            for name, tf in docs.items():
+                scores[name] += tf * idf
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        """Get the top-k sections for a query within the token ceiling"""
+        top_k = top_k or self.top_k
+        max_tokens = max_tokens or self.max_tokens
+
+        snapshot = self.snapshot
+        selected = {}
+        used_tokens = 0
+        for name, _ in self._search(query, snapshot):
+            if len(selected) >= top_k:
+                break
+            section = snapshot[0][name]
+            if used_tokens + section['tokens'] > max_tokens:
+                continue
+            selected[name] = section['data']
+            used_tokens += section['tokens']
+        return selected
@@ -0,0 +1,209 @@
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+MAGIC = b'KBSNAP01'
+FORMAT_VERSION = 1
+# Blocks start on cache-line boundaries so mapped arrays are aligned for NumPy
+ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+class SnapshotWriter:
+    """Collect named arrays, byte strings and JSON documents and write them as one file.
+
+    Layout: MAGIC, manifest length (uint64), JSON manifest, then each block
+    aligned to 64 bytes. The manifest records every block's offset (from the
+    start of the data section), length, dtype and shape.
+    """
+
+    def __init__(self):
+        self.blocks = {}
+
+    def add_array(self, name: str, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ValueError(f"Object arrays cannot be mapped: {name}")
+        self.blocks[name] = (array.tobytes(), array.dtype.str, list(array.shape))
+
+    def add_bytes(self, name: str, data: bytes):
+        self.blocks[name] = (bytes(data), 'bytes', [len(data)])
+
+    def add_json(self, name: str, value: Any):
+        self.blocks[name] = (json.dumps(value, separators=(',', ':')).encode(), 'json', [])
+
+    def add_strings(self, name: str, strings: Sequence[str]):
+        """A string table: concatenated UTF-8 plus an offsets array, read back without parsing"""
+        encoded = [s.encode() for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        self.add_array(f"{name}.offsets", offsets)
+        self.add_bytes(f"{name}.data", b''.join(encoded))
+
+    def write(self, path: str, meta: Optional[Dict] = None) -> Dict:
+        """Write atomically, so workers never map half a snapshot"""
+        manifest = {'format': FORMAT_VERSION, 'meta': meta or {}, 'blocks': {}}
+        offset = 0
+        for name, (data, dtype, shape) in self.blocks.items():
+            offset = _aligned(offset)
+            manifest['blocks'][name] = {'offset': offset, 'length': len(data), 'dtype': dtype, 'shape': shape}
+            offset += len(data)
+        header = json.dumps(manifest).encode()
+        data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, (data, _, _) in self.blocks.items():
+                f.seek(data_start + manifest['blocks'][name]['offset'])
+                f.write(data)
+        os.replace(tmp_path, path)
+        return manifest
+
+
+class Snapshot:
+    """Read-only memory map of a snapshot file; arrays are views into the shared page cache"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a knowledge base snapshot: {path}")
+        (length,) = struct.unpack_from('<Q', self.buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        manifest = json.loads(self.buffer[start:start + length])
+        if manifest.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {manifest.get('format')} in {path}")
+        self.meta = manifest['meta']
+        self.blocks = manifest['blocks']
+        self.data_start = _aligned(start + length)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.blocks
+
+    def _span(self, name: str) -> Tuple[int, int]:
+        block = self.blocks[name]
+        start = self.data_start + block['offset']
+        return start, start + block['length']
+
+    def array(self, name: str) -> np.ndarray:
+        block = self.blocks[name]
+        dtype = np.dtype(block['dtype'])
+        count = block['length'] // dtype.itemsize
+        start, _ = self._span(name)
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=start).reshape(block['shape'])
+
+    def bytes(self, name: str) -> memoryview:
+        start, end = self._span(name)
+        return memoryview(self.buffer)[start:end]
+
+    def json(self, name: str) -> Any:
+        start, end = self._span(name)
+        return json.loads(self.buffer[start:end])
+
+    def strings(self, name: str) -> 'StringTable':
+        return StringTable(self.array(f"{name}.offsets"), self.bytes(f"{name}.data"))
+
+    def documents(self, name: str) -> 'JsonList':
+        return JsonList(self.array(f"{name}.offsets"), self.bytes(f"{name}.data"))
+
+
+class StringTable:
+    """Strings stored back to back in a mapped buffer, decoded only when read"""
+
+    def __init__(self, offsets: np.ndarray, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.raw(i).decode()
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, value: str) -> int:
+        """Position of value in a table written in sorted (UTF-8 byte) order, or -1"""
+        target = value.encode()
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.raw(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self) and self.raw(low) == target else -1
+
+
+class JsonList(StringTable):
+    """Mapped JSON documents, parsed on access; replaced slots live on the heap"""
+
+    def __init__(self, offsets: np.ndarray, data: memoryview):
+        super().__init__(offsets, data)
+        self.overrides = {}
+
+    def __getitem__(self, i: int) -> Any:
+        if i in self.overrides:
+            return self.overrides[i]
+        return json.loads(self.raw(i))
+
+    def __setitem__(self, i: int, value: Any):
+        self.overrides[i] = value
+
+
+class LazyCategories(Mapping):
+    """Knowledge base categories read from a snapshot the first time each is used"""
+
+    def __init__(self, snapshot: Snapshot, prefix: str, names: List[str]):
+        self.snapshot = snapshot
+        self.prefix = prefix
+        self.names = list(names)
+        self.loaded = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.loaded:
+            if name not in self.names:
+                raise KeyError(name)
+            self.loaded[name] = self.snapshot.json(f"{self.prefix}{name}")
+        return self.loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class MappedRows:
+    """Dict-style lookups from sorted string keys to rows of a mapped array"""
+
+    def __init__(self, keys: StringTable, rows: np.ndarray):
+        self.keys = keys
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        position = self.keys.find(key)
+        return default if position < 0 else tuple(self.rows[position].tolist())
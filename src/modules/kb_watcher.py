@@ -0,0 +1,93 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from collections import defaultdict
+import logging
+import os
+import threading
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(modification time, size) of a file, None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SourceWatcher:
+    """Poll knowledge base source files and report the ones that changed.
+
+    Polling (rather than inotify and friends) works the same on every
+    platform and on network mounts. The callback runs on the watcher thread
+    and receives the changed paths; if it raises, the previous content stays
+    live and the files are retried once they change again (e.g. a half-written
+    file being completed).
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        callback: Callable[[List[str]], None],
+        interval_seconds: float = 2.0
+    ):
+        self.paths = list(paths)
+        self.callback = callback
+        self.interval_seconds = interval_seconds
+        self.signatures = {path: file_signature(path) for path in self.paths}
+        # Signatures whose reload failed, so a broken file isn't retried every poll
+        self.failed = {}
+        self.stats = defaultdict(int)
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='kb-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.check()
+
+    def check(self) -> List[str]:
+        """Poll once; returns the changed paths after handing them to the callback"""
+        self.stats['polls'] += 1
+        current = {path: file_signature(path) for path in self.paths}
+        changed = [
+            path for path in self.paths
+            if current[path] != self.signatures[path] and current[path] != self.failed.get(path)
+        ]
+        if not changed:
+            return []
+        try:
+            self.callback(changed)
+        except Exception as e:
+            self.failed.update((path, current[path]) for path in changed)
+            self.stats['errors'] += 1
+            self.last_error = str(e)
+            self.logger.error(f"Knowledge base reload failed for {changed}: {str(e)}")
+            return []
+        self.signatures.update((path, current[path]) for path in changed)
+        for path in changed:
+            self.failed.pop(path, None)
+        self.stats['reloads'] += 1
+        return changed
+
+    def get_stats(self) -> Dict:
+        return {
+            'paths': len(self.paths),
+            'polls': self.stats['polls'],
+            'reloads': self.stats['reloads'],
+            'errors': self.stats['errors'],
+            'last_error': self.last_error,
+            'running': self._thread is not None and self._thread.is_alive()
+        }
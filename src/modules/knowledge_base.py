@@ -1,16 +1,117 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import hashlib
 import json
+import logging
 import os
+import threading
+from collections import Counter
+import numpy as np
+from modules.kb_snapshot import LazyCategories, MappedRows, Snapshot, SnapshotWriter
+from modules.kb_watcher import SourceWatcher
+from modules.related_graph import RelatedGraph
+from modules.search_index import MappedSearchIndex, SearchIndex, flatten_text
+from modules.spell_correct import WORD, SpellCorrector
+from modules.vector_index import VectorIndex
+
+CATEGORIES = ('products', 'services', 'faqs', 'troubleshooting', 'policies')
 
 class KnowledgeBase:
-    def __init__(self):
-        self.categories = {
-            'products': self._load_products(),
-            'services': self._load_services(),
-            'faqs': self._load_faqs(),
-            'troubleshooting': self._load_troubleshooting(),
-            'policies': self._load_policies()
-        }
+    def __init__(
+        self,
+        vector_dim: int = 256,
+        vector_dtype: str = 'float32',
+        source_dir: Optional[str] = None,
+        watch_interval: Optional[float] = None,
+        snapshot: Optional[str] = None,
+        spelling: Optional[SpellCorrector] = None,
+        related_size: int = 5
+    ):
+        self.vector_dim = vector_dim
+        self.vector_dtype = vector_dtype
+        # Related-article lists: built on first use or compiled into the snapshot
+        self.related_size = related_size
+        self.related = None
+        # <source_dir>/<category>.json replaces a category's built-in entries
+        self.source_dir = source_dir
+        # Held while indexes are swapped or patched, so searches see whole versions
+        self.lock = threading.RLock()
+        # Serializes writers: reloads and reindexing
+        self.write_lock = threading.RLock()
+        # Bumped on every applied change; caches can key on it
+        self.version = 0
+        self.logger = logging.getLogger(__name__)
+        # Entry words are added to the corrector so misspelled queries still match; a private
+        # one unless the caller shares theirs, so one knowledge base never corrects toward another
+        self.spelling = spelling or SpellCorrector()
+        # Compiled by build_kb_snapshot.py; mapped read-only and shared by every worker
+        self.snapshot = None
+        if snapshot and os.path.exists(snapshot) and self._map_snapshot(snapshot):
+            self.logger.info(f"Mapped knowledge base snapshot {snapshot}")
+        else:
+            self.categories = {category: self._load_category(category) for category in CATEGORIES}
+            self.reindex()
+        self.watcher = SourceWatcher(
+            [self._source_path(category) for category in CATEGORIES],
+            self._reload_paths,
+            watch_interval
+        ) if source_dir and watch_interval else None
+        if self.watcher:
+            self.watcher.start()
+
+    def _map_snapshot(self, path: str) -> bool:
+        """Use the content and indexes of a snapshot without parsing or rebuilding them"""
+        snapshot = Snapshot(path)
+        if 'kb/categories' not in snapshot:
+            return False
+        self.categories = LazyCategories(snapshot, 'kb/categories/', snapshot.json('kb/categories'))
+        self.index = MappedSearchIndex(snapshot, 'kb/index/')
+        self.vectors = VectorIndex.load(snapshot, 'kb/vectors/')
+        self.locations = None
+        if 'kb/related/config' in snapshot:
+            self.related = RelatedGraph.load(snapshot, 'kb/related/')
+            self.entry_rows = MappedRows(snapshot.strings('kb/related/entries'), snapshot.array('kb/related/rows'))
+        else:
+            # Compiled before related articles existed: graph and rows are built on first use
+            self.entry_rows = None
+        if 'kb/vocabulary.offsets' in snapshot:
+            words = snapshot.strings('kb/vocabulary')
+            self.spelling.set_words('kb', dict(zip(words, snapshot.array('kb/vocabulary_counts').tolist())))
+        self.snapshot = snapshot
+        self.version += 1
+        return True
+
+    def add_to_snapshot(self, writer: SnapshotWriter):
+        """Add the categories and both indexes to a snapshot being compiled"""
+        if self.snapshot is not None:
+            raise ValueError("Compile snapshots from sources, not from another snapshot")
+        with self.write_lock, self.lock:
+            writer.add_json('kb/categories', list(self.categories))
+            for category, data in self.categories.items():
+                writer.add_json(f"kb/categories/{category}", data)
+            self.index.write(writer, 'kb/index/')
+            self.vectors.write(writer, 'kb/vectors/')
+            # Compiled here so workers never pay for the all-pairs comparison
+            live = self.vectors.live_rows()
+            self._related_graph().write(writer, 'kb/related/', live)
+            renumber = dict(zip(live.tolist(), range(len(live))))
+            entries = sorted(
+                ((f"{category}/{entry_id}", renumber[row]) for (category, entry_id), (_, row) in self.locations.items()),
+                key=lambda entry: entry[0].encode()
+            )
+            writer.add_strings('kb/related/entries', [name for name, _ in entries])
+            writer.add_array('kb/related/rows', np.array([[row] for _, row in entries], dtype=np.int64).reshape(-1, 1))
+            writer.add_strings('kb/vocabulary', list(self.vocabulary))
+            writer.add_array('kb/vocabulary_counts', np.array(list(self.vocabulary.values()), dtype=np.int64))
+
+    def _source_path(self, category: str) -> str:
+        return os.path.join(self.source_dir, f"{category}.json")
+
+    def _load_category(self, category: str) -> Any:
+        """A category's entries from its source file if there is one, else the built-in defaults"""
+        if self.source_dir and os.path.exists(self._source_path(category)):
+            with open(self._source_path(category), 'r') as f:
+                return json.load(f)
+        return getattr(self, f"_load_{category}")()
         
     def _load_products(self) -> Dict:
         return {
@@ -220,48 +321,169 @@ class KnowledgeBase:
             }
         }
 
-    def search(self, query: str, category: Optional[str] = None) -> List[Dict]:
-        """Search the knowledge base for relevant information"""
-        results = []
-        search_terms = query.lower().split()
-        
-        # Search in specific category if provided
-        if category and category in self.categories:
-            results.extend(self._search_category(category, search_terms))
-        else:
-            # Search all categories
-            for cat in self.categories:
-                results.extend(self._search_category(cat, search_terms))
-        
-        return results
+    def reindex(self):
+        """Rebuild both indexes from scratch, then swap them in; call after editing categories directly"""
+        with self.write_lock:
+            index = SearchIndex()
+            items = []
+            locations = {}
+            vocabulary = Counter()
+            for category, data in self.categories.items():
+                for entry_id, key, value in self._entries(data):
+                    text, result = self._entry(category, key, value)
+                    locations[(category, entry_id)] = (index.add(text, category, result), len(items))
+                    items.append((text, category, result))
+                    vocabulary.update(WORD.findall(text.lower()))
+            index.prepare()
+            vectors = VectorIndex(dim=self.vector_dim, dtype=self.vector_dtype)
+            vectors.build(items)
+            self.vocabulary = vocabulary
+            self.spelling.set_words('kb', vocabulary)
+            with self.lock:
+                self.index, self.vectors, self.locations = index, vectors, locations
+                # Rows were renumbered; the graph is rebuilt on next use
+                self.related = None
+                self.version += 1
 
-    def _search_category(self, category: str, search_terms: List[str]) -> List[Dict]:
-        """Search within a specific category"""
-        results = []
-        data = self.categories[category]
-        
+    def _entries(self, data: Any) -> Iterator[Tuple[str, Optional[str], Any]]:
+        """(entry id, key, value) for each entry; list entries are identified by their content"""
         if isinstance(data, dict):
             for key, value in data.items():
-                if self._matches_search(value, search_terms):
-                    results.append({
-                        'category': category,
-                        'key': key,
-                        'data': value
-                    })
+                yield key, key, value
         elif isinstance(data, list):
+            seen = {}
             for item in data:
-                if self._matches_search(item, search_terms):
-                    results.append({
-                        'category': category,
-                        'data': item
-                    })
-        
-        return results
+                digest = hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode()).hexdigest()[:16]
+                seen[digest] = seen.get(digest, 0) + 1
+                yield f"{digest}:{seen[digest]}", None, item
 
-    def _matches_search(self, data: Any, search_terms: List[str]) -> bool:
-        """Check if data matches search terms"""
-        data_str = json.dumps(data).lower()
-        return all(term in data_str for term in search_terms)
+    def _entry(self, category: str, key: Optional[str], value: Any) -> Tuple[str, Dict]:
+        """Indexed text and search result for one entry"""
+        result = {'category': category, 'data': value}
+        if key is not None:
+            result['key'] = key
+        text = ' '.join(flatten_text(value))
+        return (f"{key.replace('_', ' ')} {text}" if key else text), result
+
+    def apply_changes(self, category: str, data: Any) -> Dict[str, int]:
+        """Replace a category, reindexing only the entries that were added, changed or deleted"""
+        with self.write_lock:
+            if self.snapshot is not None:
+                # Mapped indexes are read-only; move to heap indexes once content changes
+                self.categories = {name: self.categories[name] for name in self.categories}
+                self.snapshot = None
+                self.reindex()
+            old = {entry_id: (key, value) for entry_id, key, value in self._entries(self.categories.get(category))}
+            new = {entry_id: (key, value) for entry_id, key, value in self._entries(data)}
+            stale = [entry_id for entry_id in old if entry_id not in new or new[entry_id][1] != old[entry_id][1]]
+            fresh = [entry_id for entry_id in new if entry_id not in old or new[entry_id][1] != old[entry_id][1]]
+            counts = {
+                'added': sum(1 for entry_id in fresh if entry_id not in old),
+                'updated': sum(1 for entry_id in fresh if entry_id in old),
+                'deleted': sum(1 for entry_id in stale if entry_id not in new)
+            }
+            with self.lock:
+                rows = []
+                for entry_id in stale:
+                    doc_number, row = self.locations.pop((category, entry_id))
+                    self.index.remove(doc_number)
+                    rows.append(row)
+                    self.vocabulary.subtract(WORD.findall(self._entry(category, *old[entry_id])[0].lower()))
+                self.vectors.remove(rows)
+                items = []
+                for entry_id in fresh:
+                    text, result = self._entry(category, *new[entry_id])
+                    items.append((text, category, result))
+                    self.vocabulary.update(WORD.findall(text.lower()))
+                    self.locations[(category, entry_id)] = (self.index.add(text, category, result), None)
+                added = self.vectors.add(items)
+                for entry_id, row in zip(fresh, added):
+                    self.locations[(category, entry_id)] = (self.locations[(category, entry_id)][0], row)
+                if self.related is not None:
+                    self.related.update(self.vectors, added, rows)
+                self.categories[category] = data
+                if stale or fresh:
+                    # Words of deleted entries leave the corrector too
+                    self.vocabulary = +self.vocabulary
+                    self.spelling.set_words('kb', self.vocabulary)
+                    self.version += 1
+            return counts
+
+    def reload(self, categories: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+        """Re-read categories from their sources and apply whatever changed"""
+        changes = {}
+        for category in categories or CATEGORIES:
+            counts = self.apply_changes(category, self._load_category(category))
+            if any(counts.values()):
+                changes[category] = counts
+        if changes:
+            self.logger.info(f"Knowledge base version {self.version}: {changes}")
+        # Once most rows are tombstones, a fresh build is smaller and refreshes the vector IDF
+        if len(self.vectors.removed) > len(self.vectors):
+            self.reindex()
+        return changes
+
+    def _reload_paths(self, paths: List[str]):
+        """SourceWatcher callback"""
+        self.reload([os.path.splitext(os.path.basename(path))[0] for path in paths])
+
+    def close(self):
+        if self.watcher:
+            self.watcher.stop()
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict]:
+        """Search the knowledge base, best BM25 match first.
+
+        An entry matches if it contains any query term; the previous scan
+        required every term. Low-overlap matches rank last, but callers now
+        get more results: 1030 instead of 224 over the 20 queries of the 10k-entry
+        benchmark. Use limit to keep pages short.
+        """
+        return self.search_page(query, category, limit, offset)['results']
+
+    def search_page(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: Optional[int] = 10,
+        offset: int = 0
+    ) -> Dict:
+        """One page of ranked results plus the total number of matches"""
+        if category and category not in self.categories:
+            category = None
+        query = self.spelling.correct(query)
+        with self.lock:
+            page, total = self.index.search(query, category, limit, offset)
+            version = self.version
+        return {
+            'results': [{**document, 'score': score} for score, document in page],
+            'query': query,
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'version': version
+        }
+
+    def semantic_search(
+        self,
+        query: str,
+        k: int = 5,
+        category: Optional[str] = None,
+        min_score: float = 0.0
+    ) -> List[Dict]:
+        """Closest entries by meaning rather than shared words, best cosine score first"""
+        if category and category not in self.categories:
+            category = None
+        query = self.spelling.correct(query)
+        with self.lock:
+            matches = self.vectors.search(query, k, category, min_score)
+        return [{**document, 'score': score} for score, document in matches]
 
     def get_product_comparison(self, products: List[str]) -> Dict:
         """Generate a comparison of specified products"""
@@ -271,10 +493,51 @@ class KnowledgeBase:
                 comparison[product] = self.categories['products'][product]['comparison_points']
         return comparison
 
-    def get_related_articles(self, category: str, key: str) -> List[Dict]:
-        """Get related articles for a specific item"""
-        results = []
-        if category in self.categories:
-            # Implementation depends on your relationship logic
-            pass
-        return results
\ No newline at end of file
+    def get_related_articles(self, category: str, key: Union[str, int]) -> List[Dict]:
+        """Entries most similar to one entry, best first; key is its key, or its position in a list category"""
+        if category not in self.categories or not self.related_size:
+            return []
+        if isinstance(key, int):
+            entries = list(self._entries(self.categories[category]))
+            if not 0 <= key < len(entries):
+                return []
+            key = entries[key][0]
+        while True:
+            related = self._related_graph()
+            with self.lock:
+                # A reindex between building and locking renumbers rows; use the new graph then
+                if self.related is not related:
+                    continue
+                if self.locations is not None:
+                    location = self.locations.get((category, key))
+                    row = location[1] if location else None
+                else:
+                    if self.entry_rows is None:
+                        self.entry_rows = self._match_entry_rows()
+                    location = self.entry_rows.get(f"{category}/{key}")
+                    row = location[0] if location else None
+                if row is None:
+                    return []
+                return [{**self.vectors.documents[neighbor], 'score': score} for neighbor, score in related.get(row)]
+
+    def _match_entry_rows(self) -> Dict[str, Tuple[int]]:
+        """Vector rows per entry for a snapshot that doesn't store them, found by document content"""
+        rows = {json.dumps(self.vectors.documents[row], sort_keys=True): int(row)
+                for row in self.vectors.live_rows()}
+        entry_rows = {}
+        for category, data in self.categories.items():
+            for entry_id, key, value in self._entries(data):
+                row = rows.get(json.dumps(self._entry(category, key, value)[1], sort_keys=True))
+                if row is not None:
+                    entry_rows[f"{category}/{entry_id}"] = (row,)
+        return entry_rows
+
+    def _related_graph(self) -> RelatedGraph:
+        """The related-article graph, built from the vector index the first time it is needed"""
+        if self.related is None:
+            with self.write_lock:
+                if self.related is None:
+                    graph = RelatedGraph(size=self.related_size)
+                    graph.build(self.vectors)
+                    self.related = graph
+        return self.related
\ No newline at end of file
@@ -0,0 +1,296 @@
+from typing import AsyncIterator, Dict, List, Optional
+from dataclasses import dataclass
+import asyncio
+import json
+import math
+import random
+import re
+import urllib.error
+import urllib.request
+
+# Separates the streamed reply text from the trailing JSON fields
+STREAM_META_MARKER = '###META###'
+
+
+@dataclass
+class LLMResult:
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class LLMBackendError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def estimate_message_tokens(messages: List[Dict]) -> int:
+    """Rough token count for a chat message list (~4 characters per token)"""
+    return sum(len(m.get('content', '')) for m in messages) // 4 + 4 * len(messages)
+
+
+class LLMBackend:
+    """Interface every model provider sits behind"""
+
+    async def complete(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> LLMResult:
+        raise NotImplementedError
+
+    async def stream(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> AsyncIterator[str]:
+        # Providers without native streaming send the whole completion at once
+        result = await self.complete(model, messages, stage)
+        yield result.content
+
+
+class OpenAIBackend(LLMBackend):
+    def __init__(self, api_key: Optional[str] = None):
+        import openai
+        self.openai = openai
+        if api_key:
+            openai.api_key = api_key
+
+    async def complete(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> LLMResult:
+        try:
+            response = await self.openai.ChatCompletion.acreate(model=model, messages=messages)
+        except self.openai.error.OpenAIError as e:
+            raise LLMBackendError(str(e), getattr(e, 'http_status', None)) from e
+
+        usage = response.get('usage', {})
+        return LLMResult(
+            content=response.choices[0].message.content,
+            model=model,
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            completion_tokens=usage.get('completion_tokens', 0)
+        )
+
+    async def stream(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> AsyncIterator[str]:
+        try:
+            response = await self.openai.ChatCompletion.acreate(model=model, messages=messages, stream=True)
+            async for chunk in response:
+                delta = chunk.choices[0].delta.get('content')
+                if delta:
+                    yield delta
+        except self.openai.error.OpenAIError as e:
+            raise LLMBackendError(str(e), getattr(e, 'http_status', None)) from e
+
+
+class LocalResponder:
+    """Builds deterministic, schema-valid answers for each prompt stage"""
+
+    TOPICS = {
+        'refund_request': ['refund', 'return', 'money back', 'send it back'],
+        'shipping': ['shipping', 'delivery', 'deliver', 'order', 'tracking'],
+        'technical_support': ['error', 'broken', 'not working', 'crash', 'bug'],
+        'account': ['login', 'log in', 'password', 'account'],
+        'billing': ['payment', 'charge', 'invoice', 'declined', 'bill'],
+        'pricing': ['price', 'pricing', 'cost', 'how much', 'plan'],
+        'warranty': ['warranty', 'guarantee']
+    }
+
+    def __init__(self, confidence: float = 0.92):
+        self.confidence = confidence
+
+    def respond(self, messages: List[Dict], stage: Optional[str]) -> str:
+        user_input = self._extract_user_input(messages)
+        topic = self._detect_topic(user_input)
+        stage = stage or 'answer'
+        if stage == 'repair':
+            # Answer as the stage whose output is being repaired
+            match = re.search(r'Target stage: (\w+)', messages[-1].get('content', ''))
+            stage = match.group(1) if match else 'answer'
+
+        analysis = {
+            'primary_intent': topic,
+            'secondary_intents': [],
+            'sentiment': 'neutral',
+            'urgency_level': 'low',
+            'required_information': [],
+            'suggested_actions': [f"Provide {topic.replace('_', ' ')} information"]
+        }
+        answer = {
+            'response': f"Here is the information about {topic.replace('_', ' ')} you asked for.",
+            'related_info': [],
+            'required_actions': [],
+            'topic': topic,
+            'status': 'resolved',
+            'confidence': self.confidence
+        }
+        suggestions = [
+            f"Would you like more details about {topic.replace('_', ' ')}?",
+            "Is there anything else I can help you with?",
+            "Would you like to talk to a support agent?"
+        ]
+
+        if stage == 'summary':
+            return f"The customer asked about {topic.replace('_', ' ')} and received an answer."
+        if stage == 'analysis':
+            return json.dumps(analysis)
+        if stage == 'suggestions':
+            return json.dumps(suggestions)
+        if stage == 'combined':
+            return json.dumps({'analysis': analysis, **answer, 'suggestions': suggestions})
+        if stage == 'stream':
+            text = answer.pop('response')
+            return f"{text}\n{STREAM_META_MARKER}{json.dumps({**answer, 'suggestions': suggestions})}"
+        return json.dumps(answer)
+
+    def _extract_user_input(self, messages: List[Dict]) -> str:
+        prompt = messages[-1].get('content', '') if messages else ''
+        match = re.search(r'User Input: "(.*?)"', prompt, re.DOTALL)
+        return (match.group(1) if match else prompt).lower()
+
+    def _detect_topic(self, text: str) -> str:
+        for topic, keywords in self.TOPICS.items():
+            if any(keyword in text for keyword in keywords):
+                return topic
+        return 'general_inquiry'
+
+
+class LocalBackend(LLMBackend):
+    """In-process stand-in with configurable latency and failure injection"""
+
+    def __init__(
+        self,
+        latency: Optional[Dict] = None,
+        failure_rate: float = 0.0,
+        failure_status: int = 503,
+        seed: int = 0,
+        tokens_per_second: float = 0.0,
+        confidence: float = 0.92,
+        model_latency: Optional[Dict[str, Dict]] = None,
+        malformed_rate: float = 0.0
+    ):
+        # latency: {'distribution': 'fixed'|'uniform'|'normal'|'lognormal', ...params in ms}
+        self.latency = latency or {'distribution': 'fixed', 'ms': 0}
+        # Per-model overrides of the latency config, e.g. a faster small model
+        self.model_latency = model_latency or {}
+        # Share of JSON replies returned fenced, chatty, truncated or as prose
+        self.malformed_rate = malformed_rate
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.tokens_per_second = tokens_per_second
+        self.random = random.Random(seed)
+        self.responder = LocalResponder(confidence)
+        self.calls = 0
+
+    def sample_latency(self, model: Optional[str] = None) -> float:
+        """Draw one latency sample in seconds"""
+        config = self.model_latency.get(model, self.latency)
+        distribution = config.get('distribution', 'fixed')
+        if distribution == 'uniform':
+            ms = self.random.uniform(config.get('min_ms', 0), config.get('max_ms', 0))
+        elif distribution == 'normal':
+            ms = self.random.gauss(config.get('mean_ms', 0), config.get('stddev_ms', 0))
+        elif distribution == 'lognormal':
+            # Parameterized by median and p95 so configs read like provider dashboards
+            median = max(config.get('median_ms', 1), 1e-3)
+            p95 = max(config.get('p95_ms', median), median)
+            sigma = math.log(p95 / median) / 1.645
+            ms = self.random.lognormvariate(math.log(median), sigma)
+        else:
+            ms = config.get('ms', 0)
+        return max(ms, 0) / 1000
+
+    def plan_call(self, messages: List[Dict], stage: Optional[str], model: Optional[str] = None) -> tuple:
+        """Decide latency, failure and content for one call (shared with the HTTP server)"""
+        self.calls += 1
+        delay = self.sample_latency(model)
+        fail = self.failure_rate > 0 and self.random.random() < self.failure_rate
+        content = self.responder.respond(messages, stage)
+        if stage not in ('stream', 'summary', 'repair') and self.malformed_rate and \
+                self.random.random() < self.malformed_rate:
+            content = self._malform(content)
+        return delay, fail, content
+
+    def _malform(self, content: str) -> str:
+        """Damage a JSON reply the way real models do"""
+        kind = self.random.choice(['fenced', 'prose', 'truncated', 'unusable'])
+        if kind == 'fenced':
+            return f"Here is the JSON you asked for:\n```json\n{content}\n```"
+        if kind == 'prose':
+            return f"{content}\n\nLet me know if you need anything else!"
+        if kind == 'truncated':
+            return content[:int(len(content) * 0.8)]
+        return "I'm sorry, I can't provide that in the requested format."
+
+    async def complete(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> LLMResult:
+        delay, fail, content = self.plan_call(messages, stage, model)
+        completion_tokens = max(1, len(content) // 4)
+        if self.tokens_per_second:
+            delay += completion_tokens / self.tokens_per_second
+
+        await asyncio.sleep(delay)
+        if fail:
+            raise LLMBackendError(f"Injected failure for model {model}", self.failure_status)
+
+        return LLMResult(
+            content=content,
+            model=model,
+            prompt_tokens=estimate_message_tokens(messages),
+            completion_tokens=completion_tokens
+        )
+
+    async def stream(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> AsyncIterator[str]:
+        delay, fail, content = self.plan_call(messages, stage or 'stream', model)
+
+        # Latency is time to first token; the rest trickles out per chunk
+        await asyncio.sleep(delay)
+        if fail:
+            raise LLMBackendError(f"Injected failure for model {model}", self.failure_status)
+
+        chunk_delay = 4 / self.tokens_per_second if self.tokens_per_second else 0
+        for i in range(0, len(content), 16):
+            yield content[i:i + 16]
+            await asyncio.sleep(chunk_delay)
+
+
+class HTTPBackend(LLMBackend):
+    """Client for an OpenAI-compatible endpoint such as local_llm_server.py"""
+
+    def __init__(self, base_url: str = 'http://127.0.0.1:8765', timeout: float = 30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _post(self, payload: Dict) -> Dict:
+        request = urllib.request.Request(
+            f"{self.base_url}/v1/chat/completions",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise LLMBackendError(f"HTTP {e.code} from {self.base_url}", e.code) from e
+        except urllib.error.URLError as e:
+            raise LLMBackendError(f"Cannot reach {self.base_url}: {e.reason}") from e
+
+    async def complete(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> LLMResult:
+        payload = {'model': model, 'messages': messages, 'metadata': {'stage': stage}}
+        response = await asyncio.to_thread(self._post, payload)
+        usage = response.get('usage', {})
+        return LLMResult(
+            content=response['choices'][0]['message']['content'],
+            model=response.get('model', model),
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            completion_tokens=usage.get('completion_tokens', 0)
+        )
+
+    async def stream(self, model: str, messages: List[Dict], stage: Optional[str] = None) -> AsyncIterator[str]:
+        result = await self.complete(model, messages, stage or 'stream')
+        yield result.content
+
+
+def create_backend(config: Optional[Dict] = None, api_key: Optional[str] = None) -> LLMBackend:
+    """Build a backend from the 'llm_backend' block of the company config"""
+    config = dict(config or {})
+    backend_type = config.pop('type', 'openai')
+    if backend_type == 'local':
+        return LocalBackend(**config)
+    if backend_type == 'http':
+        return HTTPBackend(**config)
+    if backend_type == 'openai':
+        return OpenAIBackend(api_key)
+    raise ValueError(f"Unknown LLM backend: {backend_type}")
+
@@ -0,0 +1,346 @@
+from typing import AsyncIterator, Dict, List, Optional
+from collections import defaultdict
+from contextvars import ContextVar
+import asyncio
+import random
+import time
+from modules.llm_backend import LLMBackend, LLMBackendError, LLMResult, estimate_message_tokens
+from modules.telemetry import Telemetry
+from modules.priority_scheduler import PriorityGate, request_priority
+
+
+# Per-request usage counters; tasks spawned by a request share its dict
+request_usage: ContextVar[Optional[Dict]] = ContextVar('request_usage', default=None)
+
+
+def track_request_usage() -> Dict:
+    """Start counting model calls and tokens for the current request context"""
+    usage = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+    request_usage.set(usage)
+    return usage
+
+
+class LLMOverloadedError(LLMBackendError):
+    """Raised when the call queue is full and the request is rejected"""
+
+
+class CircuitOpenError(LLMBackendError):
+    """Raised while the circuit breaker is failing fast"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Check whether a call may go to the provider"""
+        if self.state == 'open':
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = 'half_open'
+            self.probe_in_flight = False
+        if self.state == 'half_open':
+            # Let a single probe through to test the provider
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """Free the half-open probe slot if a call ended without a verdict"""
+        self.probe_in_flight = False
+
+    def record_success(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.times_opened += 1
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    """Shared call layer: concurrency limits, deadlines, retries and a circuit breaker"""
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        max_in_flight: int = 20,
+        max_in_flight_per_tenant: int = 10,
+        max_queue: int = 100,
+        timeout: float = 30,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        telemetry: Optional[Telemetry] = None,
+        aging_seconds: float = 5.0
+    ):
+        self.backend = backend
+        self.telemetry = telemetry
+        self.max_in_flight_per_tenant = max_in_flight_per_tenant
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # Both limits hand free slots to urgent work first; with one tenant per bot
+        # the tenant limit is the one requests actually queue on
+        self.global_slots = PriorityGate(max_in_flight, aging_seconds)
+        self.tenant_slots = defaultdict(lambda: PriorityGate(self.max_in_flight_per_tenant, aging_seconds))
+        self.in_flight = 0
+        self.tenant_in_flight = defaultdict(int)
+        self.queue_depth = 0
+        self.stats = defaultdict(int)
+        # Calls and tokens per model, to compare model tiers
+        self.usage = defaultdict(lambda: {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+
+    def _check_admission(self) -> bool:
+        """Fail fast when the queue is full or the breaker is open; True if this call is the half-open probe"""
+        # Queue first: a request turned away here must not use up the probe slot
+        if self.queue_depth >= self.max_queue:
+            self.stats['rejected_queue_full'] += 1
+            raise LLMOverloadedError("LLM call queue is full", 429)
+        if not self.breaker.allow():
+            self.stats['rejected_circuit_open'] += 1
+            raise CircuitOpenError("LLM circuit breaker is open", 503)
+        # While half-open, allow() only lets the probe through
+        return self.breaker.state == 'half_open'
+
+    async def _acquire(self, tenant: str, priority: Optional[int] = None) -> float:
+        """Wait for a tenant and a global slot; returns the time spent queued"""
+        start = time.perf_counter()
+        priority = request_priority.get() if priority is None else priority
+        self.queue_depth += 1
+        try:
+            await self.tenant_slots[tenant].acquire(priority)
+            try:
+                await self.global_slots.acquire(priority)
+            except BaseException:
+                self.tenant_slots[tenant].release()
+                raise
+        finally:
+            self.queue_depth -= 1
+        self.in_flight += 1
+        self.tenant_in_flight[tenant] += 1
+        return time.perf_counter() - start
+
+    def _release(self, tenant: str):
+        self.in_flight -= 1
+        self.tenant_in_flight[tenant] -= 1
+        self.global_slots.release()
+        self.tenant_slots[tenant].release()
+
+    @staticmethod
+    def _is_retryable(error: LLMBackendError) -> bool:
+        # Rate limits, server errors and connection failures (no status)
+        return error.status_code is None or error.status_code == 429 or error.status_code >= 500
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict],
+        stage: Optional[str] = None,
+        tenant: str = 'default',
+        timeout: Optional[float] = None,
+        priority: Optional[int] = None
+    ) -> LLMResult:
+        """Run one completion within the limits, deadline and retry policy"""
+        probe = self._check_admission()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self.stats['calls'] += 1
+
+        try:
+            queue_wait = await self._acquire(tenant, priority)
+        except asyncio.CancelledError:
+            if probe:
+                self.breaker.release_probe()
+            self._record_cancelled(model, estimate_message_tokens(messages))
+            raise
+        network = 0.0
+        attempt = 0
+        result = None
+        error = None
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                call_start = time.perf_counter()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    result = await asyncio.wait_for(
+                        self.backend.complete(model, messages, stage),
+                        timeout=remaining
+                    )
+                    network += time.perf_counter() - call_start
+                    self.breaker.record_success()
+                    self._record_usage(result)
+                    return result
+                except asyncio.CancelledError:
+                    # The prompt is already paid for; the completion is not generated
+                    network += time.perf_counter() - call_start
+                    error = 'cancelled'
+                    self._record_cancelled(model, 0)
+                    raise
+                except asyncio.TimeoutError:
+                    network += time.perf_counter() - call_start
+                    self.stats['timeouts'] += 1
+                    self.breaker.record_failure()
+                    error = 'timeout'
+                    raise LLMBackendError(f"LLM call exceeded its {timeout or self.timeout}s deadline", 504)
+                except LLMBackendError as e:
+                    network += time.perf_counter() - call_start
+                    error = f"status {e.status_code}" if e.status_code else 'connection error'
+                    if not self._is_retryable(e):
+                        # The provider answered, it just rejected this request
+                        self.stats['failures'] += 1
+                        self.breaker.record_success()
+                        raise
+                    delay = self._backoff(attempt)
+                    if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                        self.stats['failures'] += 1
+                        self.breaker.record_failure()
+                        raise
+                    attempt += 1
+                    self.stats['retries'] += 1
+                    await asyncio.sleep(delay)
+        finally:
+            # Only the call holding the probe slot may free it
+            if probe:
+                self.breaker.release_probe()
+            self._release(tenant)
+            if self.telemetry:
+                self.telemetry.record_call(
+                    stage or 'unknown',
+                    model,
+                    queue_wait,
+                    network,
+                    result.prompt_tokens if result else 0,
+                    result.completion_tokens if result else 0,
+                    attempt + 1,
+                    None if result else error
+                )
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict],
+        stage: Optional[str] = None,
+        tenant: str = 'default',
+        timeout: Optional[float] = None,
+        priority: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Stream a completion within the limits; every chunk must arrive before the call's deadline"""
+        probe = self._check_admission()
+        self.stats['calls'] += 1
+
+        try:
+            queue_wait = await self._acquire(tenant, priority)
+        except asyncio.CancelledError:
+            if probe:
+                self.breaker.release_probe()
+            self._record_cancelled(model, estimate_message_tokens(messages))
+            raise
+        call_start = time.perf_counter()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        error = None
+        # Streams carry no usage block, so tokens are estimated from the text
+        usage = LLMResult('', model, estimate_message_tokens(messages), 0)
+        streamed_chars = 0
+        try:
+            chunks = self.backend.stream(model, messages, stage)
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    # A provider that stalls mid-stream holds the slot as long as one that never starts
+                    self.stats['timeouts'] += 1
+                    self.breaker.record_failure()
+                    error = 'timeout'
+                    await chunks.aclose()
+                    raise LLMBackendError(f"LLM stream exceeded its {timeout or self.timeout}s deadline", 504)
+                except LLMBackendError as e:
+                    self.stats['failures'] += 1
+                    self.breaker.record_failure()
+                    error = f"status {e.status_code}" if e.status_code else 'connection error'
+                    raise
+                streamed_chars += len(chunk)
+                yield chunk
+            self.breaker.record_success()
+            if streamed_chars:
+                usage.completion_tokens = max(1, streamed_chars // 4)
+                self._record_usage(usage)
+        except (asyncio.CancelledError, GeneratorExit):
+            # Consumer went away mid-stream: the rest of the reply is never generated
+            error = 'cancelled'
+            usage.completion_tokens = streamed_chars // 4
+            self._record_cancelled(model, 0, usage.completion_tokens)
+            raise
+        finally:
+            # Only the call holding the probe slot may free it
+            if probe:
+                self.breaker.release_probe()
+            self._release(tenant)
+            if self.telemetry:
+                # Network time here spans the whole stream, including the client reading it
+                self.telemetry.record_call(
+                    stage or 'stream',
+                    model,
+                    queue_wait,
+                    time.perf_counter() - call_start,
+                    usage.prompt_tokens if usage.completion_tokens else 0,
+                    usage.completion_tokens,
+                    error=error
+                )
+
+    def _record_usage(self, result: LLMResult):
+        for usage in (self.usage[result.model], request_usage.get()):
+            if usage is not None:
+                usage['calls'] += 1
+                usage['prompt_tokens'] += result.prompt_tokens
+                usage['completion_tokens'] += result.completion_tokens
+
+    def _record_cancelled(self, model: str, prompt_tokens: int, completion_tokens: int = 0):
+        """Count a call abandoned by its caller and the tokens it didn't spend"""
+        self.stats['cancelled'] += 1
+        usage = self.usage.get(model)
+        # Expected reply length is this model's average so far
+        expected = usage['completion_tokens'] / usage['calls'] if usage and usage['calls'] else 0
+        self.stats['tokens_saved'] += prompt_tokens + max(0, round(expected) - completion_tokens)
+
+    def get_stats(self) -> Dict:
+        """Queue depth, in-flight counts, rejections and breaker state"""
+        return {
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'tenant_in_flight': {t: n for t, n in self.tenant_in_flight.items() if n},
+            'breaker_state': self.breaker.state,
+            'breaker_opened': self.breaker.times_opened,
+            'scheduling': self.global_slots.get_stats(),
+            'usage': {model: dict(usage) for model, usage in self.usage.items()},
+            **self.stats
+        }
@@ -0,0 +1,47 @@
+from typing import Dict, List, Optional
+from collections import defaultdict, deque
+import math
+import threading
+
+
+class LatencyRecorder:
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self.samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        """Record a single latency sample (in seconds) under a name"""
+        with self._lock:
+            self.samples[name].append(seconds)
+
+    def percentile(self, name: str, pct: float) -> Optional[float]:
+        """Get the given percentile (0-100) for a name, None if no samples"""
+        with self._lock:
+            values = sorted(self.samples.get(name, []))
+        return self._percentile(values, pct)
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> Optional[float]:
+        if not values:
+            return None
+        # Nearest-rank percentile: the smallest value with at least pct% of samples at or below it
+        index = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))
+        return values[index]
+
+    def report(self) -> Dict[str, Dict]:
+        """Summarize every recorded name with count, mean, p50 and p95 (ms)"""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self.samples.items()}
+
+        report = {}
+        for name, values in snapshot.items():
+            if not values:
+                continue
+            report[name] = {
+                'count': len(values),
+                'mean_ms': round(sum(values) / len(values) * 1000, 2),
+                'p50_ms': round(self._percentile(values, 50) * 1000, 2),
+                'p95_ms': round(self._percentile(values, 95) * 1000, 2)
+            }
+        return report
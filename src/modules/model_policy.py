@@ -0,0 +1,40 @@
+from typing import Dict, Optional
+
+# Classification-style stages get a small, fast model; customer-facing text a large one
+DEFAULT_STAGE_MODELS = {
+    'analysis': 'gpt-3.5-turbo',
+    'suggestions': 'gpt-3.5-turbo',
+    'summary': 'gpt-3.5-turbo',
+    'repair': 'gpt-3.5-turbo',
+    'answer': 'gpt-4',
+    'combined': 'gpt-4',
+    'stream': 'gpt-4'
+}
+
+# USD per 1K tokens (prompt, completion); adjust to current provider pricing
+MODEL_PRICES = {
+    'gpt-4': (0.03, 0.06),
+    'gpt-4o': (0.005, 0.015),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-3.5-turbo': (0.0005, 0.0015)
+}
+
+
+class ModelPolicy:
+    """Pick the model for each pipeline stage"""
+
+    def __init__(self, stages: Optional[Dict[str, str]] = None, default: str = 'gpt-4'):
+        self.default = default
+        self.stages = {**DEFAULT_STAGE_MODELS, **(stages or {})}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> 'ModelPolicy':
+        """Build from a tenant's 'models' block: {"default": ..., "stages": {...}}"""
+        config = config or {}
+        return cls(config.get('stages'), config.get('default', 'gpt-4'))
+
+    def model_for(self, stage: str) -> str:
+        return self.stages.get(stage) or self.default
+
+    def to_dict(self) -> Dict:
+        return {'default': self.default, 'stages': dict(self.stages)}
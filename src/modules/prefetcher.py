@@ -0,0 +1,254 @@
+from typing import Awaitable, Dict, List, Optional
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+import asyncio
+import re
+import time
+
+# Typical next steps after each topic, blended with the transitions actually observed.
+# They follow the service workflows: product -> pricing -> purchase and
+# issue -> troubleshooting -> ticket.
+DEFAULT_TRANSITIONS = {
+    'product_info': {'pricing': 0.5, 'availability': 0.3, 'comparison': 0.2},
+    'product_inquiry': {'pricing': 0.5, 'availability': 0.3, 'comparison': 0.2},
+    'comparison': {'pricing': 0.6, 'purchase': 0.4},
+    'pricing': {'purchase': 0.5, 'billing': 0.3, 'comparison': 0.2},
+    'purchase': {'shipping': 0.6, 'billing': 0.4},
+    'availability': {'shipping': 0.5, 'purchase': 0.5},
+    'shipping': {'tracking': 0.6, 'refund_request': 0.4},
+    'technical_support': {'troubleshooting': 0.6, 'ticket': 0.4},
+    'technical_issue': {'troubleshooting': 0.6, 'ticket': 0.4},
+    'complaint': {'ticket': 0.5, 'refund_request': 0.5},
+    'troubleshooting': {'ticket': 0.7, 'refund_request': 0.3},
+    'refund_request': {'refund_status': 0.6, 'ticket': 0.4},
+    'billing': {'refund_request': 0.5, 'ticket': 0.5},
+    'account': {'troubleshooting': 0.6, 'ticket': 0.4}
+}
+
+# What a customer usually asks when moving on to each intent
+INTENT_QUESTIONS = {
+    'pricing': "How much does it cost?",
+    'availability': "Is it in stock?",
+    'comparison': "What is the difference between the plans?",
+    'purchase': "How do I place an order?",
+    'billing': "What payment methods do you accept?",
+    'shipping': "How long does delivery take?",
+    'tracking': "How can I track my order?",
+    'troubleshooting': "What can I try to fix it?",
+    'ticket': "Can you open a support ticket for me?",
+    'refund_request': "How do I get a refund?",
+    'refund_status': "When will I get my refund?"
+}
+
+# True inside prefetch work, so its own lookups aren't counted as hits or misses
+prefetching: ContextVar[bool] = ContextVar('prefetching', default=False)
+
+
+def normalize(text: str) -> str:
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+class Prefetcher:
+    """Predicts likely next questions and keeps speculative answers and retrievals for them"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_answers_per_turn: int = 0,
+        max_retrievals_per_turn: int = 5,
+        max_in_flight: int = 10,
+        skip_queue_depth: int = 5,
+        min_probability: float = 0.2,
+        suggestion_weight: float = 0.4,
+        ttl_seconds: float = 300,
+        max_entries: int = 1000,
+        min_observations: int = 10
+    ):
+        self.enabled = enabled
+        # Prefetched answers are full model calls that only pay off on an exact
+        # repeat of the predicted question; off unless a deployment opts in
+        self.max_answers_per_turn = max_answers_per_turn
+        self.max_retrievals_per_turn = max_retrievals_per_turn
+        self.max_in_flight = max_in_flight
+        self.skip_queue_depth = skip_queue_depth
+        self.min_probability = min_probability
+        self.suggestion_weight = suggestion_weight
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.min_observations = min_observations
+        # topic -> next topic -> count
+        self.transitions = defaultdict(lambda: defaultdict(int))
+        # user_id -> normalized question -> {'version', 'task', 'created_at'}
+        self.answers = defaultdict(dict)
+        # normalized question -> (sections, created_at)
+        self.retrievals = OrderedDict()
+        # Bumped when the knowledge base changes; older predictions are stale
+        self.generation = 0
+        self.stats = defaultdict(int)
+
+    def observe(self, previous_topic: Optional[str], topic: Optional[str]):
+        """Learn from one topic change in a conversation"""
+        if previous_topic and topic:
+            self.transitions[previous_topic][topic] += 1
+
+    def next_intents(self, topic: Optional[str]) -> Dict[str, float]:
+        """Probability of each next intent after topic"""
+        prior = DEFAULT_TRANSITIONS.get(topic, {})
+        observed = self.transitions.get(topic, {})
+        total = sum(observed.values())
+        if not total:
+            return dict(prior)
+        # Trust observed transitions more as they accumulate
+        weight = min(1.0, total / self.min_observations)
+        intents = set(prior) | set(observed)
+        return {
+            intent: (1 - weight) * prior.get(intent, 0.0) + weight * observed.get(intent, 0) / total
+            for intent in intents
+        }
+
+    def predict(self, topic: Optional[str], suggestions: Optional[List[str]] = None) -> List[str]:
+        """Likely next questions, most probable first"""
+        candidates = {}
+        # Follow-ups offered to the customer are one click away
+        for suggestion in suggestions or []:
+            candidates.setdefault(normalize(suggestion), (self.suggestion_weight, suggestion))
+        for intent, probability in self.next_intents(topic).items():
+            question = INTENT_QUESTIONS.get(intent)
+            if question and probability >= self.min_probability:
+                key = normalize(question)
+                if probability > candidates.get(key, (0.0, None))[0]:
+                    candidates[key] = (probability, question)
+        ranked = sorted(candidates.values(), key=lambda c: c[0], reverse=True)
+        return [question for _, question in ranked]
+
+    @property
+    def in_flight(self) -> int:
+        return sum(1 for entries in self.answers.values() for entry in entries.values()
+                   if entry['task'] is not None and not entry['task'].done())
+
+    def answer_budget(self, user_id: str, version: int, queue_depth: int) -> int:
+        """How many more answers may be prefetched for this user's current turn"""
+        if not self.enabled or queue_depth >= self.skip_queue_depth:
+            return 0
+        started = sum(1 for entry in self.answers.get(user_id, {}).values() if entry['version'] == version)
+        return max(0, min(self.max_answers_per_turn - started, self.max_in_flight - self.in_flight))
+
+    def has_answer(self, user_id: str, question: str, version: int) -> bool:
+        entry = self.answers.get(user_id, {}).get(normalize(question))
+        return entry is not None and entry['version'] == version and not self._expired(entry)
+
+    def start_answer(self, user_id: str, question: str, version: int, work: Awaitable) -> asyncio.Future:
+        """Run answer work for a predicted question in the background"""
+        self._evict()
+        task = asyncio.ensure_future(work)
+        # Failures surface as misses in take_answer, or nowhere if never asked for
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.answers[user_id][normalize(question)] = {
+            'version': version,
+            'generation': self.generation,
+            'task': task,
+            'created_at': time.time()
+        }
+        self.stats['answers_started'] += 1
+        return task
+
+    async def take_answer(self, user_id: str, text: str, version: int) -> Optional[Dict]:
+        """Prefetched answer for this turn, if one was predicted; other predictions are dropped"""
+        entries = self.answers.pop(user_id, {})
+        entry = entries.pop(normalize(text), None)
+        for other in entries.values():
+            self._discard(other)
+
+        if entry is None or entry['version'] != version or self._expired(entry):
+            if entry is not None:
+                self._discard(entry)
+            if self.enabled:
+                self.stats['answer_misses'] += 1
+            return None
+        if not entry['task'].done():
+            # It runs at low priority; waiting on it would put the customer behind
+            # every normal call, so answer at this turn's own priority instead
+            self._discard(entry)
+            self.stats['answers_unfinished'] += 1
+            self.stats['answer_misses'] += 1
+            return None
+        try:
+            response_data = entry['task'].result()
+        except (Exception, asyncio.CancelledError):
+            self.stats['answer_misses'] += 1
+            return None
+        if response_data.get('error') or response_data.get('fallback'):
+            self.stats['answer_misses'] += 1
+            return None
+        self.stats['answer_hits'] += 1
+        return response_data
+
+    def _evict(self):
+        """Drop expired predictions, e.g. for customers who left the conversation"""
+        for user_id in list(self.answers):
+            entries = self.answers[user_id]
+            for key in [key for key, entry in entries.items() if self._expired(entry)]:
+                self._discard(entries.pop(key))
+            if not entries:
+                del self.answers[user_id]
+
+    def _expired(self, entry: Dict) -> bool:
+        return (time.time() - entry['created_at'] > self.ttl_seconds
+                or entry['generation'] != self.generation)
+
+    def _discard(self, entry: Dict):
+        """Drop a prediction that didn't come true, cancelling it if it is still running"""
+        task = entry['task']
+        if task is not None and not task.done():
+            task.cancel()
+            self.stats['answers_cancelled'] += 1
+        self.stats['answers_wasted'] += 1
+
+    def invalidate(self):
+        """Forget predictions made against an older knowledge base; safe from any thread"""
+        # Answers in flight are dropped as misses when taken or evicted, on their own loop
+        self.generation += 1
+        self.retrievals = OrderedDict()
+        self.stats['invalidations'] += 1
+
+    def warm_retrieval(self, question: str, sections: Dict):
+        """Keep retrieval results for a predicted question"""
+        self.retrievals[normalize(question)] = (sections, time.time())
+        self.retrievals.move_to_end(normalize(question))
+        while len(self.retrievals) > self.max_entries:
+            self.retrievals.popitem(last=False)
+        self.stats['retrievals_warmed'] += 1
+
+    def get_retrieval(self, text: str) -> Optional[Dict]:
+        """Warmed retrieval results for a query, if it was predicted"""
+        if not self.enabled:
+            return None
+        entry = self.retrievals.get(normalize(text))
+        counted = not prefetching.get()
+        if entry is None or time.time() - entry[1] > self.ttl_seconds:
+            if counted:
+                self.stats['retrieval_misses'] += 1
+            return None
+        if counted:
+            self.stats['retrieval_hits'] += 1
+        return entry[0]
+
+    def has_retrieval(self, question: str) -> bool:
+        entry = self.retrievals.get(normalize(question))
+        return entry is not None and time.time() - entry[1] <= self.ttl_seconds
+
+    def get_stats(self) -> Dict:
+        """Prefetch spend and how often it paid off"""
+        stats = {key: self.stats[key] for key in
+                 ('answers_started', 'answer_hits', 'answer_misses', 'answers_wasted', 'answers_cancelled',
+                  'answers_unfinished',
+                  'retrievals_warmed', 'retrieval_hits', 'retrieval_misses', 'invalidations')}
+        turns = stats['answer_hits'] + stats['answer_misses']
+        stats['answer_hit_rate'] = round(stats['answer_hits'] / turns, 3) if turns else 0.0
+        # Share of prefetched answers that were actually used
+        stats['answer_precision'] = (round(stats['answer_hits'] / stats['answers_started'], 3)
+                                     if stats['answers_started'] else 0.0)
+        lookups = stats['retrieval_hits'] + stats['retrieval_misses']
+        stats['retrieval_hit_rate'] = round(stats['retrieval_hits'] / lookups, 3) if lookups else 0.0
+        stats['in_flight'] = self.in_flight
+        return stats
@@ -0,0 +1,88 @@
+from typing import Dict
+from collections import defaultdict
+from contextvars import ContextVar
+import asyncio
+import heapq
+import itertools
+import time
+from modules.metrics import LatencyRecorder
+
+# Lower numbers are served first
+PRIORITY_CRITICAL = 0   # escalated conversations, urgent and upset customers
+PRIORITY_HIGH = 1       # urgent or negative sentiment
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3        # background work: summaries, enrichment
+
+PRIORITY_NAMES = {
+    PRIORITY_CRITICAL: 'critical',
+    PRIORITY_HIGH: 'high',
+    PRIORITY_NORMAL: 'normal',
+    PRIORITY_LOW: 'low'
+}
+
+# Priority of the request being handled; tasks it spawns inherit it unless they set their own
+request_priority: ContextVar[int] = ContextVar('request_priority', default=PRIORITY_NORMAL)
+
+
+class PriorityGate:
+    """Concurrency limit that hands free slots to the most important waiter first.
+
+    Waiting time ages a request: every aging_seconds spent queued counts as one
+    priority level, so low-priority work is delayed under load but never starved.
+    """
+
+    def __init__(self, capacity: int, aging_seconds: float = 5.0):
+        self.capacity = capacity
+        self.available = capacity
+        self.aging_seconds = aging_seconds
+        self.waiters = []
+        self._sequence = itertools.count()
+        self.waiting = defaultdict(int)
+        self.wait_times = LatencyRecorder()
+        self.dispatched = defaultdict(int)
+
+    def _rank(self, priority: int, enqueued_at: float) -> float:
+        # priority - waited / aging_seconds, shifted by "now" so the rank never changes
+        return priority * self.aging_seconds + enqueued_at
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL):
+        enqueued_at = time.monotonic()
+        if self.available > 0 and not self.waiters:
+            self.available -= 1
+            self._record(priority, enqueued_at)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (self._rank(priority, enqueued_at), next(self._sequence), priority, future))
+        self.waiting[priority] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled, pass it on
+                self.release()
+            raise
+        finally:
+            self.waiting[priority] -= 1
+        self._record(priority, enqueued_at)
+
+    def release(self):
+        while self.waiters:
+            _, _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.available += 1
+
+    def _record(self, priority: int, enqueued_at: float):
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        self.dispatched[name] += 1
+        self.wait_times.record(name, time.monotonic() - enqueued_at)
+
+    def get_stats(self) -> Dict:
+        """Waiting requests and queue-wait percentiles per priority level"""
+        return {
+            'waiting': {PRIORITY_NAMES.get(p, str(p)): n for p, n in self.waiting.items() if n},
+            'dispatched': dict(self.dispatched),
+            'queue_wait': self.wait_times.report()
+        }
@@ -0,0 +1,295 @@
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+import re
+from intent_analyzer import IntentAnalyzer
+from modules.kb_retriever import KnowledgeRetriever, tokenize
+from modules.search_index import analyze
+from modules.spell_correct import SpellCorrector, pattern_words, shared_corrector
+from modules.vector_index import VectorIndex
+
+# IntentAnalyzer keyword groups that describe tone rather than what was asked
+TONE_KEYS = ('urgent', 'frustrated', 'positive', 'negative')
+
+# Intents answered from a template only when the message says nothing else
+SMALL_TALK = ('greeting', 'farewell')
+# Words that may accompany a greeting or farewell without asking for anything
+SMALL_TALK_FILLER = {'there', 'again', 'thanks', 'thank', 'everyone'}
+# Words that frame a question without adding to what is asked
+QUESTION_FILLER = {'need', 'want', 'know', 'tell', 'like', 'would', 'could', 'get', 'will', 'let',
+                   'when', 'where', 'much', 'many', 'about', 'find', 'out'}
+# Words a template already answers beyond the intent's own pattern
+INTENT_WORDS = {
+    'business_hours': {'business', 'opening', 'office', 'working', 'times', 'days', 'today',
+                       'weekend', 'weekends', 'close', 'closed'},
+    'pricing': {'plans', 'prices', 'costs', 'fee', 'fees', 'month', 'monthly', 'per', 'year'},
+    'support': {'team', 'customer', 'email', 'phone', 'number', 'someone', 'speak', 'talk', 'call'}
+}
+
+DEFAULT_THRESHOLDS = {
+    'greeting': 0.8,
+    'farewell': 0.8,
+    'business_hours': 0.7,
+    'pricing': 0.7,
+    'support': 0.7
+}
+
+
+class QueryRouter:
+    """Answer high-confidence intents from templates or the FAQ before calling the LLM"""
+
+    def __init__(
+        self,
+        company_data: Dict,
+        retriever: KnowledgeRetriever,
+        thresholds: Optional[Dict[str, float]] = None,
+        max_extra_words: int = 0,
+        kb_threshold: float = 0.75,
+        semantic_threshold: Optional[float] = 0.6,
+        semantic_margin: float = 0.1,
+        semantic_extra_words: int = 1,
+        vector_dim: int = 256,
+        spelling: Optional[SpellCorrector] = None
+    ):
+        self.company_data = company_data
+        self.retriever = retriever
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.max_extra_words = max_extra_words
+        self.kb_threshold = kb_threshold
+        self.semantic_threshold = semantic_threshold
+        self.semantic_margin = semantic_margin
+        self.semantic_extra_words = semantic_extra_words
+        self.vector_dim = vector_dim
+        self.faq_vectors = None
+        self.indexed_version = None
+        self.analyzer = IntentAnalyzer()
+        self.spelling = spelling or shared_corrector()
+        # Intent words outrank KB text when a typo is equally close to both
+        for pattern in self.analyzer.intent_patterns.values():
+            self.spelling.add_words(pattern_words(pattern), weight=10)
+        for keywords in self.analyzer.intent_keywords.values():
+            self.spelling.add_words((word for phrase in keywords for word in phrase.split()), weight=10)
+        self.stats = defaultdict(int)
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Primary intent and a confidence based on its margin over the runner-up"""
+        scores = self.analyzer.analyze(text)
+        # Upset or urgent customers always get the full pipeline
+        if any(scores.get(key, 0) > 0 for key in ('urgent', 'frustrated', 'negative')):
+            return 'general', 0.0
+
+        ranked = sorted(
+            ((intent, score) for intent, score in scores.items()
+             if intent not in TONE_KEYS and score > 0),
+            key=lambda x: x[1], reverse=True
+        )
+        if not ranked:
+            return 'general', 0.0
+
+        intent, top = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = (top - runner_up) / top
+
+        # Words the template does not cover mean the message asks for more than it answers
+        unexplained = [word for word in self._unexplained_words(text)
+                       if word not in self._explained_by(intent)]
+        if intent in SMALL_TALK and unexplained:
+            # "hi, my order is missing" is a support question, not a greeting
+            return intent, 0.0
+        if len(unexplained) > self.max_extra_words:
+            # "I need help with my order, it arrived broken" is not a request for contact details
+            return intent, 0.0
+        return intent, round(confidence, 2)
+
+    def route(self, text: str) -> Optional[Dict]:
+        """Return a local response, or None if the query should go to the LLM"""
+        self.stats['total'] += 1
+        corrected = self.spelling.correct(text)
+        intent, confidence = self.classify(corrected)
+        if corrected != text:
+            self.stats['corrected'] += 1
+            changed = self.classify(text)[0] != intent
+            self.stats['intent_changed'] += changed
+            self.spelling.record_intent('router', changed)
+        text = corrected
+
+        if confidence >= self.thresholds.get(intent, 1.01):
+            response = self._template_response(intent)
+            if response:
+                self.stats['template'] += 1
+                return self._build(response, intent, confidence, 'template')
+
+        faq = self._match_faq(text)
+        if faq:
+            self.stats['kb'] += 1
+            return self._build(faq['answer'], 'faq', faq['score'], 'kb')
+
+        faq = self._match_faq_semantic(text)
+        if faq:
+            self.stats['semantic'] += 1
+            return self._build(faq['answer'], 'faq', faq['score'], 'semantic')
+
+        self.stats['llm'] += 1
+        return None
+
+    def best_effort(self, text: str) -> Optional[Dict]:
+        """Closest local answer regardless of confidence, None if there is none"""
+        text = self.spelling.correct(text)
+        intent, _ = self.classify(text)
+        response = self._template_response(intent)
+        if response:
+            return self._build(response, intent, 0.5, 'degraded')
+        faq = self._match_faq(text, threshold=0.3) or self._match_faq_semantic(text, threshold=0.2, strict=False)
+        if faq:
+            return self._build(faq['answer'], 'faq', 0.5, 'degraded')
+        return None
+
+    def _build(self, response: str, intent: str, confidence: float, tier: str) -> Dict:
+        return {
+            'response': response,
+            'topic': intent,
+            'status': 'resolved',
+            'confidence': confidence,
+            'suggestions': self._suggestions(intent),
+            'routed': tier
+        }
+
+    def _unexplained_words(self, text: str) -> List[str]:
+        """Content words left once every intent pattern and keyword match is removed"""
+        remainder = text.lower()
+        for pattern in self.analyzer.intent_patterns.values():
+            remainder = re.sub(pattern, ' ', remainder)
+        for keywords in self.analyzer.intent_keywords.values():
+            for keyword in keywords:
+                remainder = re.sub(rf"\b{re.escape(keyword)}\b", ' ', remainder)
+        return tokenize(remainder)
+
+    def _explained_by(self, intent: str) -> set:
+        """Words the template for an intent covers on top of its pattern"""
+        if intent in SMALL_TALK:
+            return SMALL_TALK_FILLER
+        words = QUESTION_FILLER | INTENT_WORDS.get(intent, set())
+        if intent == 'pricing':
+            # "how much is the Basic plan" is answered by the price list
+            products = self.company_data.get('products', [])
+            if isinstance(products, list):
+                words = words | {word for product in products if isinstance(product, dict)
+                                 for word in tokenize(str(product.get('name', '')))}
+        return words
+
+    def _match_faq(self, text: str, threshold: Optional[float] = None) -> Optional[Dict]:
+        """Best FAQ whose question covers nearly the same words as the query"""
+        threshold = self.kb_threshold if threshold is None else threshold
+        query_terms = set(tokenize(text))
+        if not query_terms:
+            return None
+        sections = self.retriever.sections
+        for name, _ in self.retriever.search(text)[:3]:
+            if not name.startswith('faqs/') or name not in sections:
+                continue
+            faq = sections[name]['data']
+            question_terms = set(tokenize(faq.get('question', '')))
+            if not question_terms or not faq.get('answer'):
+                continue
+            overlap = len(query_terms & question_terms) / len(query_terms | question_terms)
+            if overlap >= threshold:
+                return {'answer': faq['answer'], 'score': round(overlap, 2)}
+        return None
+
+    def _match_faq_semantic(
+        self,
+        text: str,
+        threshold: Optional[float] = None,
+        strict: bool = True
+    ) -> Optional[Dict]:
+        """Closest FAQ question by meaning, for paraphrases that share few words with it
+
+        Strict matches must also beat the runner-up by a margin and leave at most
+        ``semantic_extra_words`` query words the question does not mention.
+        """
+        if self.semantic_threshold is None:
+            return None
+        threshold = self.semantic_threshold if threshold is None else threshold
+        # Rebuilt whenever the knowledge base changes; the FAQ section is small
+        if self.indexed_version != self.retriever.version:
+            self.indexed_version = self.retriever.version
+            self.faq_vectors = VectorIndex(dim=self.vector_dim)
+            self.faq_vectors.build(
+                (section['data']['question'], 'faqs', section['data'])
+                for name, section in self.retriever.sections.items()
+                if name.startswith('faqs/') and isinstance(section['data'], dict)
+                and section['data'].get('question') and section['data'].get('answer')
+            )
+        matches = self.faq_vectors.search(text, k=2)
+        if not matches or matches[0][0] < threshold:
+            return None
+        score, faq = matches[0]
+        if strict:
+            runner_up = matches[1][0] if len(matches) > 1 else 0.0
+            if score - runner_up < self.semantic_margin:
+                return None
+            # "return policy for digital products" is close to "return policy" but asks more
+            question = set(analyze(faq['question']))
+            extra = [word for word in tokenize(text)
+                     if word not in QUESTION_FILLER and analyze(word)[0] not in question]
+            if len(extra) > self.semantic_extra_words:
+                return None
+        return {'answer': faq['answer'], 'score': round(score, 2)}
+
+    def _company_name(self) -> str:
+        return (self.company_data.get('name') or self.company_data.get('company_name')
+                or 'our company')
+
+    def _template_response(self, intent: str) -> Optional[str]:
+        """Fill the template for an intent from the company config, None if data is missing"""
+        data = self.company_data
+        if intent == 'greeting':
+            return data.get('greeting_message') or f"Hello! Welcome to {self._company_name()}. How can I help you today?"
+
+        if intent == 'farewell':
+            return data.get('farewell_message') or f"Thank you for contacting {self._company_name()}. Have a great day!"
+
+        if intent == 'business_hours':
+            hours = data.get('business_hours')
+            if not hours:
+                return None
+            if isinstance(hours, dict):
+                hours = ", ".join(
+                    f"{day}: {times['open']} - {times['close']}" if isinstance(times, dict) else f"{day}: {times}"
+                    for day, times in hours.items()
+                )
+            return f"Our business hours are {hours}."
+
+        if intent == 'pricing':
+            products = [p for p in data.get('products', []) if p.get('price')]
+            if not products:
+                return None
+            lines = "\n".join(f"• {p['name']}: {p['price']}" for p in products)
+            return f"Here is our current pricing:\n{lines}\nWould you like more details about any of these?"
+
+        if intent == 'support':
+            channels = []
+            if data.get('support_email'):
+                channels.append(f"• Email: {data['support_email']}")
+            phone = data.get('phone') or data.get('phone_number')
+            if phone:
+                channels.append(f"• Phone: {phone}")
+            if not channels:
+                return None
+            return "You can reach our support team through:\n" + "\n".join(channels)
+
+        return None
+
+    def _suggestions(self, intent: str) -> List[str]:
+        if intent == 'pricing':
+            return ["Which plan is right for me?", "Can I talk to sales?"]
+        if intent == 'faq':
+            return ["Is there anything else I can help you with?"]
+        return ["What products do you offer?", "How can I contact support?"]
+
+    def get_stats(self) -> Dict:
+        """Requests per tier, the share answered without the LLM and how often typos changed the intent"""
+        stats = {tier: self.stats[tier] for tier in ('total', 'template', 'kb', 'semantic', 'llm',
+                                                     'corrected', 'intent_changed')}
+        bypassed = stats['template'] + stats['kb'] + stats['semantic']
+        stats['bypass_rate'] = round(bypassed / stats['total'], 3) if stats['total'] else 0.0
+        return stats
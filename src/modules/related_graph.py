@@ -0,0 +1,122 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+from modules.vector_index import VectorIndex
+
+
+class RelatedGraph:
+    """The most similar entries for every row of a VectorIndex, looked up with one array read.
+
+    Neighbor lists are computed in batches of rows, each batch one matrix
+    product against the whole index, so the all-pairs comparison happens once
+    (at snapshot compile time or on first use) instead of per request. Changed
+    entries are patched in: only their own lists, the lists that pointed at
+    deleted rows and the lists new rows outscore are recomputed. Slots hold
+    vector rows; -1 marks an empty one.
+    """
+
+    def __init__(self, size: int = 5, min_score: float = 0.15, batch_rows: int = 512):
+        self.size = size
+        self.min_score = min_score
+        self.batch_rows = batch_rows
+        self.neighbors = np.full((0, size), -1, dtype=np.int32)
+        self.scores = np.zeros((0, size), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.neighbors)
+
+    def build(self, vectors: VectorIndex):
+        """Neighbor lists for every live row, replacing any built before"""
+        self.neighbors = np.full((len(vectors.matrix), self.size), -1, dtype=np.int32)
+        self.scores = np.zeros((len(vectors.matrix), self.size), dtype=np.float32)
+        self._refresh(vectors, vectors.live_rows())
+
+    def update(self, vectors: VectorIndex, added: Sequence[int], removed: Sequence[int]):
+        """Patch the lists after rows were appended to or removed from vectors"""
+        added = np.asarray(added, dtype=np.int64)
+        removed = np.asarray(removed, dtype=np.int64)
+        grow = len(vectors.matrix) - len(self.neighbors)
+        if grow > 0:
+            self.neighbors = np.concatenate([self.neighbors, np.full((grow, self.size), -1, dtype=np.int32)])
+            self.scores = np.concatenate([self.scores, np.zeros((grow, self.size), dtype=np.float32)])
+
+        stale = np.zeros(0, dtype=np.int64)
+        if len(removed):
+            self.neighbors[removed] = -1
+            self.scores[removed] = 0
+            # Lists that lose an entry are recomputed, which also lets them pick up added rows
+            stale = np.flatnonzero(np.isin(self.neighbors, removed).any(axis=1))
+            self._refresh(vectors, stale)
+
+        settled = np.union1d(np.union1d(stale, added), removed)
+        for start in range(0, len(added), self.batch_rows):
+            batch = added[start:start + self.batch_rows]
+            scores = vectors.similarities(vectors.row_vectors(batch))
+            own = scores.copy()
+            own[np.arange(len(batch)), batch] = -np.inf
+            self.neighbors[batch], self.scores[batch] = self._top(own)
+
+            # Existing rows take an added row only if it beats their weakest neighbor
+            incoming = scores.T
+            incoming[settled] = -np.inf
+            floor = np.where(self.neighbors[:, -1] >= 0, self.scores[:, -1], self.min_score)
+            rows = np.flatnonzero((incoming >= np.maximum(floor, self.min_score)[:, None]).any(axis=1))
+            if not len(rows):
+                continue
+            current = np.where(self.neighbors[rows] >= 0, self.scores[rows], -np.inf)
+            self.neighbors[rows], self.scores[rows] = self._top(
+                np.hstack([current, incoming[rows]]),
+                np.hstack([self.neighbors[rows], np.broadcast_to(batch, (len(rows), len(batch)))])
+            )
+
+    def _refresh(self, vectors: VectorIndex, rows: np.ndarray):
+        """Recompute the lists of rows against the whole index"""
+        for start in range(0, len(rows), self.batch_rows):
+            batch = rows[start:start + self.batch_rows]
+            scores = vectors.similarities(vectors.row_vectors(batch))
+            scores[np.arange(len(batch)), batch] = -np.inf
+            self.neighbors[batch], self.scores[batch] = self._top(scores)
+
+    def _top(self, scores: np.ndarray, candidates: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best size columns of each row as (rows, scores); candidates maps columns to rows if given"""
+        k = min(self.size, scores.shape[1])
+        neighbors = np.full((len(scores), self.size), -1, dtype=np.int32)
+        best = np.zeros((len(scores), self.size), dtype=np.float32)
+        if not k:
+            return neighbors, best
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if candidates is not None:
+            top = np.take_along_axis(candidates, top, axis=1)
+        keep = top_scores >= self.min_score
+        neighbors[:, :k] = np.where(keep, top, -1)
+        best[:, :k] = np.where(keep, top_scores, 0)
+        return neighbors, best
+
+    def get(self, row: int) -> List[Tuple[int, float]]:
+        """(row, score) of the entries most like row, best first"""
+        if not 0 <= row < len(self.neighbors):
+            return []
+        return [
+            (int(neighbor), round(float(score), 4))
+            for neighbor, score in zip(self.neighbors[row], self.scores[row]) if neighbor >= 0
+        ]
+
+    def write(self, writer, prefix: str, live: np.ndarray):
+        """Add the lists of the live rows to a SnapshotWriter, renumbered as the snapshot's vector rows"""
+        # One spare slot at the end stays -1, so empty slots (-1) map to -1 as well
+        renumber = np.full(len(self.neighbors) + 1, -1, dtype=np.int32)
+        renumber[live] = np.arange(len(live), dtype=np.int32)
+        writer.add_json(f"{prefix}config", {'size': self.size, 'min_score': self.min_score})
+        writer.add_array(f"{prefix}neighbors", renumber[self.neighbors[live]])
+        writer.add_array(f"{prefix}scores", self.scores[live])
+
+    @classmethod
+    def load(cls, snapshot, prefix: str) -> 'RelatedGraph':
+        """Read-only graph over the mapped snapshot; the knowledge base rebuilds it once content changes"""
+        graph = cls(**snapshot.json(f"{prefix}config"))
+        graph.neighbors = snapshot.array(f"{prefix}neighbors")
+        graph.scores = snapshot.array(f"{prefix}scores")
+        return graph
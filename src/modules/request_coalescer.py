@@ -0,0 +1,49 @@
+from typing import Awaitable, Callable, Dict
+import asyncio
+import copy
+
+
+class RequestCoalescer:
+    """Share one in-flight computation between concurrent identical requests"""
+
+    def __init__(self):
+        self.in_flight = {}
+        self.stats = {
+            'computations': 0,
+            'coalesced': 0,
+            'abandoned': 0
+        }
+
+    async def run(self, key: str, factory: Callable[[], Awaitable]):
+        """Await the in-flight computation for key, starting it if there is none"""
+        entry = self.in_flight.get(key)
+        if entry is None:
+            # The work runs as its own task so one waiter going away
+            # doesn't cancel it for everyone else
+            entry = {'task': asyncio.ensure_future(factory()), 'waiters': 0}
+            self.in_flight[key] = entry
+            entry['task'].add_done_callback(lambda _: self._forget(key, entry))
+            self.stats['computations'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        entry['waiters'] += 1
+        try:
+            result = await asyncio.shield(entry['task'])
+        except asyncio.CancelledError:
+            entry['waiters'] -= 1
+            if entry['waiters'] == 0 and not entry['task'].done():
+                entry['task'].cancel()
+                self.stats['abandoned'] += 1
+            raise
+        entry['waiters'] -= 1
+
+        # Every waiter gets its own copy to apply per-user context to
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, entry: Dict):
+        if self.in_flight.get(key) is entry:
+            del self.in_flight[key]
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'in_flight': len(self.in_flight)}
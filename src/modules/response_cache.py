@@ -0,0 +1,173 @@
+from typing import Dict, Optional
+from collections import OrderedDict
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Relative database paths are resolved against the repository root, not the working directory
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a key"""
+    query = re.sub(r'[^\w\s]', ' ', query.lower())
+    return ' '.join(query.split())
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        db_path: Optional[str] = 'data/response_cache.db',
+        max_disk_entries: int = 10000
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = os.path.join(REPO_ROOT, db_path) if db_path else None
+        self.max_disk_entries = max_disk_entries
+
+        # In-process LRU tier: key -> (expires_at, value)
+        self.memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expired': 0
+        }
+
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        """Create the shared on-disk tier"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(self.db_path, timeout=5) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS response_cache
+                            (key TEXT PRIMARY KEY, value TEXT,
+                            expires_at REAL, created_at REAL)''')
+            conn.execute('''CREATE INDEX IF NOT EXISTS idx_response_cache_created
+                            ON response_cache (created_at)''')
+
+    @staticmethod
+    def make_key(query: str, tenant: str, version: str) -> str:
+        """Build a cache key from the normalized query, tenant and KB version"""
+        raw = f"{tenant}\x00{version}\x00{normalize_query(query)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Look up a key in memory first, then on disk in a worker thread"""
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry:
+                expires_at, value = entry
+                if expires_at > now:
+                    self.memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return copy.deepcopy(value)
+                del self.memory[key]
+                self.stats['expired'] += 1
+
+        # SQLite blocks; keep it off the event loop that serves every other request
+        entry = await asyncio.to_thread(self._disk_get, key, now) if self.db_path else None
+        with self._lock:
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['disk_hits'] += 1
+        # Promote to the memory tier with the expiry written by the owner
+        value, expires_at = entry
+        self._memory_set(key, value, expires_at)
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: Dict):
+        """Store a value in both tiers, writing the disk tier in a worker thread"""
+        expires_at = time.time() + self.ttl_seconds
+        value = copy.deepcopy(value)
+        self._memory_set(key, value, expires_at)
+        if self.db_path:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+        with self._lock:
+            self.stats['sets'] += 1
+
+    def _memory_set(self, key: str, value: Dict, expires_at: float):
+        with self._lock:
+            self.memory[key] = (expires_at, value)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        if not self.db_path:
+            return None
+        try:
+            with sqlite3.connect(self.db_path, timeout=5) as conn:
+                row = conn.execute('SELECT value, expires_at FROM response_cache WHERE key = ?',
+                                   (key,)).fetchone()
+            if not row:
+                return None
+            if row[1] <= now:
+                with self._lock:
+                    self.stats['expired'] += 1
+                return None
+            return json.loads(row[0]), row[1]
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def _disk_set(self, key: str, value: Dict, expires_at: float):
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path, timeout=5) as conn:
+                conn.execute('''INSERT OR REPLACE INTO response_cache
+                                (key, value, expires_at, created_at)
+                                VALUES (?, ?, ?, ?)''',
+                             (key, json.dumps(value), expires_at, time.time()))
+                self._writes += 1
+                # Trim the shared tier every 100 writes rather than on each one
+                if self._writes % 100 == 0:
+                    self._disk_evict(conn)
+        except (sqlite3.Error, TypeError, ValueError):
+            pass
+
+    def _disk_evict(self, conn: sqlite3.Connection):
+        """Drop expired rows and the oldest rows beyond the size bound"""
+        conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (time.time(),))
+        removed = conn.execute('''DELETE FROM response_cache WHERE key IN
+                                  (SELECT key FROM response_cache
+                                  ORDER BY created_at DESC LIMIT -1 OFFSET ?)''',
+                               (self.max_disk_entries,)).rowcount
+        with self._lock:
+            self.stats['evictions'] += max(removed, 0)
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self.memory.clear()
+        if self.db_path:
+            with sqlite3.connect(self.db_path, timeout=5) as conn:
+                conn.execute('DELETE FROM response_cache')
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_size'] = len(self.memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        return stats
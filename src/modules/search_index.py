@@ -0,0 +1,275 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import Counter, defaultdict
+from functools import lru_cache
+import heapq
+import json
+import math
+import re
+import numpy as np
+from modules.kb_retriever import STOP_WORDS
+
+# Longest first; (suffix, replacement, minimum stem length left behind)
+SUFFIX_RULES = (
+    ('ational', 'ate', 2), ('ization', 'ize', 2), ('fulness', 'ful', 2), ('iveness', 'ive', 2),
+    ('ations', 'ate', 2), ('ation', 'ate', 2), ('ments', '', 3), ('ment', '', 3),
+    ('ness', '', 3), ('ingly', '', 3), ('ing', '', 3), ('edly', '', 3), ('ied', 'y', 2),
+    ('ies', 'y', 2), ('sses', 'ss', 2), ('ed', '', 3), ('ly', '', 3), ('es', '', 3), ('s', '', 3)
+)
+VOWELS = set('aeiouy')
+
+
+@lru_cache(maxsize=100000)
+def stem(token: str) -> str:
+    """Light suffix-stripping stemmer: refunds/refunded/refunding -> refund"""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    base = _strip_suffix(token)
+    # price/pricing, charge/charged: a final silent e is dropped from every stem
+    return base[:-1] if len(base) > 4 and base.endswith('e') else base
+
+
+def _strip_suffix(token: str) -> str:
+    for suffix, replacement, min_stem in SUFFIX_RULES:
+        if not token.endswith(suffix):
+            continue
+        base = token[:-len(suffix)]
+        if len(base) < min_stem or not VOWELS & set(base):
+            continue
+        # "ss" and "us"/"is" endings are not plurals (access, status, analysis)
+        if suffix == 's' and base[-1] in 'sui':
+            return token
+        # "es" only after sibilants (boxes, matches), otherwise just drop the "s"
+        if suffix == 'es' and not re.search(r'(s|x|z|ch|sh)$', base):
+            base, replacement = token[:-1], ''
+        # running -> runn -> run
+        if suffix in ('ing', 'ed') and len(base) > 3 and base[-1] == base[-2] and base[-1] not in 'lsz':
+            base = base[:-1]
+        return base + replacement
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    """Lowercased, stop-word filtered, stemmed tokens"""
+    return [
+        stem(token) for token in re.findall(r'[a-z0-9]+', text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def flatten_text(value: Any) -> Iterator[str]:
+    """Every string, number and key in a nested entry"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key).replace('_', ' ')
+            yield from flatten_text(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from flatten_text(item)
+    elif value is not None:
+        yield str(value)
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking, built once at load time and updated incrementally"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, drift: float = 0.05):
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        # term -> [(doc_number, term_frequency)]
+        self.postings = defaultdict(list)
+        # term -> [(doc_number, BM25 term weight)], recomputed lazily for dirty terms
+        self.weights = {}
+        self.dirty = set()
+        self.lengths = []
+        self.doc_terms = []
+        self.removed = set()
+        self.live = 0
+        self.total_length = 0
+        self.avg_length = 0.0
+        # Average length the cached weights were computed with; all are refreshed past drift
+        self.weights_avg_length = 0.0
+        self.drift = drift
+        self.categories = defaultdict(set)
+
+    def add(self, text: str, category: str, document: Dict) -> int:
+        """Index one document; document is returned as-is from search"""
+        doc_number = len(self.documents)
+        terms = analyze(text)
+        counts = Counter(terms)
+        for term, count in counts.items():
+            self.postings[term].append((doc_number, count))
+        self.dirty.update(counts)
+        self.documents.append(document)
+        self.doc_terms.append(tuple(counts))
+        self.lengths.append(len(terms))
+        self.live += 1
+        self.total_length += len(terms)
+        self.avg_length = self.total_length / self.live
+        self.categories[category].add(doc_number)
+        return doc_number
+
+    def remove(self, doc_number: int):
+        """Drop a document; its postings are compacted the next time one of its terms is scored"""
+        if doc_number in self.removed or doc_number >= len(self.documents):
+            return
+        self.removed.add(doc_number)
+        self.dirty.update(self.doc_terms[doc_number])
+        self.live -= 1
+        self.total_length -= self.lengths[doc_number]
+        self.avg_length = self.total_length / self.live if self.live else 0.0
+        for members in self.categories.values():
+            members.discard(doc_number)
+        self.documents[doc_number] = None
+        self.doc_terms[doc_number] = ()
+
+    def prepare(self):
+        """Compute every term's weights now rather than on its first query"""
+        for term in list(self.postings):
+            self._term_weights(term)
+
+    def __len__(self) -> int:
+        return self.live
+
+    def _idf(self, term: str) -> float:
+        frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (self.live - frequency + 0.5) / (frequency + 0.5))
+
+    def score(self, query: str, category: Optional[str] = None) -> Dict[int, float]:
+        """BM25 score of every document containing a query term"""
+        allowed = self.categories.get(category, set()) if category else None
+        scores = defaultdict(float)
+        for term in set(analyze(query)):
+            if term not in self.postings:
+                continue
+            weights = self._term_weights(term)
+            idf = self._idf(term)
+            for doc_number, weight in weights:
+                if allowed is None or doc_number in allowed:
+                    scores[doc_number] += idf * weight
+        return scores
+
+    def _term_weights(self, term: str) -> List[Tuple[int, float]]:
+        """Length-normalized term frequencies; only terms touched by a change are recomputed"""
+        if self.avg_length and abs(self.avg_length - self.weights_avg_length) > self.drift * self.avg_length:
+            self.weights = {}
+            self.weights_avg_length = self.avg_length
+        weights = self.weights.get(term)
+        if weights is None or term in self.dirty:
+            postings = self.postings[term]
+            if self.removed:
+                postings = [posting for posting in postings if posting[0] not in self.removed]
+                if postings:
+                    self.postings[term] = postings
+                else:
+                    del self.postings[term]
+            k1, b, avg_length, lengths = self.k1, self.b, self.weights_avg_length or 1, self.lengths
+            weights = [
+                (doc_number, tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[doc_number] / avg_length)))
+                for doc_number, tf in postings
+            ]
+            self.weights[term] = weights
+            self.dirty.discard(term)
+        return weights
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: Optional[int] = 10,
+        offset: int = 0
+    ) -> Tuple[List[Tuple[float, Dict]], int]:
+        """One page of (score, document) pairs, best first, plus the total number of matches"""
+        scores = self.score(query, category)
+        ranked = ((score, -doc_number) for doc_number, score in scores.items())
+        if limit is None:
+            page = sorted(ranked, reverse=True)[offset:]
+        else:
+            # Only the top offset+limit need ordering, not every match
+            page = heapq.nlargest(offset + limit, ranked)[offset:]
+        return [(round(score, 4), self.documents[-neg]) for score, neg in page], len(scores)
+
+    def write(self, writer, prefix: str):
+        """Add this index to a SnapshotWriter as flat arrays, dropping removed documents"""
+        live = [doc for doc in range(len(self.documents)) if doc not in self.removed]
+        renumber = np.full(len(self.documents), -1, dtype=np.int64)
+        renumber[live] = np.arange(len(live))
+        categories = sorted(self.categories)
+        codes = np.full(len(self.documents), -1, dtype=np.int16)
+        for code, category in enumerate(categories):
+            codes[list(self.categories[category])] = code
+
+        vocabulary = sorted(self.postings, key=lambda term: term.encode())
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_numbers, weights, idf = [], [], []
+        for i, term in enumerate(vocabulary):
+            term_weights = self._term_weights(term)
+            doc_numbers.extend(renumber[doc] for doc, _ in term_weights)
+            weights.extend(weight for _, weight in term_weights)
+            idf.append(self._idf(term))
+            offsets[i + 1] = len(doc_numbers)
+
+        writer.add_strings(f"{prefix}vocabulary", vocabulary)
+        writer.add_array(f"{prefix}offsets", offsets)
+        writer.add_array(f"{prefix}doc_numbers", np.array(doc_numbers, dtype=np.int32))
+        writer.add_array(f"{prefix}weights", np.array(weights, dtype=np.float32))
+        writer.add_array(f"{prefix}idf", np.array(idf, dtype=np.float32))
+        writer.add_array(f"{prefix}codes", codes[live])
+        writer.add_json(f"{prefix}categories", categories)
+        writer.add_strings(f"{prefix}documents", [json.dumps(self.documents[doc]) for doc in live])
+
+
+class MappedSearchIndex:
+    """Read-only BM25 index over arrays in a memory-mapped snapshot.
+
+    Postings are stored term by term (CSR layout) with their BM25 weights
+    precomputed, so nothing is rebuilt or copied onto the heap at startup.
+    """
+
+    def __init__(self, snapshot, prefix: str):
+        self.vocabulary = snapshot.strings(f"{prefix}vocabulary")
+        self.offsets = snapshot.array(f"{prefix}offsets")
+        self.doc_numbers = snapshot.array(f"{prefix}doc_numbers")
+        self.weights = snapshot.array(f"{prefix}weights")
+        self.idf = snapshot.array(f"{prefix}idf")
+        self.codes = snapshot.array(f"{prefix}codes")
+        self.category_codes = {category: code for code, category in enumerate(snapshot.json(f"{prefix}categories"))}
+        self.documents = snapshot.documents(f"{prefix}documents")
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def score(self, query: str, category: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc numbers, BM25 scores) of every document containing a query term"""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        matched = np.zeros(len(self.documents), dtype=bool)
+        for term in set(analyze(query)):
+            position = self.vocabulary.find(term)
+            if position < 0:
+                continue
+            start, end = self.offsets[position], self.offsets[position + 1]
+            doc_numbers = self.doc_numbers[start:end]
+            scores[doc_numbers] += self.idf[position] * self.weights[start:end]
+            matched[doc_numbers] = True
+        if category:
+            matched &= self.codes == self.category_codes.get(category, -1)
+        doc_numbers = np.flatnonzero(matched)
+        return doc_numbers, scores[doc_numbers]
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: Optional[int] = 10,
+        offset: int = 0
+    ) -> Tuple[List[Tuple[float, Dict]], int]:
+        """One page of (score, document) pairs, best first, plus the total number of matches"""
+        doc_numbers, scores = self.score(query, category)
+        if limit is not None and offset + limit < len(scores):
+            top = np.argpartition(-scores, offset + limit - 1)[:offset + limit]
+            doc_numbers, scores = doc_numbers[top], scores[top]
+        # Best score first, earlier documents first on ties, as SearchIndex does
+        order = np.lexsort((doc_numbers, -scores))
+        end = None if limit is None else offset + limit
+        page = [(round(float(scores[i]), 4), self.documents[int(doc_numbers[i])]) for i in order[offset:end]]
+        return page, len(scores)
@@ -0,0 +1,102 @@
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from collections import defaultdict
+import asyncio
+import time
+from modules.metrics import LatencyRecorder
+
+
+class SLOGuard:
+    """Per-tenant latency SLO: hedge slow model calls and bound total response time"""
+
+    def __init__(
+        self,
+        deadline_ms: float = 8000,
+        hedge_percentile: float = 95,
+        min_hedge_ms: float = 500,
+        min_samples: int = 20,
+        hedge_stages: Tuple[str, ...] = ('combined', 'answer'),
+        hedge_model: Optional[str] = None,
+        hedge_backend: Optional[Dict] = None,
+        enabled: bool = True
+    ):
+        self.deadline = deadline_ms / 1000
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge = min_hedge_ms / 1000
+        self.min_samples = min_samples
+        self.hedge_stages = tuple(hedge_stages)
+        self.hedge_model = hedge_model
+        self.hedge_backend = hedge_backend
+        self.enabled = enabled
+        self.primary_latency = LatencyRecorder()
+        self.stats = defaultdict(int)
+
+    def hedge_delay(self, stage: str) -> float:
+        """Delay before a backup call: the primary's latency percentile, once there are enough samples"""
+        if len(self.primary_latency.samples.get(stage, ())) < self.min_samples:
+            return max(self.min_hedge, self.deadline / 2)
+        return max(self.min_hedge, self.primary_latency.percentile(stage, self.hedge_percentile))
+
+    async def call(
+        self,
+        stage: str,
+        primary: Callable[[], Awaitable],
+        hedge: Optional[Callable[[], Awaitable]] = None
+    ):
+        """Run primary, starting hedge if primary is still running after the hedge delay"""
+        self.stats['calls'] += 1
+        start = time.perf_counter()
+        primary_task = asyncio.ensure_future(primary())
+        primary_task.add_done_callback(lambda t: self._record_primary(stage, start, t))
+        if hedge is None or not self.enabled or stage not in self.hedge_stages:
+            return await primary_task
+
+        done, _ = await asyncio.wait({primary_task}, timeout=self.hedge_delay(stage))
+        if done:
+            return primary_task.result()
+
+        self.stats['hedged'] += 1
+        hedge_task = asyncio.ensure_future(hedge())
+        pending = {primary_task, hedge_task}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # A failed call only matters if the other one fails too
+                for task in sorted(done, key=lambda t: t.exception() is not None):
+                    if task.exception() is None or not pending:
+                        self.stats['hedge_wins' if task is hedge_task else 'primary_wins'] += 1
+                        return task.result()
+        finally:
+            for task in (primary_task, hedge_task):
+                if not task.done():
+                    task.cancel()
+
+    def _record_primary(self, stage: str, start: float, task: asyncio.Future):
+        if task.cancelled():
+            # Cancelled once a hedge won: the primary took at least this long. Leaving
+            # these slow calls out would pull the percentile, and the hedge delay, down
+            # until nearly every call is hedged.
+            self.stats['primary_cancelled'] += 1
+            self.primary_latency.record(stage, time.perf_counter() - start)
+        elif task.exception() is None:
+            self.primary_latency.record(stage, time.perf_counter() - start)
+
+    def record_request(self, degraded: bool):
+        self.stats['requests'] += 1
+        if degraded:
+            self.stats['degraded'] += 1
+
+    def record_async_completion(self, ok: bool):
+        self.stats['async_completed' if ok else 'async_failed'] += 1
+
+    def get_stats(self) -> Dict:
+        """Hedge and degradation counts and rates, plus the current hedge delays"""
+        stats = {key: self.stats[key] for key in
+                 ('calls', 'hedged', 'hedge_wins', 'primary_wins', 'primary_cancelled', 'requests', 'degraded',
+                  'async_completed', 'async_failed')}
+        stats['hedge_rate'] = round(stats['hedged'] / stats['calls'], 3) if stats['calls'] else 0.0
+        stats['degradation_rate'] = round(stats['degraded'] / stats['requests'], 3) if stats['requests'] else 0.0
+        stats['deadline_ms'] = self.deadline * 1000
+        stats['hedge_delay_ms'] = {
+            stage: round(self.hedge_delay(stage) * 1000, 1) for stage in self.hedge_stages
+        }
+        return stats
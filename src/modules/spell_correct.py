@@ -0,0 +1,322 @@
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Union
+from collections import Counter, defaultdict
+from functools import lru_cache
+import logging
+import os
+import re
+import threading
+import time
+from modules.kb_retriever import STOP_WORDS
+
+WORD = re.compile(r'[A-Za-z]+')
+VOWELS = 'aeiou'
+# Common English words; known but never offered as corrections
+DICTIONARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'english_words.txt')
+# Support words every corrector offers as corrections, before any knowledge base is added
+SUPPORT_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'support_words.txt')
+
+
+def inflections(word: str) -> Set[str]:
+    """Regular plural, past, -ing and -er forms of a base word"""
+    consonant_y = len(word) > 1 and word[-1] == 'y' and word[-2] not in VOWELS
+    if consonant_y:
+        forms = {word[:-1] + 'ies', word[:-1] + 'ied'}
+    elif word.endswith(('s', 'x', 'z', 'ch', 'sh')):
+        forms = {word + 'es'}
+    else:
+        forms = {word + 's'}
+
+    # One-syllable words ending consonant-vowel-consonant double it: ship -> shipped, shipping
+    if (len(word) >= 3 and len(re.findall(r'[aeiou]+', word)) == 1 and word[-1] not in VOWELS + 'wxy'
+            and word[-2] in VOWELS and word[-3] not in VOWELS):
+        stem = word + word[-1]
+        return forms | {stem + 'ed', stem + 'ing', stem + 'er'}
+
+    if word.endswith('ie'):
+        forms |= {word + 'd', word[:-2] + 'ying', word + 'r'}
+    elif word.endswith('e'):
+        forms |= {word + 'd', word + 'r', word + 'ing' if word.endswith(('ee', 'oe', 'ye')) else word[:-1] + 'ing'}
+    else:
+        if not consonant_y:
+            forms.add(word + 'ed')
+        forms |= {word + 'ing', word + 'er'}
+    return forms
+
+
+def read_words(path: str) -> List[str]:
+    """Words of a word-list file; '#' starts a comment line"""
+    words = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            words.extend(word.lower() for word in line.split() if word.isalpha())
+    return words
+
+
+@lru_cache(maxsize=None)
+def load_dictionary(path: str) -> FrozenSet[str]:
+    """Words of a dictionary file and their regular inflections, read once per process"""
+    words = set(read_words(path))
+    return frozenset(words | {form for word in words for form in inflections(word)})
+
+
+def pattern_words(pattern: str) -> List[str]:
+    """Literal words in an intent regex such as r"\\b(hello|hi|good\\s*morning)\\b" """
+    # Drop escapes first so \b and \s don't leave stray letters behind
+    return [word for word in WORD.findall(re.sub(r'\\[a-zA-Z]', ' ', pattern)) if len(word) > 1]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (transpositions count once), or limit + 1 once exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class SpellCorrector:
+    """Typo correction against the bot's own vocabulary with a SymSpell delete index.
+
+    Every vocabulary word is indexed under the strings left after deleting up
+    to max_edit_distance characters from its prefix. A typo is looked up the
+    same way, so candidates come from a few dict reads instead of a scan of the
+    vocabulary, then the closest and most frequent candidate wins. Corrections
+    are cached, so repeated words cost one dict read. Words in the general
+    English dictionary are never rewritten, only misspellings of neither.
+
+    The vocabulary is kept in named layers (intent words, one knowledge base,
+    ...); set_words replaces a layer, so words of deleted entries disappear and
+    reloading the same content doesn't inflate frequencies.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_edit_distance: int = 2,
+        prefix_length: int = 7,
+        min_word_length: int = 5,
+        long_word_length: int = 9,
+        cache_size: int = 10000,
+        dictionary: Optional[str] = DICTIONARY_PATH,
+        support_words: Optional[str] = SUPPORT_WORDS_PATH
+    ):
+        self.enabled = enabled
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        # Shorter words have too many legitimate neighbours to correct safely
+        self.min_word_length = min_word_length
+        # Words this long may be two edits away; shorter ones only one
+        self.long_word_length = long_word_length
+        self.cache_size = cache_size
+        # Valid words that are left alone: the general dictionary plus inflections of
+        # the vocabulary, so "stuck" or "delivered" are not "corrected" to "stock" or "delivery"
+        self.known = load_dictionary(dictionary) if dictionary else frozenset()
+        # inflected form -> number of vocabulary words producing it
+        self.inflected = Counter()
+        # layer -> word -> weighted count; frequencies is their sum
+        self.layers = defaultdict(Counter)
+        self.frequencies = Counter()
+        # delete -> vocabulary words that produce it
+        self.deletes = defaultdict(list)
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.stats = defaultdict(float)
+        if support_words:
+            self.set_words('support', read_words(support_words))
+
+    def add_words(self, words: Union[Iterable[str], Mapping[str, int]], weight: int = 1, layer: str = 'static'):
+        """Add words (or word -> count) to a vocabulary layer, indexing new ones up front"""
+        counts = self._weighted(words, weight)
+        with self.lock:
+            self.layers[layer].update(counts)
+            self._apply(counts)
+
+    def set_words(self, layer: str, words: Union[Iterable[str], Mapping[str, int]], weight: int = 1):
+        """Replace a vocabulary layer; words no other layer has are dropped from the index"""
+        counts = self._weighted(words, weight)
+        with self.lock:
+            previous = self.layers.pop(layer, Counter())
+            if counts:
+                self.layers[layer] = counts
+            changes = Counter(counts)
+            changes.subtract(previous)
+            self._apply({word: delta for word, delta in changes.items() if delta})
+
+    def add_text(self, text: str, weight: int = 1, layer: str = 'static'):
+        self.add_words(WORD.findall(text.lower()), weight, layer)
+
+    @staticmethod
+    def _weighted(words: Union[Iterable[str], Mapping[str, int]], weight: int) -> Counter:
+        counts = words if isinstance(words, Mapping) else Counter(words)
+        weighted = Counter()
+        for word, count in counts.items():
+            word = word.lower()
+            if len(word) >= 3 and word.isalpha() and count > 0:
+                weighted[word] += count * weight
+        return weighted
+
+    def _apply(self, changes: Mapping[str, int]):
+        """Apply frequency changes to the index; caller holds the lock"""
+        for word, delta in changes.items():
+            before = self.frequencies[word]
+            after = before + delta
+            if after > 0:
+                self.frequencies[word] = after
+                if not before:
+                    self._index(word)
+            else:
+                del self.frequencies[word]
+                if before:
+                    self._unindex(word)
+        if changes:
+            self.cache = {}
+
+    def _index(self, word: str):
+        for delete in self._deletes(word[:self.prefix_length], self.max_edit_distance):
+            self.deletes[delete].append(word)
+        self.inflected.update(inflections(word))
+
+    def _unindex(self, word: str):
+        for delete in self._deletes(word[:self.prefix_length], self.max_edit_distance):
+            words = self.deletes.get(delete)
+            if words and word in words:
+                words.remove(word)
+                if not words:
+                    del self.deletes[delete]
+        for form in inflections(word):
+            self.inflected[form] -= 1
+            if self.inflected[form] <= 0:
+                del self.inflected[form]
+
+    @staticmethod
+    def _deletes(word: str, distance: int) -> set:
+        """The word and every string reachable from it by up to distance deletions"""
+        results = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {item[:i] + item[i + 1:] for item in frontier if len(item) > 1 for i in range(len(item))}
+            results |= frontier
+        return results
+
+    def lookup(self, word: str) -> str:
+        """Closest vocabulary word, or the word itself if it is known or nothing is close"""
+        word = word.lower()
+        if len(word) < self.min_word_length or word in STOP_WORDS or not word.isalpha() or word in self.known:
+            return word
+        # Vocabulary updates run on other threads; a lookup sees the index before or after one
+        with self.lock:
+            if word in self.frequencies or word in self.inflected:
+                return word
+            cached = self.cache.get(word)
+            if cached is not None:
+                return cached
+
+            limit = self.max_edit_distance if len(word) >= self.long_word_length else 1
+            best, best_key = word, None
+            seen = set()
+            for delete in self._deletes(word[:self.prefix_length], limit):
+                for candidate in self.deletes.get(delete, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = edit_distance(word, candidate, limit)
+                    if distance > limit:
+                        continue
+                    key = (distance, -self.frequencies[candidate], candidate)
+                    if best_key is None or key < best_key:
+                        best, best_key = candidate, key
+
+            if len(self.cache) >= self.cache_size:
+                self.cache = {}
+            self.cache[word] = best
+            return best
+
+    def correct(self, text: str) -> str:
+        """Text with misspelled words replaced; everything else is left as it was"""
+        if not self.enabled or not text:
+            return text
+        start = time.perf_counter()
+        changed = 0
+
+        def replace(match):
+            nonlocal changed
+            word = match.group(0)
+            corrected = self.lookup(word)
+            if corrected == word.lower():
+                return word
+            changed += 1
+            return corrected
+
+        result = WORD.sub(replace, text)
+        self.stats['messages'] += 1
+        self.stats['seconds'] += time.perf_counter() - start
+        if changed:
+            self.stats['corrected_messages'] += 1
+            self.stats['words_corrected'] += changed
+        return result
+
+    def record_intent(self, classifier: str, changed: bool):
+        """Count a message a classifier labelled from corrected text, and whether correction changed the label"""
+        self.stats[f"intent_checks:{classifier}"] += 1
+        if changed:
+            self.stats[f"intent_changed:{classifier}"] += 1
+
+    def get_stats(self) -> Dict:
+        messages = int(self.stats['messages'])
+        classifiers = sorted(key.split(':', 1)[1] for key in self.stats if key.startswith('intent_checks:'))
+        intent_changes = {}
+        for classifier in classifiers:
+            checks = int(self.stats[f"intent_checks:{classifier}"])
+            changed = int(self.stats[f"intent_changed:{classifier}"])
+            intent_changes[classifier] = {
+                'checks': checks,
+                'changed': changed,
+                'change_rate': round(changed / checks, 3) if checks else 0.0
+            }
+        return {
+            'enabled': self.enabled,
+            'vocabulary': len(self.frequencies),
+            'layers': {layer: len(words) for layer, words in self.layers.items()},
+            'known_words': len(self.known) + len(self.inflected),
+            'messages': messages,
+            'corrected_messages': int(self.stats['corrected_messages']),
+            'words_corrected': int(self.stats['words_corrected']),
+            'correction_rate': round(self.stats['corrected_messages'] / messages, 3) if messages else 0.0,
+            'avg_correction_us': round(self.stats['seconds'] / messages * 1e6, 1) if messages else 0.0,
+            # Per classifier, since the router and the context analyzer both check every message
+            'intent_changes': intent_changes
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_corrector(**settings) -> SpellCorrector:
+    """The process-wide corrector; every matcher adds its vocabulary to this one index.
+
+    Settings apply when the index is first created; later callers get the
+    same instance, and settings that disagree with it are logged and ignored.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SpellCorrector(**settings)
+        else:
+            ignored = {key: value for key, value in settings.items() if getattr(_shared, key, value) != value}
+            if ignored:
+                logging.getLogger(__name__).warning(f"Shared spelling corrector already created; ignoring {ignored}")
+        return _shared
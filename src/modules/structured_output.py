@@ -0,0 +1,300 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import defaultdict
+import json
+import re
+
+# Schemas describe the fields each stage should return: name -> (kind, default).
+# Known fields are coerced to their kind, missing ones get the default and
+# fields listed as required make the output irrecoverable when absent.
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'fields': {
+        'primary_intent': ('str', 'general_inquiry'),
+        'secondary_intents': ('list', []),
+        'sentiment': ('str', 'neutral'),
+        'urgency_level': ('str', 'low'),
+        'required_information': ('list', []),
+        'suggested_actions': ('list', [])
+    },
+    'required': ()
+}
+
+ANSWER_SCHEMA = {
+    'type': 'object',
+    'fields': {
+        'response': ('str', None),
+        'related_info': ('list', []),
+        'required_actions': ('list', []),
+        'topic': ('str', 'general_inquiry'),
+        'status': ('status', 'resolved'),
+        'confidence': ('confidence', 0.7)
+    },
+    'required': ('response',)
+}
+
+SUGGESTIONS_SCHEMA = {'type': 'str_list', 'max_items': 3}
+
+COMBINED_SCHEMA = {
+    'type': 'object',
+    'fields': {
+        **ANSWER_SCHEMA['fields'],
+        'analysis': ('dict', {}),
+        'suggestions': ('str_list', [])
+    },
+    'required': ('response',)
+}
+
+STREAM_META_SCHEMA = {
+    'type': 'object',
+    'fields': {
+        **{k: v for k, v in ANSWER_SCHEMA['fields'].items() if k != 'response'},
+        'suggestions': ('str_list', [])
+    },
+    'required': ()
+}
+
+STATUSES = {
+    'resolved': 'resolved', 'solved': 'resolved', 'answered': 'resolved', 'complete': 'resolved',
+    'pending': 'pending', 'open': 'pending', 'in progress': 'pending', 'in_progress': 'pending',
+    'escalated': 'escalated', 'escalate': 'escalated', 'needs escalation': 'escalated'
+}
+
+CONFIDENCE_WORDS = {'very high': 0.95, 'high': 0.9, 'medium': 0.7, 'moderate': 0.7, 'low': 0.4, 'very low': 0.2}
+
+FENCE_RE = re.compile(r'```(?:json|JSON)?\s*(.*?)(?:```|$)', re.DOTALL)
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+PY_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+class StructuredOutputError(ValueError):
+    """Raised when model output can't be turned into the expected structure"""
+
+
+def close_partial_json(text: str) -> str:
+    """Close strings and brackets left open by a truncated or still-streaming JSON text"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+
+    closed = text + ('"' if in_string else '')
+    # A dangling separator or key can't be closed, drop it
+    closed = re.sub(r'[,:]\s*$', '', closed.rstrip())
+    closed = re.sub(r',\s*"[^"]*"\s*$', '', closed) if stack and stack[-1] == '}' else closed
+    return closed + ''.join(reversed(stack))
+
+
+def _decode_from(text: str) -> Any:
+    """Decode the first JSON value in text, ignoring anything after it"""
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        raise ValueError("no JSON object or array found")
+    value, _ = json.JSONDecoder().raw_decode(text[min(starts):])
+    return value
+
+
+def _normalize_syntax(text: str) -> str:
+    """Fix the syntax slips models make most often"""
+    text = text.replace('\u201c', '"').replace('\u201d', '"').replace('\u2019', "'")
+    text = TRAILING_COMMA_RE.sub(r'\1', text)
+    for python, json_literal in PY_LITERALS.items():
+        text = re.sub(rf'(?<=[\s:\[,]){python}(?=[\s,\]}}])', json_literal, text)
+    if '"' not in text and "'" in text:
+        text = text.replace("'", '"')
+    return text
+
+
+def loads_tolerant(text: str) -> Tuple[Any, bool]:
+    """Parse model text as JSON; returns (value, recovered) or raises StructuredOutputError"""
+    text = (text or '').strip()
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+
+    fenced = FENCE_RE.search(text)
+    candidates = [fenced.group(1).strip()] if fenced else []
+    candidates.append(text)
+
+    for candidate in candidates:
+        for attempt in (candidate, _normalize_syntax(candidate)):
+            try:
+                return _decode_from(attempt), True
+            except ValueError:
+                pass
+            # Truncated output: close what was left open
+            try:
+                start = min(i for i in (attempt.find('{'), attempt.find('[')) if i >= 0)
+                return json.loads(close_partial_json(attempt[start:])), True
+            except ValueError:
+                pass
+    raise StructuredOutputError("model output is not recoverable JSON")
+
+
+def _coerce_confidence(value: Any, default: float) -> float:
+    if isinstance(value, str):
+        word = value.strip().lower()
+        if word in CONFIDENCE_WORDS:
+            return CONFIDENCE_WORDS[word]
+        try:
+            value = float(word.rstrip('%')) / (100 if word.endswith('%') else 1)
+        except ValueError:
+            return default
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return default
+    if value > 1 and value <= 100:
+        value = value / 100
+    return round(min(max(float(value), 0.0), 1.0), 3)
+
+
+def _coerce_str_list(value: Any, max_items: Optional[int] = None) -> List[str]:
+    if isinstance(value, str):
+        # One suggestion per line, with any bullet or numbering removed
+        value = [re.sub(r'^\s*(?:[-*\u2022]|\d+[.)])\s*', '', line) for line in value.splitlines()]
+    elif isinstance(value, dict):
+        value = list(value.values())
+    elif not isinstance(value, list):
+        value = [value] if value is not None else []
+
+    items = []
+    for item in value:
+        if isinstance(item, dict):
+            item = next((v for v in item.values() if isinstance(v, str)), None)
+        if item is not None and str(item).strip():
+            items.append(str(item).strip().strip('"'))
+    return items[:max_items] if max_items else items
+
+
+def _coerce_field(kind: str, value: Any, default: Any) -> Any:
+    if kind == 'str':
+        if value is None:
+            return default
+        return value if isinstance(value, str) else json.dumps(value)
+    if kind == 'confidence':
+        return _coerce_confidence(value, default)
+    if kind == 'status':
+        return STATUSES.get(str(value).strip().lower(), default) if value is not None else default
+    if kind == 'list':
+        if value is None:
+            return list(default)
+        return value if isinstance(value, list) else [value]
+    if kind == 'str_list':
+        return _coerce_str_list(value)
+    if kind == 'dict':
+        return value if isinstance(value, dict) else dict(default)
+    return value
+
+
+def _snake(key: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', str(key).lower()).strip('_')
+
+
+def coerce(value: Any, schema: Dict) -> Any:
+    """Coerce a parsed value to a schema; raises StructuredOutputError if required data is missing"""
+    if schema['type'] == 'str_list':
+        items = _coerce_str_list(value, schema.get('max_items'))
+        if not items:
+            raise StructuredOutputError("expected a non-empty list of strings")
+        return items
+
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], dict):
+        value = value[0]
+    if not isinstance(value, dict):
+        raise StructuredOutputError(f"expected a JSON object, got {type(value).__name__}")
+
+    # Accept "Primary Intent" or "primaryIntent" style keys for known fields
+    result = dict(value)
+    for key in list(value):
+        snake = _snake(re.sub(r'(?<=[a-z])([A-Z])', r'_\1', str(key)))
+        if snake in schema['fields'] and snake not in value:
+            result[snake] = result.pop(key)
+
+    for field, (kind, default) in schema['fields'].items():
+        result[field] = _coerce_field(kind, result.get(field), default)
+    for field in schema['required']:
+        if not result.get(field):
+            raise StructuredOutputError(f"missing required field '{field}'")
+    return result
+
+
+def schema_description(schema: Dict) -> str:
+    """Short human-readable schema for repair prompts"""
+    if schema['type'] == 'str_list':
+        return f"a JSON array of at most {schema.get('max_items', 3)} strings"
+    fields = ', '.join(f'"{name}" ({kind})' for name, (kind, _) in schema['fields'].items())
+    return f"a JSON object with the keys {fields}"
+
+
+class StructuredOutputParser:
+    """Tolerant parsing of model output, with counters for failures and repairs"""
+
+    def __init__(self):
+        self.stats = defaultdict(lambda: defaultdict(int))
+
+    def parse(self, stage: str, text: str, schema: Dict, record: bool = True) -> Any:
+        """Parse and coerce model text for a stage; raises StructuredOutputError"""
+        stats = self.stats[stage]
+        try:
+            try:
+                value, recovered = loads_tolerant(text)
+            except StructuredOutputError:
+                # A plain-text list of several lines is still usable as suggestions
+                lines = [line for line in (text or '').splitlines() if line.strip()]
+                if schema['type'] != 'str_list' or len(lines) < 2:
+                    raise
+                value, recovered = text, True
+            result = coerce(value, schema)
+        except StructuredOutputError:
+            if record:
+                stats['failed'] += 1
+            raise
+        if record:
+            stats['recovered' if recovered else 'clean'] += 1
+        return result
+
+    def repair_prompt(self, stage: str, text: str, schema: Dict, error: str) -> str:
+        return f"""
+        Target stage: {stage}
+        The output below should have been {schema_description(schema)},
+        but it could not be used ({error}).
+
+        Output:
+        {text[:4000]}
+
+        Return only the corrected JSON, with no explanation or code fences.
+        """
+
+    def record_repair(self, stage: str, ok: bool):
+        stats = self.stats[stage]
+        stats['repair_calls'] += 1
+        stats['repaired' if ok else 'repair_failed'] += 1
+
+    def get_stats(self) -> Dict:
+        """Per-stage counts plus overall parse-failure, recovery and repair rates"""
+        per_stage = {stage: dict(counts) for stage, counts in self.stats.items()}
+        totals = defaultdict(int)
+        for counts in per_stage.values():
+            for key, count in counts.items():
+                totals[key] += count
+        parsed = totals['clean'] + totals['recovered'] + totals['failed']
+        return {
+            'stages': per_stage,
+            'parsed': parsed,
+            'recovered_rate': round(totals['recovered'] / parsed, 3) if parsed else 0.0,
+            'parse_failure_rate': round(totals['failed'] / parsed, 3) if parsed else 0.0,
+            'repair_rate': round(totals['repair_calls'] / parsed, 3) if parsed else 0.0,
+            'repair_success_rate': round(totals['repaired'] / totals['repair_calls'], 3) if totals['repair_calls'] else 0.0
+        }
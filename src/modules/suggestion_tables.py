@@ -0,0 +1,69 @@
+from typing import Dict, List, Optional
+from collections import defaultdict
+import hashlib
+import json
+import logging
+import os
+import re
+
+# Relative table paths are resolved against the repository root, not the working directory
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def topic_key(topic: Optional[str]) -> str:
+    """Table key for a topic or intent label, e.g. 'Technical Support' -> 'technical_support'"""
+    return re.sub(r'[^a-z0-9]+', '_', str(topic or '').lower()).strip('_')
+
+
+def table_version(tables: Dict[str, List[str]]) -> str:
+    """Content hash, so a rebuilt table with the same entries keeps its version"""
+    return hashlib.sha256(json.dumps(tables, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class SuggestionTables:
+    """Precomputed follow-up suggestions per topic, built offline by build_suggestion_tables.py"""
+
+    def __init__(self, path: Optional[str] = 'data/suggestion_tables.json', enabled: bool = True):
+        self.path = os.path.join(REPO_ROOT, path) if path else None
+        self.enabled = enabled
+        self.tables = {}
+        self.version = None
+        self.stats = defaultdict(int)
+        self.logger = logging.getLogger(__name__)
+        if enabled and self.path:
+            self.load(self.path)
+
+    def load(self, path: str) -> bool:
+        """Load a table artifact; a missing or unreadable file leaves suggestions to the model"""
+        if not os.path.exists(path):
+            self.logger.info(f"No suggestion tables at {path}, suggestions come from the model")
+            return False
+        try:
+            with open(path, 'r') as f:
+                artifact = json.load(f)
+            tables = {topic_key(topic): list(items) for topic, items in artifact['tables'].items() if items}
+        except (ValueError, KeyError, TypeError) as e:
+            self.logger.error(f"Could not load suggestion tables from {path}: {str(e)}")
+            return False
+        self.tables = tables
+        self.version = artifact.get('version') or table_version(tables)
+        self.logger.info(f"Loaded suggestion tables {self.version} for {len(tables)} topics")
+        return True
+
+    def lookup(self, topic: Optional[str]) -> Optional[List[str]]:
+        """Suggestions for a topic, or None when the table has no entry for it"""
+        if not self.enabled:
+            return None
+        suggestions = self.tables.get(topic_key(topic))
+        self.stats['hits' if suggestions else 'misses'] += 1
+        return list(suggestions) if suggestions else None
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            'version': self.version,
+            'topics': len(self.tables),
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+        }
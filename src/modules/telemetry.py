@@ -0,0 +1,228 @@
+from typing import Dict, List, Optional
+from collections import defaultdict
+from contextvars import ContextVar
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import uuid
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Spans of the request being handled; tasks spawned by it share the list
+current_trace: ContextVar[Optional[Dict]] = ContextVar('current_trace', default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, pct: float):
+        """Upper bound of the bucket holding the given percentile"""
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else '+Inf'
+        return '+Inf'
+
+    def snapshot(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count, 2) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                '+Inf': self.counts[-1]
+            }
+        }
+
+
+class Telemetry:
+    """Aggregates per-call model telemetry and writes per-request traces"""
+
+    def __init__(
+        self,
+        trace_path: Optional[str] = 'logs/llm_traces.jsonl',
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        prices: Optional[Dict[str, tuple]] = None
+    ):
+        self.trace_path = trace_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        # USD per 1K tokens (prompt, completion) per model
+        self.prices = prices or {}
+        self.histograms = defaultdict(Histogram)
+        self.tokens = defaultdict(lambda: {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                           'errors': 0, 'cost_usd': 0.0})
+        self._lock = threading.Lock()
+        self._trace_logger = None
+
+    def record_call(
+        self,
+        stage: str,
+        model: str,
+        queue_wait: float,
+        network: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        attempts: int = 1,
+        error: Optional[str] = None
+    ):
+        """Record one model call (times in seconds)"""
+        span = {
+            'span': 'llm_call',
+            'stage': stage,
+            'model': model,
+            'queue_wait_ms': round(queue_wait * 1000, 2),
+            'network_ms': round(network * 1000, 2),
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'attempts': attempts,
+            'error': error
+        }
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        cost = prompt_tokens / 1000 * prompt_price + completion_tokens / 1000 * completion_price
+
+        with self._lock:
+            self.histograms[f"queue_wait_ms:{stage}"].observe(span['queue_wait_ms'])
+            self.histograms[f"network_ms:{stage}"].observe(span['network_ms'])
+            usage = self.tokens[f"{stage}:{model}"]
+            usage['calls'] += 1
+            usage['prompt_tokens'] += prompt_tokens
+            usage['completion_tokens'] += completion_tokens
+            usage['cost_usd'] = round(usage['cost_usd'] + cost, 6)
+            if error:
+                usage['errors'] += 1
+        self._add_span(span)
+
+    def record_parse(self, stage: str, seconds: float, ok: bool = True):
+        """Record the time spent parsing a model reply"""
+        with self._lock:
+            self.histograms[f"parse_ms:{stage}"].observe(seconds * 1000)
+        self._add_span({'span': 'parse', 'stage': stage, 'parse_ms': round(seconds * 1000, 3), 'ok': ok})
+
+    def record_span(self, name: str, seconds: float, **fields):
+        """Record any other timed step of a request"""
+        with self._lock:
+            self.histograms[f"{name}_ms"].observe(seconds * 1000)
+        self._add_span({'span': name, 'ms': round(seconds * 1000, 2), **fields})
+
+    def _add_span(self, span: Dict):
+        trace = current_trace.get()
+        if trace is not None:
+            span['offset_ms'] = round((time.perf_counter() - trace['_start']) * 1000, 2)
+            trace['spans'].append(span)
+
+    def start_trace(self, kind: str, user_id: str) -> Dict:
+        """Begin collecting spans for a request in the current context"""
+        trace = {
+            'trace_id': uuid.uuid4().hex,
+            'kind': kind,
+            'user_id': str(user_id),
+            'timestamp': time.time(),
+            'spans': [],
+            '_start': time.perf_counter()
+        }
+        trace['_token'] = current_trace.set(trace)
+        return trace
+
+    def resume_trace(self, trace: Dict):
+        """Make a trace current again after resuming in another context"""
+        if current_trace.get() is not trace:
+            current_trace.set(trace)
+
+    def finish_trace(self, trace: Dict, **fields):
+        """Close a request trace, record its total latency and append it to the trace file"""
+        total = time.perf_counter() - trace['_start']
+        try:
+            current_trace.reset(trace['_token'])
+        except ValueError:
+            # Finished from a different context (e.g. a streaming generator step)
+            pass
+        with self._lock:
+            self.histograms[f"request_ms:{trace['kind']}"].observe(total * 1000)
+
+        record = {k: v for k, v in trace.items() if not k.startswith('_')}
+        record['total_ms'] = round(total * 1000, 2)
+        record.update(fields)
+        self._write_trace(record)
+
+    def _write_trace(self, record: Dict):
+        if not self.trace_path:
+            return
+        if self._trace_logger is None:
+            self._trace_logger = self._build_trace_logger()
+        self._trace_logger.info(json.dumps(record, default=str))
+
+    def _build_trace_logger(self) -> logging.Logger:
+        directory = os.path.dirname(self.trace_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        logger = logging.getLogger(f"{__name__}.traces.{self.trace_path}")
+        logger.setLevel(logging.INFO)
+        # Traces go only to their own rotating file, never to the app log
+        logger.propagate = False
+        if not logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                self.trace_path,
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        return logger
+
+    def get_stats(self) -> Dict:
+        """Histogram snapshots plus token and cost totals per stage and model"""
+        with self._lock:
+            return {
+                'histograms': {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+                'usage': {key: dict(usage) for key, usage in sorted(self.tokens.items())}
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition of the histograms and token counters"""
+        lines: List[str] = []
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                metric, _, stage = name.partition(':')
+                labels = f'stage="{stage}"' if stage else ''
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    sep = ',' if labels else ''
+                    lines.append(f'bot_{metric}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+                sep = ',' if labels else ''
+                lines.append(f'bot_{metric}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+                lines.append(f'bot_{metric}_sum{{{labels}}} {round(histogram.sum, 3)}')
+                lines.append(f'bot_{metric}_count{{{labels}}} {histogram.count}')
+            for key, usage in sorted(self.tokens.items()):
+                stage, _, model = key.partition(':')
+                labels = f'stage="{stage}",model="{model}"'
+                lines.append(f'bot_llm_calls_total{{{labels}}} {usage["calls"]}')
+                lines.append(f'bot_llm_errors_total{{{labels}}} {usage["errors"]}')
+                lines.append(f'bot_llm_prompt_tokens_total{{{labels}}} {usage["prompt_tokens"]}')
+                lines.append(f'bot_llm_completion_tokens_total{{{labels}}} {usage["completion_tokens"]}')
+                lines.append(f'bot_llm_cost_usd_total{{{labels}}} {usage["cost_usd"]}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,275 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from collections import Counter
+from functools import lru_cache
+import math
+import re
+import zlib
+import json
+import numpy as np
+from modules.kb_snapshot import MappedRows
+from modules.search_index import analyze
+
+# Phrases that mean the same thing as a concept word, so paraphrases share a feature.
+# Matched on the lowercased text before tokenizing.
+CONCEPTS = {
+    'return': ('send it back', 'send back', 'give back', 'take back', 'money back', 'refund', 'exchange'),
+    'price': ('how much', 'cost', 'pricing', 'fee', 'charge', 'rate', 'expensive', 'cheap'),
+    'password': ('log in', 'login', 'sign in', 'signin', 'credential', 'locked out'),
+    'cancel': ('unsubscribe', 'stop my subscription', 'end my plan', 'close my account'),
+    'shipping': ('delivery', 'deliver', 'arrive', 'ship', 'dispatch', 'courier', 'tracking'),
+    'broken': ('not working', "doesn't work", 'does not work', 'faulty', 'defective', 'error', 'crash', 'bug'),
+    'contact': ('reach you', 'talk to', 'speak to', 'call you', 'phone', 'email'),
+    'hours': ('open', 'opening times', 'closing time', 'schedule', 'when are you'),
+    'payment': ('pay', 'card', 'paypal', 'invoice', 'billing', 'bank transfer'),
+    'upgrade': ('change my plan', 'switch plan', 'move to pro', 'bigger plan', 'more storage')
+}
+# One alternation with a named group per concept, so a text is scanned once
+CONCEPT_PATTERN = re.compile('|'.join(
+    rf"(?P<{concept}>\b(?:{'|'.join(re.escape(p) for p in (concept,) + phrases)}))"
+    for concept, phrases in CONCEPTS.items()
+))
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable hash bucket and sign for a feature (crc32, unlike hash(), is the same in every process)"""
+    value = zlib.crc32(feature.encode())
+    return value % dim, 1.0 if value & 0x80000000 else -1.0
+
+
+@lru_cache(maxsize=100000)
+def _trigrams(word: str) -> Tuple[str, ...]:
+    padded = f"#{word}#"
+    return tuple(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+
+
+class VectorIndex:
+    """CPU-only semantic index: hashed TF-IDF embeddings in a NumPy matrix, cosine top-k.
+
+    Features are stemmed words, word bigrams, character trigrams (for typos and
+    morphology) and concept words from CONCEPTS (for paraphrases). Vectors are
+    L2-normalized and stored as float32 or as int8 with a per-row scale.
+    """
+
+    def __init__(
+        self,
+        dim: int = 256,
+        dtype: str = 'float32',
+        char_ngram_weight: float = 0.3,
+        concept_weight: float = 2.0,
+        chunk_rows: int = 16384
+    ):
+        if dtype not in ('float32', 'int8'):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.char_ngram_weight = char_ngram_weight
+        self.concept_weight = concept_weight
+        self.chunk_rows = chunk_rows
+        self.matrix = np.zeros((0, dim), dtype=np.int8 if dtype == 'int8' else np.float32)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.documents = []
+        self.categories = np.array([], dtype=object)
+        self.removed = set()
+        self.removed_rows = np.zeros(0, dtype=np.int64)
+        self.document_frequency = Counter()
+        self.idf = {}
+        # feature -> (column, signed IDF, kind weight) for every feature seen at build time
+        self.hashed = {}
+        # Feature kinds by prefix: c: character trigrams, k: concepts; words and bigrams weigh 1
+        self.kind_weights = {'c': char_ngram_weight, 'k': concept_weight}
+
+    def features(self, text: str) -> Counter:
+        """Feature counts of a text, before weighting and hashing"""
+        lowered = text.lower()
+        words = analyze(lowered)
+        features = Counter(f"w:{word}" for word in words)
+        features.update(gram for word in words for gram in _trigrams(word))
+        features.update(f"b:{first}_{second}" for first, second in zip(words, words[1:]))
+        features.update({f"k:{match.lastgroup}" for match in CONCEPT_PATTERN.finditer(lowered)})
+        return features
+
+    def _feature_weight(self, feature: str, max_idf: float) -> Tuple[int, float, float]:
+        """(column, signed IDF, kind weight); unseen features count as rare"""
+        column, sign = _bucket(feature, self.dim)
+        return column, sign * self.idf.get(feature, max_idf), self.kind_weights.get(feature[0], 1.0)
+
+    def _vectorize(self, feature_sets: Sequence[Counter]) -> np.ndarray:
+        """Hash weighted features into normalized float32 rows"""
+        max_idf = math.log(1 + len(self.documents) + len(feature_sets))
+        hashed = self.hashed
+        weights = np.array([
+            hashed.get(feature) or self._feature_weight(feature, max_idf)
+            for features in feature_sets for feature in features
+        ], dtype=np.float32).reshape(-1, 3)
+        counts = np.fromiter(
+            (count for features in feature_sets for count in features.values()),
+            dtype=np.float32, count=len(weights)
+        )
+        rows = np.repeat(np.arange(len(feature_sets)), [len(features) for features in feature_sets])
+        # Sublinear term frequency times IDF
+        values = np.log1p(counts * weights[:, 2]) * weights[:, 1]
+        vectors = np.zeros((len(feature_sets), self.dim), dtype=np.float32)
+        np.add.at(vectors, (rows, weights[:, 0].astype(np.int64)), values)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Normalized float32 embeddings for query texts"""
+        return self._vectorize([self.features(text) for text in texts])
+
+    def build(self, items: Iterable[Tuple[str, str, Dict]]):
+        """Index (text, category, document) items, replacing anything indexed before"""
+        items = list(items)
+        feature_sets = [self.features(text) for text, _, _ in items]
+        self.document_frequency = Counter()
+        for features in feature_sets:
+            self.document_frequency.update(features.keys())
+        total = len(items)
+        self.idf = {f: math.log(1 + total / df) for f, df in self.document_frequency.items()}
+        self.hashed = {f: self._feature_weight(f, 0.0) for f in self.idf}
+        self.documents = [document for _, _, document in items]
+        self.categories = np.array([category for _, category, _ in items], dtype=object)
+        self.removed = set()
+        self.removed_rows = np.zeros(0, dtype=np.int64)
+        self._store(self._vectorize(feature_sets), replace=True)
+
+    def add(self, items: Iterable[Tuple[str, str, Dict]]) -> List[int]:
+        """Append items using the IDF of the last build; rebuild now and then to refresh it"""
+        items = list(items)
+        if not items:
+            return []
+        first = len(self.documents)
+        vectors = self._vectorize([self.features(text) for text, _, _ in items])
+        self.documents.extend(document for _, _, document in items)
+        self.categories = np.concatenate([
+            self.categories, np.array([category for _, category, _ in items], dtype=object)
+        ])
+        self._store(vectors, replace=False)
+        return list(range(first, len(self.documents)))
+
+    def remove(self, rows: Iterable[int]):
+        """Drop rows from results; they keep their slot until the next build"""
+        for row in rows:
+            if row < len(self.documents) and row not in self.removed:
+                self.removed.add(row)
+                self.documents[row] = None
+                self.categories[row] = None
+        self.removed_rows = np.fromiter(self.removed, dtype=np.int64, count=len(self.removed))
+
+    def _store(self, vectors: np.ndarray, replace: bool):
+        if self.dtype == 'int8':
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            rows = np.round(vectors / scales[:, None]).astype(np.int8)
+        else:
+            scales = np.ones(len(vectors), dtype=np.float32)
+            rows = vectors
+        if replace:
+            self.matrix, self.scales = rows, scales.astype(np.float32)
+        else:
+            self.matrix = np.concatenate([self.matrix, rows])
+            self.scales = np.concatenate([self.scales, scales.astype(np.float32)])
+
+    def __len__(self) -> int:
+        return len(self.documents) - len(self.removed)
+
+    def live_rows(self) -> np.ndarray:
+        """Rows not removed, in order; the rows a snapshot keeps"""
+        return np.array([row for row in range(len(self.documents)) if row not in self.removed], dtype=np.int64)
+
+    def write(self, writer, prefix: str):
+        """Add this index to a SnapshotWriter, dropping removed rows"""
+        live = self.live_rows()
+        categories = [str(category) for category in self.categories[live]] if len(live) else []
+        features = sorted(self.hashed, key=lambda feature: feature.encode())
+        writer.add_json(f"{prefix}config", {
+            'dim': self.dim,
+            'dtype': self.dtype,
+            'char_ngram_weight': self.char_ngram_weight,
+            'concept_weight': self.concept_weight
+        })
+        writer.add_array(f"{prefix}matrix", self.matrix[live])
+        writer.add_array(f"{prefix}scales", self.scales[live])
+        writer.add_array(f"{prefix}categories", np.array(categories, dtype=str))
+        writer.add_strings(f"{prefix}documents", [json.dumps(self.documents[row]) for row in live])
+        writer.add_strings(f"{prefix}features", features)
+        writer.add_array(f"{prefix}feature_weights",
+                         np.array([self.hashed[feature] for feature in features], dtype=np.float32).reshape(-1, 3))
+
+    @classmethod
+    def load(cls, snapshot, prefix: str) -> 'VectorIndex':
+        """Read-only index whose matrix is a view of the mapped snapshot; rebuild to change it"""
+        index = cls(**snapshot.json(f"{prefix}config"))
+        index.matrix = snapshot.array(f"{prefix}matrix")
+        index.scales = snapshot.array(f"{prefix}scales")
+        index.categories = snapshot.array(f"{prefix}categories")
+        index.documents = snapshot.documents(f"{prefix}documents")
+        index.hashed = MappedRows(snapshot.strings(f"{prefix}features"), snapshot.array(f"{prefix}feature_weights"))
+        return index
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.matrix.nbytes + self.scales.nbytes
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        category: Optional[str] = None,
+        min_score: float = 0.0
+    ) -> List[Tuple[float, Dict]]:
+        """Top-k (cosine score, document) pairs for one query"""
+        return self.search_batch([query], k, category, min_score)[0]
+
+    def search_batch(
+        self,
+        queries: Sequence[str],
+        k: int = 5,
+        category: Optional[str] = None,
+        min_score: float = 0.0
+    ) -> List[List[Tuple[float, Dict]]]:
+        """Top-k (cosine score, document) pairs for many queries in one matrix product"""
+        if not len(self) or not queries:
+            return [[] for _ in queries]
+        scores = self.similarities(self.embed(queries))
+        if category is not None:
+            scores[:, self.categories != category] = -np.inf
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            results.append([
+                (round(float(scores[row, i]), 4), self.documents[i])
+                for i in ranked if scores[row, i] >= min_score and scores[row, i] > -np.inf
+            ])
+        return results
+
+    def row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Stored rows as normalized float32 vectors, for comparing entries with each other"""
+        vectors = self.matrix[rows].astype(np.float32)
+        if self.dtype == 'int8':
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def similarities(self, vectors: np.ndarray) -> np.ndarray:
+        """Cosine similarity of each vector with every row; removed rows score -inf"""
+        scores = self._scores(vectors)
+        if len(self.removed_rows):
+            scores[:, self.removed_rows] = -np.inf
+        return scores
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every query with every row, chunked to bound temporary memory"""
+        scores = np.empty((len(queries), len(self.matrix)), dtype=np.float32)
+        for start in range(0, len(self.matrix), self.chunk_rows):
+            chunk = self.matrix[start:start + self.chunk_rows]
+            if self.dtype == 'int8':
+                # Scale the scores rather than the rows: one multiply per row, not per element
+                scores[:, start:start + len(chunk)] = (
+                    (queries @ chunk.astype(np.float32).T) * self.scales[start:start + len(chunk)]
+                )
+            else:
+                scores[:, start:start + len(chunk)] = queries @ chunk.T
+        return scores
@@ -0,0 +1,29 @@
+import importlib
+import json
+import os
+import sys
+import pytest
+
+# Modules import each other as top-level packages from src/ (from modules.x import Y)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='module')
+def web(tmp_path_factory):
+    """web_interface with a slow local model, run from a scratch directory"""
+    directory = tmp_path_factory.mktemp('web')
+    (directory / 'company_config.json').write_text(json.dumps({
+        'name': 'Acme',
+        'llm_backend': {'type': 'local', 'latency': {'distribution': 'fixed', 'ms': 500}},
+        'cache': {'enabled': False},
+        'telemetry': {'trace_path': None}
+    }))
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        sys.modules.pop('web_interface', None)
+        module = importlib.import_module('web_interface')
+        module.init_db()
+        yield module
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import sqlite3
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.llm_backend import LocalBackend
+from batch_eval import compare, load_results, read_source, run_batch, summarize
+
+COMPANY = {'name': 'Acme', 'support_email': 'help@acme.test', 'cache': {'enabled': False},
+           'telemetry': {'trace_path': None}}
+MESSAGES = ["hello", "My order arrived broken, what are my options?", "Can I change my shipping address?"]
+
+
+def bot():
+    return AICustomerServiceBot(COMPANY, backend=LocalBackend())
+
+
+def write_jsonl(path, messages):
+    path.write_text(''.join(json.dumps({'id': f"q{i}", 'question': m}) + '\n' for i, m in enumerate(messages)))
+    return str(path)
+
+
+def test_reads_chat_db_and_jsonl(tmp_path):
+    db = tmp_path / 'chat.db'
+    with sqlite3.connect(db) as conn:
+        conn.execute('CREATE TABLE chat_history (id INTEGER PRIMARY KEY, message TEXT)')
+        conn.executemany('INSERT INTO chat_history (message) VALUES (?)', [(m,) for m in MESSAGES] + [(None,)])
+    assert [item['message'] for item in read_source(str(db))] == MESSAGES
+    assert list(read_source(str(db), limit=1)) == [{'id': '1', 'message': 'hello'}]
+
+    source = write_jsonl(tmp_path / 'questions.jsonl', MESSAGES)
+    assert [item['id'] for item in read_source(source)] == ['q0', 'q1', 'q2']
+
+
+def test_records_describe_each_outcome(tmp_path):
+    output = str(tmp_path / 'run.jsonl')
+    counts = asyncio.run(run_batch(bot(), read_source(write_jsonl(tmp_path / 'in.jsonl', MESSAGES)),
+                                   output, concurrency=2))
+    assert counts == {'skipped': 0, 'processed': 3}
+
+    results = load_results(output)
+    assert set(results) == {'q0', 'q1', 'q2'}
+    assert results['q0']['routed'] == 'template' and results['q0']['llm_calls'] == 0
+    assert results['q1']['routed'] == 'llm' and results['q1']['llm_calls'] > 0
+    assert results['q1']['prompt_tokens'] > 0 and results['q1']['response']
+
+    summary = summarize(results)
+    assert summary['records'] == 3
+    assert summary['tiers']['template'] == 1
+    assert summary['llm_calls'] == sum(r['llm_calls'] for r in results.values())
+    assert summary['latency']['count'] == 3
+
+
+def test_rerun_resumes_from_the_output(tmp_path):
+    source = write_jsonl(tmp_path / 'in.jsonl', MESSAGES)
+    output = tmp_path / 'run.jsonl'
+    asyncio.run(run_batch(bot(), read_source(source, limit=2), str(output), concurrency=2))
+    # A torn last line from an interrupted run is redone, not fatal
+    with open(output, 'a') as f:
+        f.write('{"id": "q2", "resp')
+
+    counts = asyncio.run(run_batch(bot(), read_source(source), str(output), concurrency=2))
+    assert counts == {'skipped': 2, 'processed': 1}
+    assert set(load_results(str(output))) == {'q0', 'q1', 'q2'}
+
+
+def test_compare_reports_changes():
+    record = {'response': 'a', 'status': 'resolved', 'routed': 'llm', 'prompt_tokens': 10, 'completion_tokens': 5}
+    baseline = {'1': record, '2': record, 'gone': record}
+    current = {'1': record, '2': dict(record, response='b', status='escalated', completion_tokens=9), 'new': record}
+    diff = compare(current, baseline)
+    assert diff['shared'] == 2
+    assert diff['response_changed'] == 1 and diff['tier_changed'] == 0
+    assert diff['status_changes'] == [{'id': '2', 'from': 'resolved', 'to': 'escalated'}]
+    assert diff['token_delta'] == 4
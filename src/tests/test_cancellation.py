@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from modules.cancellation import CancellationRegistry, request_owner
+
+
+def test_cancel_stops_the_owners_tasks_only():
+    async def scenario():
+        registry = CancellationRegistry()
+
+        async def work():
+            await asyncio.sleep(1)
+
+        mine = registry.track(asyncio.ensure_future(work()), 'client-1')
+        theirs = registry.track(asyncio.ensure_future(work()), 'client-2')
+        await asyncio.sleep(0)
+        cancelled = registry.cancel('client-1')
+        await asyncio.gather(mine, return_exceptions=True)
+        stats = registry.get_stats()
+        theirs_running = not theirs.done()
+        theirs.cancel()
+        return cancelled, mine.cancelled(), theirs_running, stats
+
+    cancelled, mine_cancelled, theirs_running, stats = asyncio.run(scenario())
+    assert cancelled == 1 and mine_cancelled and theirs_running
+    assert stats['owners_tracked'] == 1 and stats['tasks_cancelled'] == 1
+
+
+def test_spawned_work_inherits_the_owner():
+    async def scenario():
+        registry = CancellationRegistry()
+        started = asyncio.Event()
+
+        async def background():
+            started.set()
+            await asyncio.sleep(1)
+
+        async def request():
+            # Background work started for the request is tracked under its owner
+            registry.track(asyncio.ensure_future(background()))
+            await asyncio.sleep(1)
+
+        task = asyncio.ensure_future(registry.run('client-1', request()))
+        await started.wait()
+        tracked = registry.get_stats()['tasks_tracked']
+        cancelled = registry.cancel('client-1')
+        await asyncio.gather(task, return_exceptions=True)
+        return tracked, cancelled, task.cancelled(), request_owner.get()
+
+    tracked, cancelled, request_cancelled, owner = asyncio.run(scenario())
+    assert tracked == 2 and cancelled == 2 and request_cancelled
+    assert owner is None
+
+
+def test_finished_tasks_are_forgotten():
+    async def scenario():
+        registry = CancellationRegistry()
+
+        async def work():
+            return 'done'
+
+        await registry.track(asyncio.ensure_future(work()), 'client-1')
+        await asyncio.sleep(0)
+        return registry.cancel('client-1'), registry.get_stats()
+
+    cancelled, stats = asyncio.run(scenario())
+    assert cancelled == 0
+    assert stats['owners_tracked'] == 0 and stats['owners_cancelled'] == 0
+
+
+def test_cancel_between_steps_stops_the_next_step():
+    async def scenario():
+        registry = CancellationRegistry()
+
+        async def tokens():
+            for token in ('a', 'b', 'c'):
+                yield token
+
+        stream = tokens()
+
+        def step():
+            # Each step runs as its own task, as iterate_async does
+            return asyncio.ensure_future(registry.run('client-1', stream.__anext__()))
+
+        first = await step()
+        # Nothing is running for the owner right now, the cancel must still stick
+        registry.cancel('client-1')
+        try:
+            await step()
+            stopped = False
+        except asyncio.CancelledError:
+            stopped = True
+        late = registry.track(asyncio.ensure_future(asyncio.sleep(1)), 'client-1')
+        await asyncio.gather(late, return_exceptions=True)
+        registry.forget('client-1')
+        again = await step()
+        return first, stopped, late.cancelled(), again
+
+    first, stopped, late_cancelled, again = asyncio.run(scenario())
+    assert first == 'a' and stopped and late_cancelled
+    assert again == 'b'
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_only_the_starting_session_may_cancel(web):
+    owner, other = web.app.test_client(), web.app.test_client()
+    # First requests set each session's client id
+    assert owner.post('/api/chat/unknown/cancel').status_code == 404
+    assert other.post('/api/chat/unknown/cancel').status_code == 404
+
+    result = {}
+    message = "My order arrived broken and I am really unhappy, what now?"
+    thread = threading.Thread(target=lambda: result.update(
+        response=owner.post('/api/chat', json={'message': message, 'request_id': 'r1'})
+    ))
+    thread.start()
+    assert wait_for(lambda: 'r1' in web.active_requests)
+
+    assert other.post('/api/chat/r1/cancel').status_code == 403
+    assert other.post('/api/chat', json={'message': message, 'request_id': 'r1'}).status_code == 409
+
+    response = owner.post('/api/chat/r1/cancel')
+    assert response.status_code == 200
+    thread.join(timeout=5)
+    assert response.get_json()['cancelled'] >= 1
+    assert result['response'].status_code == 499
+    assert web.active_requests == {}
+
+
+def test_request_id_in_flight_is_refused_for_the_same_session(web):
+    assert web.claim_request('dup', 'client-1')
+    assert not web.claim_request('dup', 'client-1')
+    web.release_request('dup', 'http:client-1:dup')
+    assert web.claim_request('dup', 'client-1')
+    web.release_request('dup', 'http:client-1:dup')
+    assert web.active_requests == {}
+
+
+def test_unread_stream_releases_its_request_id(web):
+    client = web.app.test_client()
+    response = client.post('/api/chat', json={'message': 'hello', 'request_id': 's1', 'stream': True})
+    assert 's1' in web.active_requests
+    response.close()
+    assert web.active_requests == {}
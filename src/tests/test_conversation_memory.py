@@ -0,0 +1,83 @@
+import asyncio
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.conversation_memory import ConversationMemory
+from modules.llm_backend import LocalBackend
+
+
+def new_context(memory):
+    context = {'messages': []}
+    memory.init_context(context)
+    return context
+
+
+def add(memory, context, i):
+    return memory.add_turn(context, f"question {i} " + 'word ' * 40, {'response': 'answer ' * 40})
+
+
+def test_old_turns_wait_for_a_summary():
+    memory = ConversationMemory(max_tokens=150, min_recent_turns=1)
+    context = new_context(memory)
+    due = [add(memory, context, i) for i in range(3)]
+    assert due[-1] is True
+    assert context['pending_summary'][0]['user'].startswith('question 0')
+    assert 'earlier_turns' in memory.render(context)
+
+
+def test_falling_behind_folds_extractively():
+    memory = ConversationMemory(max_tokens=150, min_recent_turns=1, max_pending_turns=2)
+    context = new_context(memory)
+    for i in range(5):
+        add(memory, context, i)
+    assert len(context['pending_summary']) <= 2
+    assert 'question 0' in context['summary']
+    assert context['summary_version'] == 1
+
+
+def test_summary_started_before_a_fold_is_dropped():
+    memory = ConversationMemory()
+    context = new_context(memory)
+    version = context['summary_version']
+    assert memory.apply_summary(context, 'folded turns 1-7')
+    assert not memory.apply_summary(context, 'model summary of turns 1-3', version)
+    assert context['summary'] == 'folded turns 1-7'
+    assert memory.apply_summary(context, 'model summary of turns 1-7', context['summary_version'])
+    assert context['summary'] == 'model summary of turns 1-7'
+
+
+def test_bot_keeps_the_fold_when_a_model_summary_finishes_late():
+    bot = AICustomerServiceBot({
+        'name': 'Acme',
+        'cache': {'enabled': False},
+        'telemetry': {'trace_path': None},
+        'memory': {'max_tokens': 150, 'min_recent_turns': 1, 'max_pending_turns': 2}
+    }, backend=LocalBackend())
+    release = asyncio.Event()
+
+    async def slow_summary(stage, system_prompt, prompt, *args, **kwargs):
+        # A faithful model keeps whatever the summary it was given already says
+        base = bot.conversation_history['u1']['summary']
+        await release.wait()
+        return f"{base} | model summary"
+
+    bot._complete = slow_summary
+
+    async def scenario():
+        context = bot._get_conversation_context('u1')
+        for i in range(2):
+            bot._update_context('u1', f"question {i} " + 'word ' * 40, {'response': 'answer ' * 40})
+        # The model summary of the first evicted turn is now in flight
+        await asyncio.sleep(0)
+        for i in range(2, 6):
+            bot._update_context('u1', f"question {i} " + 'word ' * 40, {'response': 'answer ' * 40})
+        release.set()
+        while bot._summarizing:
+            await asyncio.sleep(0.01)
+        return context
+
+    context = asyncio.run(scenario())
+    # The fold of turns 0-2 survives and the next model summary builds on it
+    assert all(f"question {i}" in context['summary'] for i in range(3))
+    assert context['summary'].endswith('model summary')
+    assert not context['pending_summary']
+    assert bot.stale_summaries == 1
+    assert bot.get_metrics()['memory']['stale_summaries'] == bot.stale_summaries
@@ -0,0 +1,55 @@
+import asyncio
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.enrichment import EnrichmentStore
+from modules.llm_backend import LocalBackend
+
+
+def test_running_entries_do_not_block_eviction():
+    async def scenario():
+        store = EnrichmentStore(max_entries=2)
+        running = store.start(asyncio.sleep(1))
+        skipped = [store.skip() for _ in range(3)]
+        ids = list(store.entries)
+        store.entries[running]['task'].cancel()
+        await asyncio.sleep(0)
+        return running, skipped, ids
+
+    running, skipped, ids = asyncio.run(scenario())
+    # The running entry stays; the finished ones behind it are evicted down to the bound
+    assert ids == [running, skipped[-1]]
+
+
+def test_expired_entries_behind_running_work_are_dropped():
+    async def scenario():
+        store = EnrichmentStore(ttl_seconds=0)
+        running = store.start(asyncio.sleep(1))
+        store.skip()
+        store.skip()
+        ids = list(store.entries)
+        store.entries[running]['task'].cancel()
+        await asyncio.sleep(0)
+        return running, ids
+
+    running, ids = asyncio.run(scenario())
+    # Every finished entry has expired at once; only the running one is kept
+    assert ids == [running]
+
+
+def test_degraded_completions_respect_max_pending():
+    company = {
+        'name': 'Acme',
+        'cache': {'enabled': False},
+        'telemetry': {'trace_path': None},
+        'slo': {'deadline_ms': 20, 'hedge_model': None},
+        'enrichment': {'max_pending': 0}
+    }
+    bot = AICustomerServiceBot(company, backend=LocalBackend(latency={'distribution': 'fixed', 'ms': 300}))
+
+    async def scenario():
+        response = await bot.handle_complex_query("My order arrived broken, what are my options?", 'u1')
+        return response, bot.enrichment.pending
+
+    response, pending = asyncio.run(scenario())
+    assert response['degraded'] and response['completion'] == 'skipped'
+    assert pending == 0
+    assert bot.enrichment.get(response['response_id'])['status'] == 'skipped'
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.kb_retriever import KnowledgeRetriever
+from modules.kb_watcher import SourceWatcher
+from modules.knowledge_base import KnowledgeBase
+from modules.llm_backend import LocalBackend
+
+FAQS = [
+    {'question': 'Do you ship abroad?', 'answer': 'Yes, to 40 countries.'},
+    {'question': 'Can I pay by invoice?', 'answer': 'Yes, on annual plans.'}
+]
+
+
+def write(path, data):
+    path.write_text(json.dumps(data))
+    # Force a new signature even within the filesystem's timestamp resolution
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+
+def contents(results):
+    return sorted(json.dumps(result['data'], sort_keys=True) for result in results)
+
+
+def test_watcher_reports_changed_files_once(tmp_path):
+    path = tmp_path / 'faqs.json'
+    write(path, FAQS)
+    seen = []
+    watcher = SourceWatcher([str(path)], seen.append)
+    assert watcher.check() == []
+    write(path, FAQS[:1])
+    assert watcher.check() == [str(path)]
+    assert watcher.check() == []
+    assert seen == [[str(path)]]
+
+
+def test_failed_reload_waits_for_the_next_change(tmp_path):
+    path = tmp_path / 'faqs.json'
+    write(path, FAQS)
+    calls = []
+
+    def callback(paths):
+        calls.append(paths)
+        json.loads(path.read_text())
+
+    watcher = SourceWatcher([str(path)], callback)
+    path.write_text('{"half written')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2_000_000))
+    assert watcher.check() == []
+    assert watcher.check() == []
+    assert len(calls) == 1 and watcher.get_stats()['errors'] == 1
+    write(path, FAQS)
+    assert watcher.check() == [str(path)]
+    assert watcher.get_stats()['reloads'] == 1
+
+
+def test_apply_changes_touches_only_what_changed():
+    kb = KnowledgeBase()
+    version = kb.version
+    faqs = list(kb.categories['faqs'])
+    assert kb.apply_changes('faqs', faqs) == {'added': 0, 'updated': 0, 'deleted': 0}
+    assert kb.version == version
+
+    edited = faqs[1:] + [{'question': 'Do you offer gift wrapping?', 'answer': 'Yes, for $3.'}]
+    assert kb.apply_changes('faqs', edited) == {'added': 1, 'updated': 0, 'deleted': 1}
+    assert kb.version == version + 1
+    assert kb.search('gift wrapping', category='faqs', limit=1)[0]['data']['answer'] == 'Yes, for $3.'
+
+
+def test_incremental_reload_matches_a_fresh_load(tmp_path):
+    kb = KnowledgeBase(source_dir=str(tmp_path))
+    write(tmp_path / 'faqs.json', FAQS)
+    products = dict(kb.categories['products'])
+    products['basic_plan'] = dict(products['basic_plan'], price='$9.99/month')
+    write(tmp_path / 'products.json', products)
+
+    changes = kb.reload()
+    assert changes['products'] == {'added': 0, 'updated': 1, 'deleted': 0}
+    assert changes['faqs']['added'] == 2
+
+    fresh = KnowledgeBase(source_dir=str(tmp_path))
+    for query in ('ship abroad', 'basic plan price', 'invoice', 'password reset'):
+        assert contents(kb.search(query, limit=5)) == contents(fresh.search(query, limit=5))
+    # Added vectors keep the IDF of the last build, so only the best match is compared
+    assert kb.semantic_search('do you deliver overseas', k=1)[0]['data'] == FAQS[0]
+    assert kb.semantic_search('basic plan price', k=1)[0]['data']['price'] == '$9.99/month'
+
+
+def test_retriever_update_reindexes_changed_sections():
+    retriever = KnowledgeRetriever()
+    retriever.index({'faqs': FAQS})
+    version = retriever.version
+    assert retriever.update({'faqs': FAQS}) == {}
+    assert retriever.version == version
+
+    changes = retriever.update({'faqs': [FAQS[0], {'question': 'Refunds?', 'answer': 'Within 30 days.'}]})
+    assert changes == {'updated': 1}
+    assert retriever.version == version + 1
+    assert retriever.search('refunds')[0][0] == 'faqs/1'
+
+
+def test_bot_reload_changes_the_cache_version():
+    company = {'name': 'Acme', 'faqs': FAQS, 'cache': {'enabled': False}, 'telemetry': {'trace_path': None}}
+    bot = AICustomerServiceBot(company, backend=LocalBackend())
+    same = bot.reload_knowledge_base(dict(company))
+    assert same['version'] == same['previous_version'] and bot.kb_reloads == 0
+
+    edited = bot.reload_knowledge_base(dict(company, faqs=FAQS + [{'question': 'Refunds?', 'answer': '30 days.'}]))
+    assert edited['version'] != edited['previous_version']
+    assert edited['changes'] == {'added': 1}
+    assert bot.kb_version == edited['version'] and bot.kb_reloads == 1
+
+
+def test_only_admins_may_reload(web):
+    with sqlite3.connect('chat.db') as conn:
+        conn.execute("INSERT OR IGNORE INTO users (id, username, password, is_admin) VALUES (7, 'agent', '', 0)")
+        conn.execute("INSERT OR IGNORE INTO users (id, username, password, is_admin) VALUES (8, 'admin', '', 1)")
+    client = web.app.test_client()
+    assert client.post('/api/kb/reload').status_code == 302
+    with client.session_transaction() as session:
+        session['_user_id'] = '7'
+    assert client.post('/api/kb/reload').status_code == 302
+    with client.session_transaction() as session:
+        session['_user_id'] = '8'
+    assert client.post('/api/kb/reload').status_code == 200
+
+
+def test_knowledge_bases_keep_their_words_to_themselves():
+    from modules.spell_correct import shared_corrector
+    kb = KnowledgeBase()
+    kb.apply_changes('faqs', [{'question': 'Is the zorblax waterproof?', 'answer': 'Yes.'}])
+    assert kb.spelling is not shared_corrector() and kb.spelling.lookup('zorblaq') == 'zorblax'
+    assert shared_corrector().lookup('zorblaq') == 'zorblaq'
+    assert KnowledgeBase().spelling.lookup('zorblaq') == 'zorblaq'
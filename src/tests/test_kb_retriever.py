@@ -0,0 +1,60 @@
+import json
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.kb_retriever import KnowledgeRetriever, estimate_tokens
+from modules.llm_backend import LocalBackend
+
+KNOWLEDGE = {
+    'faqs': [
+        {'question': 'How do I reset my password?', 'answer': 'Use the forgot password link.'},
+        {'question': 'Do you ship abroad?', 'answer': 'Yes, to 40 countries.'},
+        {'question': 'Can I pay by invoice?', 'answer': 'Yes, on annual plans.'}
+    ],
+    'policies': {
+        'refund': {'summary': 'Refunds within 30 days of purchase'},
+        'shipping': {'summary': 'Shipping takes 5-7 business days'}
+    },
+    'troubleshooting': {
+        'login': {'locked_out': {'steps': ['Reset password', 'Clear cookies']}}
+    }
+}
+
+
+def retriever(**settings):
+    retriever = KnowledgeRetriever(**settings)
+    retriever.index(KNOWLEDGE)
+    return retriever
+
+
+def test_sections_are_split_per_entry():
+    names = set(retriever().sections)
+    assert {'faqs/0', 'faqs/2', 'policies/refund', 'troubleshooting/login/locked_out'} <= names
+    assert len(names) == 6
+
+
+def test_top_k_best_sections_first():
+    sections = retriever(top_k=2).retrieve('how long does shipping take')
+    assert len(sections) <= 2
+    assert list(sections)[0] == 'policies/shipping'
+    assert retriever().retrieve('shipping', top_k=1) == {'policies/shipping': KNOWLEDGE['policies']['shipping']}
+
+
+def test_token_ceiling_skips_sections_that_do_not_fit():
+    full = retriever()
+    budget = estimate_tokens(json.dumps(KNOWLEDGE['faqs'][0])) + 1
+    sections = full.retrieve('password reset', top_k=3, max_tokens=budget)
+    assert sum(estimate_tokens(json.dumps(data)) for data in sections.values()) <= budget
+    assert sections
+
+
+def test_unrelated_query_injects_nothing():
+    assert retriever().retrieve('zebra xylophone') == {}
+
+
+def test_prompt_carries_only_the_retrieved_sections():
+    company = {'name': 'Acme', 'faqs': KNOWLEDGE['faqs'], 'cache': {'enabled': False},
+               'telemetry': {'trace_path': None}}
+    bot = AICustomerServiceBot(company, backend=LocalBackend())
+    knowledge = bot._get_relevant_knowledge('do you ship abroad')
+    assert 'Yes, to 40 countries.' in knowledge
+    assert 'forgot password' not in knowledge
+    assert bot._get_relevant_knowledge('zebra xylophone') == "No matching knowledge base entries."
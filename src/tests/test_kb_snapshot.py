@@ -0,0 +1,89 @@
+import logging
+import numpy as np
+import pytest
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.kb_snapshot import ALIGN, Snapshot, SnapshotWriter
+from modules.knowledge_base import KnowledgeBase
+from modules.llm_backend import LocalBackend
+
+COMPANY = {
+    'name': 'Acme',
+    'products': [{'name': 'Widget', 'description': 'A small widget', 'price': '$5'}],
+    'faqs': [{'question': 'Do you ship abroad?', 'answer': 'Yes, to 40 countries.'}],
+    'cache': {'enabled': False},
+    'telemetry': {'trace_path': None}
+}
+
+
+def make_bot(company_data):
+    return AICustomerServiceBot(company_data, backend=LocalBackend())
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'kb.bin')
+    writer = SnapshotWriter()
+    writer.add_array('numbers', np.arange(10, dtype=np.float32))
+    writer.add_json('doc', {'a': [1, 2]})
+    writer.add_strings('names', sorted(['beta', 'alpha', 'gamma']))
+    writer.write(path, meta={'kb_version': 'v1'})
+
+    snapshot = Snapshot(path)
+    assert snapshot.meta == {'kb_version': 'v1'}
+    assert snapshot.array('numbers').tolist() == list(range(10))
+    assert all(block['offset'] % ALIGN == 0 for block in snapshot.blocks.values())
+    assert snapshot.json('doc') == {'a': [1, 2]}
+    names = snapshot.strings('names')
+    assert list(names) == ['alpha', 'beta', 'gamma']
+    assert names.find('beta') == 1 and names.find('delta') == -1
+    assert 'doc' in snapshot and 'missing' not in snapshot
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a snapshot at all')
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_object_arrays_are_rejected():
+    with pytest.raises(ValueError):
+        SnapshotWriter().add_array('objects', np.array([{}, []], dtype=object))
+
+
+def test_mapped_knowledge_base_searches_like_the_built_one(tmp_path):
+    path = str(tmp_path / 'kb.bin')
+    built = KnowledgeBase()
+    writer = SnapshotWriter()
+    built.add_to_snapshot(writer)
+    writer.write(path)
+
+    mapped = KnowledgeBase(snapshot=path)
+    assert mapped.snapshot is not None
+    for query in ('storage plan pricing', 'reset my password'):
+        assert mapped.search(query, limit=5) == built.search(query, limit=5)
+
+
+def test_snapshot_key_ignores_operational_settings():
+    bot = make_bot(COMPANY)
+    tuned = make_bot(dict(COMPANY, slo={'deadline_ms': 900}, llm_client={'max_in_flight': 2},
+                          models={'default': 'gpt-4o-mini'}))
+    assert bot._snapshot_source() == tuned._snapshot_source()
+
+    edited = make_bot(dict(COMPANY, faqs=[{'question': 'Do you ship abroad?', 'answer': 'No.'}]))
+    assert bot._snapshot_source() != edited._snapshot_source()
+
+
+def test_stale_snapshot_is_rebuilt_with_a_warning(tmp_path, caplog):
+    path = str(tmp_path / 'kb.bin')
+    writer = SnapshotWriter()
+    make_bot(COMPANY).add_to_snapshot(writer)
+    writer.write(path)
+
+    fresh = make_bot(dict(COMPANY, snapshot={'path': path}))
+    assert fresh._open_snapshot() is not None
+
+    renamed = dict(COMPANY, name='Acme Ltd', snapshot={'path': path})
+    with caplog.at_level(logging.WARNING):
+        bot = make_bot(renamed)
+    assert any('compiled from different content' in record.getMessage() for record in caplog.records)
+    assert 'Acme Ltd' in bot._get_system_prompt()
@@ -0,0 +1,79 @@
+import asyncio
+import statistics
+import pytest
+from modules.llm_backend import (HTTPBackend, LLMBackend, LLMBackendError, LLMResult, LocalBackend,
+                                 create_backend)
+
+MESSAGES = [{'role': 'system', 'content': 'You are a support agent.'},
+            {'role': 'user', 'content': 'Where is my order?'}]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def collect(stream):
+    async def scenario():
+        return [chunk async for chunk in stream]
+    return run(scenario())
+
+
+def test_local_backend_is_deterministic_per_seed():
+    first = run(LocalBackend(seed=3).complete('gpt-4', MESSAGES, 'answer'))
+    second = run(LocalBackend(seed=3).complete('gpt-4', MESSAGES, 'answer'))
+    assert first == second
+    assert isinstance(first, LLMResult) and first.model == 'gpt-4'
+    assert first.prompt_tokens > 0 and first.completion_tokens > 0
+
+
+def test_stream_yields_the_completion_in_chunks():
+    backend = LocalBackend()
+    chunks = collect(backend.stream('gpt-4', MESSAGES))
+    assert len(chunks) > 1
+    assert ''.join(chunks) == run(LocalBackend().complete('gpt-4', MESSAGES, 'stream')).content
+
+
+def test_injected_failures_carry_the_status():
+    backend = LocalBackend(failure_rate=1.0, failure_status=429)
+    with pytest.raises(LLMBackendError) as error:
+        run(backend.complete('gpt-4', MESSAGES))
+    assert error.value.status_code == 429
+    with pytest.raises(LLMBackendError):
+        collect(backend.stream('gpt-4', MESSAGES))
+
+
+def test_latency_distributions():
+    assert LocalBackend(latency={'distribution': 'fixed', 'ms': 250}).sample_latency() == 0.25
+    uniform = LocalBackend(latency={'distribution': 'uniform', 'min_ms': 100, 'max_ms': 200})
+    assert all(0.1 <= uniform.sample_latency() <= 0.2 for _ in range(100))
+    lognormal = LocalBackend(latency={'distribution': 'lognormal', 'median_ms': 400, 'p95_ms': 1200})
+    samples = sorted(lognormal.sample_latency() for _ in range(4000))
+    assert statistics.median(samples) == pytest.approx(0.4, rel=0.1)
+    assert samples[int(0.95 * len(samples))] == pytest.approx(1.2, rel=0.15)
+    # Per-model overrides win over the default
+    backend = LocalBackend(latency={'distribution': 'fixed', 'ms': 900},
+                           model_latency={'gpt-3.5-turbo': {'distribution': 'fixed', 'ms': 100}})
+    assert backend.sample_latency('gpt-3.5-turbo') == 0.1 and backend.sample_latency('gpt-4') == 0.9
+
+
+def test_default_stream_sends_the_whole_completion():
+    class Whole(LLMBackend):
+        async def complete(self, model, messages, stage=None):
+            return LLMResult('all at once', model)
+
+    assert collect(Whole().stream('m', MESSAGES)) == ['all at once']
+
+
+def test_create_backend_from_config():
+    backend = create_backend({'type': 'local', 'failure_rate': 0.5, 'seed': 7})
+    assert isinstance(backend, LocalBackend) and backend.failure_rate == 0.5
+    assert isinstance(create_backend({'type': 'http', 'base_url': 'http://example.test/'}), HTTPBackend)
+    with pytest.raises(ValueError):
+        create_backend({'type': 'carrier-pigeon'})
+
+
+def test_unreachable_http_backend_raises_backend_error():
+    backend = HTTPBackend(base_url='http://127.0.0.1:9', timeout=1)
+    with pytest.raises(LLMBackendError) as error:
+        run(backend.complete('gpt-4', MESSAGES))
+    assert error.value.status_code is None
@@ -0,0 +1,176 @@
+import asyncio
+import pytest
+from modules.llm_backend import LLMBackend, LLMBackendError, LLMResult
+from modules.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, LLMOverloadedError
+from modules.priority_scheduler import PRIORITY_CRITICAL, PRIORITY_NORMAL
+from modules.telemetry import Telemetry
+
+MESSAGES = [{'role': 'user', 'content': 'hello'}]
+
+
+class ScriptedBackend(LLMBackend):
+    """Each call pops the next step: an exception to raise, or seconds to wait before answering"""
+
+    def __init__(self, steps=None):
+        self.steps = list(steps or [])
+        self.calls = 0
+
+    async def complete(self, model, messages, stage=None):
+        self.calls += 1
+        step = self.steps.pop(0) if self.steps else 0.0
+        if isinstance(step, Exception):
+            raise step
+        await asyncio.sleep(step)
+        return LLMResult('ok', model, 10, 5)
+
+    async def stream(self, model, messages, stage=None):
+        # Steps are chunks: text to send, seconds to stall or an exception to raise
+        self.calls += 1
+        for step in self.steps:
+            if isinstance(step, Exception):
+                raise step
+            if isinstance(step, float):
+                await asyncio.sleep(step)
+            else:
+                yield step
+
+
+def open_breaker(client: LLMClient):
+    for _ in range(client.breaker.failure_threshold):
+        client.breaker.record_failure()
+    assert client.breaker.state == 'open'
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_timeout():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_retryable_errors_are_retried():
+    backend = ScriptedBackend([LLMBackendError('busy', 503), 0.0])
+    client = LLMClient(backend, backoff_base=0.001)
+    result = asyncio.run(client.complete('gpt', MESSAGES))
+    assert result.content == 'ok'
+    assert backend.calls == 2
+    assert client.stats['retries'] == 1
+
+
+def test_rejected_requests_do_not_open_the_breaker():
+    backend = ScriptedBackend([LLMBackendError('bad request', 400)] * 5)
+    client = LLMClient(backend, failure_threshold=2)
+    for _ in range(5):
+        with pytest.raises(LLMBackendError):
+            asyncio.run(client.complete('gpt', MESSAGES))
+    assert client.breaker.state == 'closed'
+
+
+def test_only_the_probe_call_frees_the_probe_slot():
+    async def scenario():
+        backend = ScriptedBackend([1.0, 1.0])
+        client = LLMClient(backend, reset_timeout=0)
+        # A call admitted while the breaker was still closed
+        earlier = asyncio.ensure_future(client.complete('gpt', MESSAGES))
+        await asyncio.sleep(0.01)
+        open_breaker(client)
+        probe = asyncio.ensure_future(client.complete('gpt', MESSAGES))
+        await asyncio.sleep(0.01)
+        assert client.breaker.state == 'half_open'
+
+        # The earlier call ending must not let a second probe through
+        earlier.cancel()
+        await asyncio.sleep(0.01)
+        with pytest.raises(CircuitOpenError):
+            await client.complete('gpt', MESSAGES)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return client
+
+    client = asyncio.run(scenario())
+    # The cancelled probe handed its slot back
+    assert not client.breaker.probe_in_flight
+
+
+def test_queue_full_rejection_does_not_use_the_probe_slot():
+    async def scenario():
+        client = LLMClient(ScriptedBackend(), reset_timeout=0, max_queue=0)
+        open_breaker(client)
+        with pytest.raises(LLMOverloadedError):
+            await client.complete('gpt', MESSAGES)
+        assert not client.breaker.probe_in_flight
+        client.max_queue = 10
+        await client.complete('gpt', MESSAGES)
+        return client
+
+    client = asyncio.run(scenario())
+    assert client.breaker.state == 'closed'
+    assert client.stats['rejected_queue_full'] == 1
+    assert client.stats['rejected_circuit_open'] == 0
+
+
+def test_deadline_raises_timeout_error():
+    client = LLMClient(ScriptedBackend([1.0]), timeout=0.05, max_retries=0)
+    with pytest.raises(LLMBackendError) as error:
+        asyncio.run(client.complete('gpt', MESSAGES))
+    assert error.value.status_code == 504
+    assert client.stats['timeouts'] == 1
+
+
+def test_critical_call_overtakes_queued_calls_from_the_same_tenant():
+    async def scenario():
+        client = LLMClient(ScriptedBackend([0.01] * 41))
+        finished = []
+
+        async def call(name, priority):
+            await client.complete('gpt', MESSAGES, tenant='acme', priority=priority)
+            finished.append(name)
+
+        tasks = [asyncio.ensure_future(call(i, PRIORITY_NORMAL)) for i in range(40)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(call('critical', PRIORITY_CRITICAL)))
+        await asyncio.gather(*tasks)
+        return finished
+
+    finished = asyncio.run(scenario())
+    # The first ten hold the tenant's slots; the critical call takes the next free one
+    assert finished.index('critical') <= 10
+
+
+def consume(client, **kwargs):
+    async def scenario():
+        return [chunk async for chunk in client.stream('gpt', MESSAGES, **kwargs)]
+    return asyncio.run(scenario())
+
+
+def test_stream_deadline_covers_every_chunk():
+    telemetry = Telemetry(trace_path=None)
+    client = LLMClient(ScriptedBackend(['a', 'b', 1.0, 'c']), telemetry=telemetry)
+    with pytest.raises(LLMBackendError) as error:
+        consume(client, timeout=0.1)
+    assert error.value.status_code == 504
+    assert client.stats['timeouts'] == 1 and client.breaker.failures == 1
+    assert telemetry.tokens['stream:gpt']['errors'] == 1
+    assert client.get_stats()['in_flight'] == 0
+
+
+def test_stream_error_after_first_token_is_recorded():
+    telemetry = Telemetry(trace_path=None)
+    client = LLMClient(ScriptedBackend(['a', LLMBackendError('reset', 502)]), telemetry=telemetry)
+    with pytest.raises(LLMBackendError):
+        consume(client)
+    assert client.stats['failures'] == 1 and client.breaker.failures == 1
+    assert telemetry.tokens['stream:gpt']['errors'] == 1
+
+
+def test_complete_stream_records_success():
+    client = LLMClient(ScriptedBackend(['hello ', 'world']))
+    assert consume(client) == ['hello ', 'world']
+    assert client.breaker.failures == 0 and client.usage['gpt']['calls'] == 1
@@ -0,0 +1,20 @@
+import pytest
+from modules.metrics import LatencyRecorder
+
+
+@pytest.mark.parametrize('values, pct, expected', [
+    (list(range(1, 11)), 50, 5),
+    (list(range(1, 11)), 95, 10),
+    (list(range(1, 11)), 90, 9),
+    (list(range(1, 11)), 10, 1),
+    ([1, 2, 3, 4], 50, 2),
+    ([1, 2, 3, 4], 75, 3),
+    ([1, 2, 3, 4], 95, 4),
+    ([7], 50, 7),
+])
+def test_nearest_rank_percentile(values, pct, expected):
+    assert LatencyRecorder._percentile(values, pct) == expected
+
+
+def test_empty_percentile():
+    assert LatencyRecorder._percentile([], 50) is None
@@ -0,0 +1,84 @@
+import asyncio
+from modules.prefetcher import Prefetcher
+
+
+def test_answer_prefetch_is_off_by_default():
+    prefetcher = Prefetcher()
+    assert prefetcher.answer_budget('u1', version=1, queue_depth=0) == 0
+
+
+def test_budget_when_opted_in():
+    prefetcher = Prefetcher(max_answers_per_turn=2)
+    assert prefetcher.answer_budget('u1', version=1, queue_depth=0) == 2
+    assert prefetcher.answer_budget('u1', version=1, queue_depth=prefetcher.skip_queue_depth) == 0
+
+
+def test_finished_prefetch_is_a_hit():
+    async def scenario():
+        prefetcher = Prefetcher(max_answers_per_turn=1)
+
+        async def work():
+            return {'response': 'Delivery takes 3 days.'}
+
+        prefetcher.start_answer('u1', "How long does delivery take?", 1, work())
+        await asyncio.sleep(0)
+        result = await prefetcher.take_answer('u1', "how long does delivery take", 1)
+        return result, prefetcher.get_stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == {'response': 'Delivery takes 3 days.'}
+    assert stats['answer_hits'] == 1
+
+
+def test_unfinished_prefetch_is_cancelled_not_awaited():
+    async def scenario():
+        prefetcher = Prefetcher(max_answers_per_turn=1)
+        blocker = asyncio.Event()
+
+        async def work():
+            await blocker.wait()
+            return {'response': 'late'}
+
+        task = prefetcher.start_answer('u1', "How do I get a refund?", 1, work())
+        await asyncio.sleep(0)
+        # Returns at once instead of waiting behind the low-priority call
+        result = await asyncio.wait_for(prefetcher.take_answer('u1', "How do I get a refund?", 1), 1)
+        await asyncio.sleep(0)
+        return result, task, prefetcher.get_stats()
+
+    result, task, stats = asyncio.run(scenario())
+    assert result is None
+    assert task.cancelled()
+    assert stats['answers_unfinished'] == 1
+    assert stats['answer_misses'] == 1
+
+
+def test_other_predictions_are_discarded_and_versions_checked():
+    async def scenario():
+        prefetcher = Prefetcher(max_answers_per_turn=2)
+
+        async def work(answer):
+            return {'response': answer}
+
+        prefetcher.start_answer('u1', "How much does it cost?", 1, work('price'))
+        prefetcher.start_answer('u1', "Is it in stock?", 1, work('stock'))
+        await asyncio.sleep(0)
+        result = await prefetcher.take_answer('u1', "How much does it cost?", 2)
+        return result, prefetcher.get_stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result is None
+    assert stats['answers_wasted'] == 2
+
+
+def test_invalidate_drops_warmed_retrievals():
+    prefetcher = Prefetcher()
+    prefetcher.warm_retrieval("Is it in stock?", {'products': {}})
+    assert prefetcher.get_retrieval("is it in stock") == {'products': {}}
+    prefetcher.invalidate()
+    assert prefetcher.get_retrieval("is it in stock") is None
+
+
+def test_predict_follows_topic_transitions():
+    prefetcher = Prefetcher()
+    assert prefetcher.predict('shipping')[0] == "How can I track my order?"
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from modules.priority_scheduler import PRIORITY_CRITICAL, PRIORITY_LOW, PRIORITY_NORMAL, PriorityGate
+
+
+async def queue(gate, order, name, priority):
+    await gate.acquire(priority)
+    order.append(name)
+
+
+def test_free_slots_are_taken_immediately():
+    async def scenario():
+        gate = PriorityGate(capacity=2)
+        await gate.acquire()
+        await gate.acquire(PRIORITY_LOW)
+        return gate
+
+    gate = asyncio.run(scenario())
+    assert gate.available == 0
+    assert gate.get_stats()['dispatched'] == {'normal': 1, 'low': 1}
+
+
+def test_most_important_waiter_goes_first():
+    async def scenario():
+        gate = PriorityGate(capacity=1)
+        await gate.acquire()
+        order = []
+        tasks = [asyncio.ensure_future(queue(gate, order, name, priority)) for name, priority in
+                 (('summary', PRIORITY_LOW), ('question', PRIORITY_NORMAL), ('escalated', PRIORITY_CRITICAL))]
+        await asyncio.sleep(0)
+        assert gate.get_stats()['waiting'] == {'low': 1, 'normal': 1, 'critical': 1}
+        for _ in tasks:
+            gate.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ['escalated', 'question', 'summary']
+
+
+def test_waiting_ages_low_priority_work():
+    gate = PriorityGate(capacity=1, aging_seconds=5.0)
+    # A low-priority request queued 20s earlier outranks a fresh normal one
+    assert gate._rank(PRIORITY_LOW, 0.0) < gate._rank(PRIORITY_NORMAL, 20.0)
+    assert gate._rank(PRIORITY_LOW, 0.0) > gate._rank(PRIORITY_NORMAL, 1.0)
+
+
+def test_cancelled_waiter_does_not_leak_the_slot():
+    async def scenario():
+        gate = PriorityGate(capacity=1)
+        await gate.acquire()
+        order = []
+        cancelled = asyncio.ensure_future(queue(gate, order, 'cancelled', PRIORITY_CRITICAL))
+        waiting = asyncio.ensure_future(queue(gate, order, 'waiting', PRIORITY_NORMAL))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        gate.release()
+        await waiting
+        gate.release()
+        return order, gate.available
+
+    order, available = asyncio.run(scenario())
+    assert order == ['waiting']
+    assert available == 1
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    async def scenario():
+        gate = PriorityGate(capacity=1)
+        await gate.acquire()
+        order = []
+        first = asyncio.ensure_future(queue(gate, order, 'first', PRIORITY_CRITICAL))
+        second = asyncio.ensure_future(queue(gate, order, 'second', PRIORITY_NORMAL))
+        await asyncio.sleep(0)
+        # The slot is handed over, then the receiver is cancelled before it runs
+        gate.release()
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await second
+        return order
+
+    assert asyncio.run(scenario()) == ['second']
@@ -0,0 +1,128 @@
+import pytest
+from modules.kb_retriever import KnowledgeRetriever
+from modules.query_router import QueryRouter
+from modules.spell_correct import SpellCorrector
+
+COMPANY = {
+    'name': 'Acme',
+    'business_hours': 'Mon-Fri 9am-5pm',
+    'support_email': 'help@acme.test',
+    'products': [{'name': 'Basic', 'price': '$10/month'}]
+}
+
+
+@pytest.fixture
+def router():
+    retriever = KnowledgeRetriever()
+    retriever.index({
+        'faqs': [
+            {'question': 'How do I reset my password?', 'answer': 'Use the forgot password link.'},
+            {'question': 'What is your return policy?', 'answer': '30 days.'}
+        ]
+    })
+    return QueryRouter(COMPANY, retriever, spelling=SpellCorrector())
+
+
+@pytest.mark.parametrize('message', [
+    "this thing is broken",
+    "my shipment is late",
+    "where is my shipment?",
+    "hi my order is missing",
+    "hello refund please",
+    "Hi, I can't log in",
+    "which option?",
+    "nothing works on my machine",
+])
+def test_support_issues_are_not_greetings(router, message):
+    assert router.classify(message)[1] < router.thresholds['greeting']
+    assert router.route(message) is None
+
+
+@pytest.mark.parametrize('message, intent', [
+    ("hello", 'greeting'),
+    ("Hi there!", 'greeting'),
+    ("good morning", 'greeting'),
+    ("bye, thanks", 'farewell'),
+])
+def test_bare_small_talk_uses_templates(router, message, intent):
+    result = router.route(message)
+    assert result['routed'] == 'template'
+    assert result['topic'] == intent
+
+
+def test_keywords_match_whole_words_only(router):
+    scores = router.analyzer.analyze("which shipment is this")
+    assert scores.get('greeting', 0) == 0
+
+
+def test_business_hours_template(router):
+    result = router.route("what are your hours?")
+    assert result['routed'] == 'template'
+    assert 'Mon-Fri 9am-5pm' in result['response']
+
+
+def test_upset_customers_go_to_llm(router):
+    assert router.classify("hello, this is urgent")[0] == 'general'
+
+
+def test_exact_faq_is_answered_locally(router):
+    result = router.route("How do I reset my password?")
+    assert result['routed'] in ('kb', 'semantic')
+    assert result['response'] == 'Use the forgot password link.'
+
+
+def test_stats_count_tiers(router):
+    router.route("hello")
+    router.route("my shipment is late")
+    stats = router.get_stats()
+    assert stats['total'] == 2
+    assert stats['template'] == 1
+    assert stats['llm'] == 1
+    assert stats['bypass_rate'] == 0.5
+
+
+def test_misspelled_intent_is_corrected(router):
+    result = router.route("what is the prcing?")
+    assert result['topic'] == 'pricing'
+    stats = router.get_stats()
+    assert stats['corrected'] == 1
+    assert stats['intent_changed'] == 1
+
+
+@pytest.mark.parametrize('message', [
+    "I need help with my order, it arrived broken",
+    "I want to contact support about a double charge",
+    "what's the price of the pro plan and can I get a refund",
+    "how much does it cost to ship to canada",
+    "I can't reset my password, the link is expired",
+    "What is your return policy for digital products?",
+])
+def test_questions_with_an_extra_ask_go_to_llm(router, message):
+    assert router.route(message) is None
+
+
+@pytest.mark.parametrize('message, intent', [
+    ("How can I contact support?", 'support'),
+    ("how much does the Basic plan cost?", 'pricing'),
+    ("what are your business hours?", 'business_hours'),
+])
+def test_plain_intents_still_use_templates(router, message, intent):
+    result = router.route(message)
+    assert result['routed'] == 'template' and result['topic'] == intent
+
+
+def test_semantic_match_needs_a_clear_winner(router):
+    assert router.route("what is your returns policy")['response'] == '30 days.'
+    router.semantic_margin = 1.0
+    assert router._match_faq_semantic("what is your returns policy") is None
+
+
+def test_follow_ups_and_escalations_skip_the_router():
+    from ai_enhanced_bot import AICustomerServiceBot
+    from modules.llm_backend import LocalBackend
+    bot = AICustomerServiceBot(dict(COMPANY, cache={'enabled': False}, telemetry={'trace_path': None}),
+                               backend=LocalBackend())
+    assert bot._route_locally("hello", 'fresh')['routed'] == 'template'
+    assert bot._route_locally("hello", 'fresh') is None
+    bot._get_conversation_context('escalated')['escalated'] = True
+    assert bot._route_locally("hello", 'escalated') is None
@@ -0,0 +1,115 @@
+import numpy as np
+from modules.kb_snapshot import SnapshotWriter
+from modules.knowledge_base import KnowledgeBase
+from modules.related_graph import RelatedGraph
+from modules.vector_index import VectorIndex
+
+ITEMS = [(text, 'faqs', {'id': i}) for i, text in enumerate([
+    'How do I return a product for a refund?',
+    'Refund policy for returned items',
+    'How long does shipping take?',
+    'Express shipping and delivery times',
+    'I forgot my password',
+    'Reset password and login problems',
+    'How much does the Pro plan cost?',
+    'Pricing for the Basic and Pro plans',
+])]
+
+
+def vectors(items=ITEMS):
+    index = VectorIndex()
+    index.build(items)
+    return index
+
+
+def reference(index, size, min_score):
+    """Neighbor lists by brute force: every live row against every other"""
+    live = index.live_rows()
+    scores = index.similarities(index.row_vectors(live))
+    lists = {}
+    for i, row in enumerate(live):
+        scores[i, row] = -np.inf
+        order = [int(j) for j in np.argsort(-scores[i], kind='stable') if scores[i, j] >= min_score][:size]
+        lists[int(row)] = order
+    return lists
+
+
+def neighbor_lists(graph, index):
+    return {int(row): [neighbor for neighbor, _ in graph.get(int(row))] for row in index.live_rows()}
+
+
+def test_build_matches_brute_force():
+    index = vectors()
+    graph = RelatedGraph(size=3)
+    graph.build(index)
+    assert neighbor_lists(graph, index) == reference(index, 3, graph.min_score)
+    # Paraphrased pairs end up next to each other
+    assert graph.get(0)[0][0] == 1 and graph.get(4)[0][0] == 5
+    assert graph.get(99) == []
+
+
+def test_incremental_update_matches_a_rebuild():
+    index = vectors()
+    graph = RelatedGraph(size=3)
+    graph.build(index)
+
+    index.remove([1, 6])
+    added = index.add([
+        ('Refunds for damaged items', 'faqs', {'id': 8}),
+        ('Plan prices per month', 'faqs', {'id': 9}),
+    ])
+    graph.update(index, added, [1, 6])
+
+    rebuilt = RelatedGraph(size=3)
+    rebuilt.build(index)
+    assert neighbor_lists(graph, index) == neighbor_lists(rebuilt, index)
+    assert all(neighbor not in (1, 6) for lists in neighbor_lists(graph, index).values() for neighbor in lists)
+
+
+def test_related_articles_by_key_and_position():
+    kb = KnowledgeBase()
+    related = kb.get_related_articles('products', 'basic_plan')
+    assert related and len(related) <= kb.related_size
+    assert all(article.get('key') != 'basic_plan' for article in related)
+    assert related == sorted(related, key=lambda article: -article['score'])
+    first_faq, _, _ = next(kb._entries(kb.categories['faqs']))
+    assert kb.get_related_articles('faqs', 0) == kb.get_related_articles('faqs', first_faq)
+    assert kb.get_related_articles('faqs', 999) == []
+    assert kb.get_related_articles('nope', 'basic_plan') == []
+
+
+def test_related_articles_follow_content_changes():
+    kb = KnowledgeBase()
+    kb.get_related_articles('products', 'basic_plan')
+    faqs = list(kb.categories['faqs']) + [{'question': 'Is the Basic plan storage enough?',
+                                           'answer': 'Basic plan includes 5GB storage.'}]
+    kb.apply_changes('faqs', faqs)
+    related = kb.get_related_articles('products', 'basic_plan')
+    assert any(article['category'] == 'faqs' and 'Basic plan' in article['data']['question']
+               for article in related)
+
+
+def test_snapshot_graph_matches(tmp_path):
+    built = KnowledgeBase()
+    writer = SnapshotWriter()
+    built.add_to_snapshot(writer)
+    writer.write(str(tmp_path / 'kb.bin'))
+    mapped = KnowledgeBase(snapshot=str(tmp_path / 'kb.bin'))
+
+    assert mapped.related is not None
+    for category, key in (('products', 'pro_plan'), ('faqs', 0), ('policies', 'refund')):
+        assert mapped.get_related_articles(category, key) == built.get_related_articles(category, key)
+
+
+def test_snapshot_without_related_blocks(tmp_path):
+    built = KnowledgeBase()
+    writer = SnapshotWriter()
+    built.add_to_snapshot(writer)
+    # Snapshots compiled before related articles existed have no kb/related/* blocks
+    writer.blocks = {name: block for name, block in writer.blocks.items() if not name.startswith('kb/related/')}
+    writer.write(str(tmp_path / 'old.bin'))
+    mapped = KnowledgeBase(snapshot=str(tmp_path / 'old.bin'))
+
+    assert mapped.snapshot is not None and mapped.related is None
+    for category, key in (('products', 'pro_plan'), ('faqs', 0), ('policies', 'refund')):
+        assert mapped.get_related_articles(category, key) == built.get_related_articles(category, key)
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from modules.request_coalescer import RequestCoalescer
+
+
+def test_identical_requests_share_one_computation():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {'response': 'shared'}
+
+        results = await asyncio.gather(*(coalescer.run('k', work) for _ in range(5)))
+        return calls, results, coalescer.get_stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result == {'response': 'shared'} for result in results)
+    # Each waiter can personalize its copy without touching the others
+    results[0]['response'] = 'changed'
+    assert results[1]['response'] == 'shared'
+    assert stats['computations'] == 1 and stats['coalesced'] == 4 and stats['in_flight'] == 0
+
+
+def test_finished_keys_are_computed_again():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return {'response': len(calls)}
+
+        first = await coalescer.run('k', work)
+        second = await coalescer.run('k', work)
+        return first, second
+
+    assert asyncio.run(scenario()) == ({'response': 1}, {'response': 2})
+
+
+def test_one_waiter_leaving_does_not_cancel_the_others():
+    async def scenario():
+        coalescer = RequestCoalescer()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return {'response': 'done'}
+
+        leaving = asyncio.ensure_future(coalescer.run('k', work))
+        staying = asyncio.ensure_future(coalescer.run('k', work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return await staying, leaving.cancelled(), coalescer.get_stats()
+
+    result, cancelled, stats = asyncio.run(scenario())
+    assert result == {'response': 'done'} and cancelled
+    assert stats['abandoned'] == 0
+
+
+def test_last_waiter_leaving_cancels_the_work():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        started = asyncio.Event()
+        finished = []
+
+        async def work():
+            started.set()
+            await asyncio.sleep(1)
+            finished.append(1)
+
+        waiter = asyncio.ensure_future(coalescer.run('k', work))
+        await started.wait()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return finished, coalescer.get_stats()
+
+    finished, stats = asyncio.run(scenario())
+    assert finished == []
+    assert stats['abandoned'] == 1 and stats['in_flight'] == 0
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        coalescer = RequestCoalescer()
+
+        async def work():
+            await asyncio.sleep(0)
+            raise RuntimeError('provider down')
+
+        return await asyncio.gather(*(coalescer.run('k', work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import threading
+from modules.response_cache import REPO_ROOT, ResponseCache
+
+
+def test_default_path_is_under_the_repository_root():
+    assert os.path.isabs(REPO_ROOT)
+    assert os.path.isdir(os.path.join(REPO_ROOT, 'src', 'modules'))
+
+
+def test_relative_path_ignores_working_directory(tmp_path, monkeypatch):
+    root, elsewhere = tmp_path / 'root', tmp_path / 'src'
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    monkeypatch.setattr('modules.response_cache.REPO_ROOT', str(root))
+
+    cache = ResponseCache(db_path='data/response_cache.db')
+    assert cache.db_path == str(root / 'data' / 'response_cache.db')
+    assert (root / 'data' / 'response_cache.db').exists()
+    assert list(elsewhere.iterdir()) == []
+
+
+def test_memory_hit_returns_a_copy():
+    async def scenario():
+        cache = ResponseCache(db_path=None)
+        await cache.set('k', {'response': 'hi'})
+        first = await cache.get('k')
+        first['response'] = 'changed'
+        return await cache.get('k'), cache.get_stats()
+
+    value, stats = asyncio.run(scenario())
+    assert value == {'response': 'hi'}
+    assert stats['memory_hits'] == 2
+
+
+def test_disk_tier_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.db')
+
+    async def scenario():
+        await ResponseCache(db_path=path).set('k', {'response': 'from disk'})
+        reader = ResponseCache(db_path=path)
+        return await reader.get('k'), await reader.get('missing'), reader.get_stats()
+
+    value, missing, stats = asyncio.run(scenario())
+    assert value == {'response': 'from disk'}
+    assert missing is None
+    assert stats['disk_hits'] == 1 and stats['misses'] == 1
+
+
+def test_sqlite_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResponseCache(db_path=str(tmp_path / 'cache.db'))
+    threads = []
+    disk_get, disk_set = cache._disk_get, cache._disk_set
+
+    def record_get(*args):
+        threads.append(threading.current_thread())
+        return disk_get(*args)
+
+    def record_set(*args):
+        threads.append(threading.current_thread())
+        return disk_set(*args)
+
+    monkeypatch.setattr(cache, '_disk_get', record_get)
+    monkeypatch.setattr(cache, '_disk_set', record_set)
+
+    async def scenario():
+        await cache.set('k', {'response': 'hi'})
+        await cache.get('other')
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert len(threads) == 2
+    assert all(thread is not loop_thread for thread in threads)
+
+
+def test_expired_entries_miss(tmp_path):
+    async def scenario():
+        cache = ResponseCache(ttl_seconds=-1, db_path=str(tmp_path / 'cache.db'))
+        await cache.set('k', {'response': 'old'})
+        return await cache.get('k'), cache.get_stats()
+
+    value, stats = asyncio.run(scenario())
+    assert value is None
+    assert stats['expired'] == 2 and stats['misses'] == 1
@@ -0,0 +1,103 @@
+import math
+import pytest
+from modules.kb_snapshot import Snapshot, SnapshotWriter
+from modules.search_index import MappedSearchIndex, SearchIndex, analyze, stem
+
+DOCUMENTS = [
+    ('Refunds are issued within 30 days of purchase', 'policies', {'id': 'refund'}),
+    ('Shipping takes 5-7 business days; express shipping takes 2 days', 'policies', {'id': 'shipping'}),
+    ('Reset your password from the login page', 'faqs', {'id': 'password'}),
+    ('Pro plan pricing and billing questions', 'products', {'id': 'pro'}),
+    ('Refund a digital purchase? Digital products are non-refundable', 'faqs', {'id': 'digital'}),
+]
+
+
+def build(drift=0.05):
+    index = SearchIndex(drift=drift)
+    for text, category, document in DOCUMENTS:
+        index.add(text, category, document)
+    return index
+
+
+def bm25(query, documents, k1=1.2, b=0.75):
+    """Reference BM25 computed from scratch"""
+    docs = [analyze(text) for text in documents]
+    avg = sum(map(len, docs)) / len(docs)
+    scores = [0.0] * len(docs)
+    for term in set(analyze(query)):
+        frequency = sum(term in doc for doc in docs)
+        if not frequency:
+            continue
+        idf = math.log(1 + (len(docs) - frequency + 0.5) / (frequency + 0.5))
+        for i, doc in enumerate(docs):
+            tf = doc.count(term)
+            if tf:
+                scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg))
+    return scores
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('refunds', 'refund'), ('refunded', 'refund'), ('refunding', 'refund'), ('pricing', 'pric'),
+    ('price', 'pric'), ('status', 'status'), ('boxes', 'box'), ('running', 'run')
+])
+def test_stem(word, expected):
+    assert stem(word) == expected
+
+
+def test_scores_match_reference_bm25():
+    index = build()
+    expected = bm25('refund purchase', [text for text, _, _ in DOCUMENTS])
+    scores = index.score('refund purchase')
+    assert set(scores) == {i for i, score in enumerate(expected) if score}
+    for doc_number, score in scores.items():
+        assert score == pytest.approx(expected[doc_number])
+
+
+def test_search_ranks_and_pages():
+    index = build()
+    page, total = index.search('refunded purchases', limit=1)
+    assert total == 2
+    assert page[0][1]['id'] == 'refund'
+    second, _ = index.search('refunded purchases', limit=1, offset=1)
+    assert second[0][1]['id'] == 'digital'
+    assert index.search('nothing matches this', limit=5) == ([], 0)
+
+
+def test_category_filter():
+    page, total = build().search('refund', category='faqs')
+    assert total == 1 and page[0][1]['id'] == 'digital'
+
+
+def test_incremental_updates_match_a_rebuild():
+    index = build(drift=0.0)
+    index.search('refund')
+    index.remove(0)
+    index.add('Refunds for damaged items are immediate', 'policies', {'id': 'damaged'})
+
+    fresh = SearchIndex(drift=0.0)
+    for text, category, document in DOCUMENTS[1:]:
+        fresh.add(text, category, document)
+    fresh.add('Refunds for damaged items are immediate', 'policies', {'id': 'damaged'})
+
+    for query in ('refund', 'shipping days', 'digital purchase refund'):
+        got = [(score, document['id']) for score, document in index.search(query, limit=None)[0]]
+        want = [(score, document['id']) for score, document in fresh.search(query, limit=None)[0]]
+        assert got == want
+    assert len(index) == len(fresh)
+
+
+def test_mapped_index_matches(tmp_path):
+    index = build()
+    index.remove(1)
+    writer = SnapshotWriter()
+    index.write(writer, 'idx/')
+    writer.write(str(tmp_path / 'idx.bin'))
+    mapped = MappedSearchIndex(Snapshot(str(tmp_path / 'idx.bin')), 'idx/')
+
+    assert len(mapped) == len(index)
+    for query, category in (('refund purchase', None), ('shipping', None), ('refund', 'faqs')):
+        got, got_total = mapped.search(query, category, limit=3)
+        want, want_total = index.search(query, category, limit=3)
+        assert got_total == want_total
+        assert [document for _, document in got] == [document for _, document in want]
+        assert [score for score, _ in got] == pytest.approx([score for score, _ in want], abs=1e-3)
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from modules.slo_guard import SLOGuard
+
+
+def make_guard(**overrides):
+    settings = {'deadline_ms': 100, 'min_hedge_ms': 20, 'min_samples': 3, 'hedge_stages': ('answer',)}
+    return SLOGuard(**{**settings, **overrides})
+
+
+def call(guard, primary_delay, hedge_delay=0.0, primary_error=None):
+    async def primary():
+        await asyncio.sleep(primary_delay)
+        if primary_error:
+            raise primary_error
+        return 'primary'
+
+    async def hedge():
+        await asyncio.sleep(hedge_delay)
+        return 'hedge'
+
+    async def run():
+        result = await guard.call('answer', primary, hedge)
+        # Let the cancelled primary's done callback run
+        await asyncio.sleep(0.01)
+        return result
+
+    return asyncio.run(run())
+
+
+def test_fast_primary_is_not_hedged():
+    guard = make_guard()
+    assert call(guard, 0.0) == 'primary'
+    assert guard.get_stats()['hedged'] == 0
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    guard = make_guard()
+    assert call(guard, 1.0) == 'hedge'
+    stats = guard.get_stats()
+    assert stats['hedged'] == 1
+    assert stats['hedge_wins'] == 1
+    assert stats['primary_cancelled'] == 1
+
+
+def test_failed_primary_falls_back_to_hedge():
+    guard = make_guard()
+    assert call(guard, 0.06, hedge_delay=0.05, primary_error=RuntimeError('boom')) == 'hedge'
+
+
+def test_cancelled_primaries_keep_the_hedge_delay_from_drifting_down():
+    guard = make_guard()
+    for _ in range(5):
+        call(guard, 1.0)
+    samples = list(guard.primary_latency.samples['answer'])
+    assert len(samples) == 5
+    # Each cancelled primary ran at least as long as the delay that triggered the hedge
+    assert min(samples) >= 0.05
+    assert guard.hedge_delay('answer') >= 0.05
+
+
+def test_hedge_delay_uses_percentile_once_sampled():
+    guard = make_guard(min_samples=3)
+    assert guard.hedge_delay('answer') == pytest.approx(0.05)
+    for seconds in (0.2, 0.3, 0.4):
+        guard.primary_latency.record('answer', seconds)
+    assert guard.hedge_delay('answer') == pytest.approx(0.4)
+
+
+def test_stages_outside_hedge_stages_are_never_hedged():
+    guard = make_guard()
+
+    async def primary():
+        await asyncio.sleep(0.08)
+        return 'primary'
+
+    async def hedge():
+        return 'hedge'
+
+    assert asyncio.run(guard.call('analysis', primary, hedge)) == 'primary'
+    assert guard.get_stats()['hedged'] == 0
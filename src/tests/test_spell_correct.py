@@ -0,0 +1,182 @@
+import threading
+import pytest
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.context_analyzer import ContextAnalyzer
+from modules.kb_retriever import KnowledgeRetriever
+from modules.llm_backend import LocalBackend
+from modules.query_router import QueryRouter
+from modules.spell_correct import SpellCorrector, edit_distance, inflections, pattern_words, shared_corrector
+
+VOCABULARY = ['shipping', 'refund', 'password', 'account', 'payment', 'stock', 'delivery',
+              'charge', 'thank', 'subscription', 'warranty']
+
+
+@pytest.fixture
+def corrector():
+    corrector = SpellCorrector()
+    corrector.add_words(VOCABULARY, weight=10)
+    return corrector
+
+
+@pytest.mark.parametrize('typo, expected', [
+    ('shiping', 'shipping'),
+    ('refnd', 'refund'),
+    ('pasword', 'password'),
+    ('acount', 'account'),
+    ('paymnet', 'payment'),
+    ('subscriptoin', 'subscription'),
+    ('warrenty', 'warranty'),
+])
+def test_misspellings_are_corrected(corrector, typo, expected):
+    assert corrector.lookup(typo) == expected
+
+
+@pytest.mark.parametrize('word', ['stuck', 'thanks', 'delivered', 'charged', 'shipped', 'parcel', 'today'])
+def test_valid_english_words_are_left_alone(corrector, word):
+    assert corrector.lookup(word) == word
+
+
+def test_sentence_meaning_is_preserved(corrector):
+    assert corrector.correct("the parcel is still stuck") == "the parcel is still stuck"
+    assert corrector.correct("Thanks, it was delivered but I was charged twice") == \
+        "Thanks, it was delivered but I was charged twice"
+
+
+def test_only_misspelled_words_change(corrector):
+    assert corrector.correct("I need a refnd for SHIPING, asap!") == "I need a refund for shipping, asap!"
+
+
+def test_short_words_are_not_corrected(corrector):
+    # Four letters or fewer have too many valid neighbours
+    assert corrector.lookup('stok') == 'stok'
+
+
+def test_without_dictionary_valid_words_can_be_rewritten():
+    corrector = SpellCorrector(dictionary=None)
+    corrector.add_words(['stock'])
+    assert corrector.lookup('stuck') == 'stock'
+
+
+def test_vocabulary_inflections_are_known():
+    corrector = SpellCorrector(dictionary=None)
+    corrector.add_words(['refund'])
+    assert corrector.lookup('refunded') == 'refunded'
+
+
+def test_more_frequent_candidate_wins():
+    corrector = SpellCorrector(dictionary=None)
+    corrector.add_words({'berry': 1, 'merry': 5})
+    assert corrector.lookup('xerry') == 'merry'
+
+
+def test_stats_and_intent_changes(corrector):
+    corrector.correct("refnd please")
+    corrector.correct("hello")
+    corrector.record_intent('router', True)
+    corrector.record_intent('router', False)
+    stats = corrector.get_stats()
+    assert stats['messages'] == 2
+    assert stats['corrected_messages'] == 1
+    assert stats['words_corrected'] == 1
+    assert stats['intent_changes'] == {'router': {'checks': 2, 'changed': 1, 'change_rate': 0.5}}
+
+
+def test_disabled_corrector_is_a_no_op():
+    corrector = SpellCorrector(enabled=False)
+    corrector.add_words(['refund'])
+    assert corrector.correct("refnd") == "refnd"
+
+
+def test_context_analyzer_detects_intent_through_typos(corrector):
+    analyzer = ContextAnalyzer(spelling=corrector)
+    assert analyzer.analyze("I forgot my pasword")['intent'] == 'account'
+    assert corrector.get_stats()['intent_changes']['context']['changed'] == 1
+
+
+def test_shared_corrector_is_one_instance():
+    assert shared_corrector() is shared_corrector()
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance('paymnet', 'payment', 2) == 1
+    assert edit_distance('abc', 'xyz', 1) == 2
+
+
+def test_inflections_double_short_stems():
+    assert {'shipped', 'shipping', 'ships'} <= inflections('ship')
+    assert 'shiping' not in inflections('ship')
+    assert {'charged', 'charging'} <= inflections('charge')
+
+
+def test_pattern_words_skip_regex_escapes():
+    assert pattern_words(r"\b(hello|hi|good\s*morning)\b") == ['hello', 'hi', 'good', 'morning']
+
+
+@pytest.mark.parametrize('typo, expected', [('recieve', 'receive'), ('brokn', 'broken'), ('cancle', 'cancel')])
+def test_support_words_are_corrected_without_a_knowledge_base(typo, expected):
+    assert SpellCorrector().lookup(typo) == expected
+
+
+def test_replacing_a_layer_drops_removed_words():
+    corrector = SpellCorrector(dictionary=None, support_words=None)
+    corrector.set_words('kb', ['warranty', 'gift', 'wrapping'])
+    assert corrector.lookup('warrenty') == 'warranty'
+    corrector.set_words('kb', ['gift', 'wrapping'])
+    assert corrector.lookup('warrenty') == 'warrenty'
+    assert corrector.lookup('warranties') == 'warranties' and 'warranties' not in corrector.inflected
+    assert not any('warranty' in words for words in corrector.deletes.values())
+
+
+def test_reloading_a_layer_keeps_frequencies():
+    corrector = SpellCorrector(dictionary=None, support_words=None)
+    corrector.add_words(['refund'], weight=10)
+    for _ in range(3):
+        corrector.set_words('kb', ['refund', 'refund'])
+    assert corrector.frequencies['refund'] == 12
+    corrector.set_words('kb', [])
+    assert corrector.frequencies['refund'] == 10
+
+
+def test_tenants_do_not_share_vocabulary():
+    def bot(faqs):
+        company = {'name': 'Acme', 'faqs': faqs, 'cache': {'enabled': False}, 'telemetry': {'trace_path': None}}
+        return AICustomerServiceBot(company, backend=LocalBackend())
+
+    first = bot([{'question': 'Is the zorblax waterproof?', 'answer': 'Yes.'}])
+    second = bot([])
+    assert first.spelling.lookup('zorblaq') == 'zorblax'
+    assert second.spelling.lookup('zorblaq') == 'zorblaq'
+    first.reload_knowledge_base(dict(first.company_data, faqs=[]))
+    assert first.spelling.lookup('zorblaq') == 'zorblaq'
+
+
+def test_lookups_during_vocabulary_updates(corrector):
+    errors = []
+
+    def update():
+        for i in range(200):
+            corrector.set_words('kb', ['warranty'] if i % 2 else ['shipping', 'warranty'])
+
+    def read():
+        try:
+            for _ in range(2000):
+                corrector.cache = {}
+                assert corrector.lookup('warrenty') == 'warranty'
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_router_and_analyzer_count_intents_separately(corrector):
+    router = QueryRouter({'name': 'Acme'}, KnowledgeRetriever(), spelling=corrector)
+    analyzer = ContextAnalyzer(spelling=corrector)
+    router.route("I forgot my pasword")
+    analyzer.analyze("I forgot my pasword")
+    changes = corrector.get_stats()['intent_changes']
+    assert changes['router']['checks'] == 1 and changes['context']['checks'] == 1
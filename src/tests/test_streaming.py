@@ -0,0 +1,51 @@
+import asyncio
+import json
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.llm_backend import LocalBackend
+
+COMPANY = {'name': 'Acme', 'support_email': 'help@acme.test', 'cache': {'enabled': False},
+           'telemetry': {'trace_path': None}}
+QUESTION = "My order arrived broken, what are my options?"
+
+
+def frames(bot, message, user_id='u1'):
+    async def scenario():
+        return [frame async for frame in bot.stream_response(message, user_id)]
+    return asyncio.run(scenario())
+
+
+def test_tokens_then_one_final_frame():
+    result = frames(AICustomerServiceBot(COMPANY, backend=LocalBackend()), QUESTION)
+    types = [frame['type'] for frame in result]
+    assert types[-1] == 'final' and types.count('final') == 1
+    assert types.count('token') > 1
+    text = ''.join(frame['content'] for frame in result if frame['type'] == 'token')
+    assert text.strip() == result[-1]['data']['response']
+
+
+def test_routed_answers_stream_as_one_token():
+    result = frames(AICustomerServiceBot(COMPANY, backend=LocalBackend()), "hello")
+    assert [frame['type'] for frame in result] == ['token', 'final']
+    assert result[-1]['data']['routed'] == 'template'
+
+
+def test_backend_failure_streams_the_fallback():
+    bot = AICustomerServiceBot(dict(COMPANY, llm_client={'max_retries': 0}), backend=LocalBackend(failure_rate=1.0))
+    result = frames(bot, QUESTION)
+    final = result[-1]['data']
+    assert final['fallback']
+    assert result[-2] == {'type': 'token', 'content': final['response']}
+
+
+def test_sse_endpoint_sends_tokens_and_done(web):
+    response = web.app.test_client().post('/api/chat', json={'message': QUESTION, 'stream': True})
+    assert response.mimetype == 'text/event-stream'
+    events = [block.split('\n') for block in response.get_data(as_text=True).strip().split('\n\n')]
+    names = [lines[0].split(': ', 1)[1] for lines in events]
+    assert names[-1] == 'done' and 'token' in names
+    done = json.loads(events[-1][1].split(': ', 1)[1])
+    tokens = ''.join(json.loads(lines[1].split(': ', 1)[1])['content'] for lines in events[:-1])
+    assert tokens.strip() == done['response']
+    # The server closes the response once the body is sent, which releases the request id
+    response.close()
+    assert web.active_requests == {}
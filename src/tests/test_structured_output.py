@@ -0,0 +1,85 @@
+import json
+import pytest
+from modules.structured_output import (
+    ANALYSIS_SCHEMA, ANSWER_SCHEMA, SUGGESTIONS_SCHEMA, StructuredOutputError, StructuredOutputParser,
+    close_partial_json, coerce, loads_tolerant
+)
+
+
+@pytest.mark.parametrize('text', [
+    '```json\n{"response": "Hi", "confidence": 0.9}\n```',
+    'Sure! Here is the JSON: {"response": "Hi", "confidence": 0.9} Let me know if you need more.',
+    '{"response": "Hi", "confidence": 0.9,}',
+    "{'response': 'Hi', 'confidence': 0.9}",
+    '{“response”: “Hi”, “confidence”: 0.9}',
+    '{"response": "Hi", "confidence": 0.9, "related_info": [',
+])
+def test_common_slips_are_recovered(text):
+    value, recovered = loads_tolerant(text)
+    assert recovered
+    assert value['response'] == 'Hi' and value['confidence'] == 0.9
+
+
+def test_clean_json_is_not_marked_recovered():
+    assert loads_tolerant('{"a": 1}') == ({'a': 1}, False)
+
+
+def test_prose_is_not_recoverable():
+    with pytest.raises(StructuredOutputError):
+        loads_tolerant("I'm sorry, I can't help with that.")
+
+
+def test_truncated_streams_are_closed():
+    assert json.loads(close_partial_json('{"response": "Your order is on its w')) == {
+        'response': 'Your order is on its w'
+    }
+    assert json.loads(close_partial_json('{"a": [1, 2], "b":')) == {'a': [1, 2]}
+    assert json.loads(close_partial_json('{"a": 1, "unfinished')) == {'a': 1}
+
+
+def test_answer_fields_are_coerced():
+    result = coerce({'Response': 'Done', 'confidence': 'high', 'status': 'Solved',
+                     'relatedInfo': 'see FAQ'}, ANSWER_SCHEMA)
+    assert result['response'] == 'Done'
+    assert result['confidence'] == 0.9
+    assert result['status'] == 'resolved'
+    assert result['related_info'] == ['see FAQ']
+    assert result['topic'] == 'general_inquiry'
+
+
+@pytest.mark.parametrize('value, expected', [('85%', 0.85), (85, 0.85), ('0.3', 0.3), (True, 0.7), ('sure', 0.7)])
+def test_confidence_values(value, expected):
+    assert coerce({'response': 'x', 'confidence': value}, ANSWER_SCHEMA)['confidence'] == expected
+
+
+def test_missing_required_field_fails():
+    with pytest.raises(StructuredOutputError):
+        coerce({'topic': 'billing'}, ANSWER_SCHEMA)
+
+
+def test_analysis_defaults_fill_gaps():
+    result = coerce([{'primaryIntent': 'refund'}], ANALYSIS_SCHEMA)
+    assert result['primary_intent'] == 'refund'
+    assert result['sentiment'] == 'neutral' and result['secondary_intents'] == []
+
+
+def test_plain_text_suggestions_are_used():
+    parser = StructuredOutputParser()
+    text = "1. Track my order\n2. Change my address\n- Talk to someone\n* Cancel it"
+    assert parser.parse('suggestions', text, SUGGESTIONS_SCHEMA) == [
+        'Track my order', 'Change my address', 'Talk to someone'
+    ]
+
+
+def test_parser_counts_outcomes():
+    parser = StructuredOutputParser()
+    parser.parse('answer', '{"response": "a"}', ANSWER_SCHEMA)
+    parser.parse('answer', '```json\n{"response": "b"}\n```', ANSWER_SCHEMA)
+    with pytest.raises(StructuredOutputError):
+        parser.parse('answer', 'no json here', ANSWER_SCHEMA)
+    parser.record_repair('answer', ok=True)
+
+    stats = parser.get_stats()
+    assert stats['stages']['answer'] == {'clean': 1, 'recovered': 1, 'failed': 1, 'repair_calls': 1, 'repaired': 1}
+    assert stats['parsed'] == 3
+    assert stats['repair_success_rate'] == 1.0
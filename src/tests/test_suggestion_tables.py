@@ -0,0 +1,25 @@
+from ai_enhanced_bot import SERVICE_WORKFLOWS
+from build_suggestion_tables import AGENT_ACTIONS, build_tables, workflow_suggestions
+from modules.suggestion_tables import SuggestionTables
+
+
+def test_default_table_loads_from_any_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tables = SuggestionTables()
+    assert tables.version is not None
+    assert tables.lookup('Technical Support')
+
+
+def test_agent_steps_are_not_suggested():
+    workflows = workflow_suggestions(SERVICE_WORKFLOWS)
+    assert workflows['refund_request'] == ['Check refund eligibility']
+    assert workflows['technical_support'] == ['Try basic troubleshooting']
+
+    tables, _ = build_tables(iter([]), workflows, {'technical_support': ['Check system status']})
+    assert 'Escalate if needed' not in tables['technical_support']
+
+
+def test_shipped_table_has_no_agent_steps():
+    tables = SuggestionTables()
+    for suggestions in tables.tables.values():
+        assert not any(suggestion.lower().startswith(AGENT_ACTIONS) for suggestion in suggestions)
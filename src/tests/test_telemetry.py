@@ -0,0 +1,65 @@
+import asyncio
+import json
+from ai_enhanced_bot import AICustomerServiceBot
+from modules.llm_backend import LocalBackend
+from modules.telemetry import Histogram, Telemetry
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    histogram = Histogram(buckets=(10, 100))
+    for value in (1, 2, 3, 50, 500):
+        histogram.observe(value)
+    assert histogram.percentile(50) == 10
+    assert histogram.percentile(80) == 100
+    assert histogram.percentile(99) == '+Inf'
+    assert histogram.snapshot()['buckets'] == {'10': 3, '100': 1, '+Inf': 1}
+    assert Histogram().percentile(50) is None
+
+
+def test_record_call_totals_tokens_cost_and_errors():
+    telemetry = Telemetry(trace_path=None, prices={'gpt-4': (0.03, 0.06)})
+    telemetry.record_call('analysis', 'gpt-4', 0.002, 0.4, prompt_tokens=1000, completion_tokens=500)
+    telemetry.record_call('analysis', 'gpt-4', 0.001, 0.1, attempts=3, error='timeout')
+    stats = telemetry.get_stats()
+    assert stats['usage']['analysis:gpt-4'] == {'calls': 2, 'prompt_tokens': 1000, 'completion_tokens': 500,
+                                                'errors': 1, 'cost_usd': 0.06}
+    assert stats['histograms']['network_ms:analysis']['count'] == 2
+    assert stats['histograms']['queue_wait_ms:analysis']['p95_ms'] == 5
+
+    metrics = telemetry.render_prometheus()
+    assert 'bot_network_ms_bucket{stage="analysis",le="500"} 2' in metrics
+    assert 'bot_network_ms_count{stage="analysis"} 2' in metrics
+    assert 'bot_llm_errors_total{stage="analysis",model="gpt-4"} 1' in metrics
+    assert 'bot_llm_cost_usd_total{stage="analysis",model="gpt-4"} 0.06' in metrics
+
+
+def test_spans_are_collected_only_inside_a_trace(tmp_path):
+    path = tmp_path / 'traces' / 'llm.jsonl'
+    telemetry = Telemetry(trace_path=str(path))
+    telemetry.record_call('analysis', 'gpt-4', 0, 0.1)
+    trace = telemetry.start_trace('chat', 42)
+    telemetry.record_call('response', 'gpt-4', 0.01, 0.2, prompt_tokens=12)
+    telemetry.record_parse('response', 0.001)
+    telemetry.finish_trace(trace, tier='llm')
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 1
+    record = records[0]
+    assert record['kind'] == 'chat' and record['user_id'] == '42' and record['tier'] == 'llm'
+    assert [span['span'] for span in record['spans']] == ['llm_call', 'parse']
+    assert record['spans'][0]['prompt_tokens'] == 12 and 'offset_ms' in record['spans'][0]
+    assert not any(key.startswith('_') for key in record)
+    assert telemetry.get_stats()['histograms']['request_ms:chat']['count'] == 1
+
+
+def test_bot_writes_one_trace_per_request(tmp_path):
+    path = tmp_path / 'llm_traces.jsonl'
+    company = {'name': 'Acme', 'cache': {'enabled': False}, 'telemetry': {'trace_path': str(path)}}
+    bot = AICustomerServiceBot(company, backend=LocalBackend())
+    asyncio.run(bot.handle_complex_query("My order arrived broken, what are my options?", 'u1'))
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 1
+    calls = [span for span in records[0]['spans'] if span['span'] == 'llm_call']
+    assert calls and all(span['error'] is None for span in calls)
+    assert bot.telemetry.get_stats()['histograms']['request_ms:chat']['count'] == 1
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from modules.kb_snapshot import Snapshot, SnapshotWriter
+from modules.vector_index import VectorIndex
+
+FAQS = [
+    ('How do I return a product for a refund?', 'faqs', {'id': 'return'}),
+    ('How long does shipping take?', 'faqs', {'id': 'shipping'}),
+    ('I forgot my password and cannot log in', 'faqs', {'id': 'password'}),
+    ('How much does the Pro plan cost?', 'faqs', {'id': 'price'}),
+    ('The app crashes when I open it', 'troubleshooting', {'id': 'crash'}),
+]
+
+
+def build(**settings):
+    index = VectorIndex(**settings)
+    index.build(FAQS)
+    return index
+
+
+def ids(results):
+    return [document['id'] for _, document in results]
+
+
+@pytest.mark.parametrize('dtype', ['float32', 'int8'])
+@pytest.mark.parametrize('query, expected', [
+    ('can I send it back and get my money back', 'return'),
+    ('when will my delivery arrive', 'shipping'),
+    ("I'm locked out of my account", 'password'),
+    ('what are your fees', 'price'),
+    ('the app is not working', 'crash'),
+    ('pasword reset', 'password'),
+])
+def test_paraphrases_find_the_right_entry(dtype, query, expected):
+    score, document = build(dtype=dtype).search(query, k=1)[0]
+    assert document['id'] == expected
+    assert 0 < score <= 1.0001
+
+
+def test_embeddings_are_normalized_and_deterministic():
+    index = build()
+    vectors = index.embed(['refund please', 'refund please'])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[1])
+
+
+def test_int8_scores_track_float32():
+    exact, quantized = build(), build(dtype='int8')
+    queries = [text for text, _, _ in FAQS]
+    assert np.allclose(quantized.similarities(quantized.embed(queries)),
+                       exact.similarities(exact.embed(queries)), atol=0.02)
+    assert quantized.memory_bytes < exact.memory_bytes
+
+
+def test_category_and_min_score_filters():
+    index = build()
+    assert [d['id'] for _, d in index.search('app crashes', k=5, category='troubleshooting')] == ['crash']
+    assert index.search('zebra xylophone', k=5, min_score=0.5) == []
+
+
+def test_removed_rows_are_never_returned():
+    index = build()
+    index.remove([2])
+    assert len(index) == 4
+    assert list(index.live_rows()) == [0, 1, 3, 4]
+    assert all(d['id'] != 'password' for _, d in index.search('forgot my password', k=5))
+    assert np.isneginf(index.similarities(index.embed(['password']))[0, 2])
+
+
+def test_added_items_are_searchable():
+    index = build()
+    rows = index.add([('Do you offer gift wrapping?', 'faqs', {'id': 'gift'})])
+    assert rows == [5]
+    assert index.search('gift wrapping', k=1)[0][1]['id'] == 'gift'
+
+
+def test_row_vectors_are_normalized():
+    index = build(dtype='int8')
+    vectors = index.row_vectors(np.arange(len(FAQS)))
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=0.02)
+
+
+def test_search_batch_ranks_like_single_searches():
+    index = build()
+    queries = ['refund', 'shipping time', 'login problem']
+    assert [ids(results) for results in index.search_batch(queries, k=2)] == [
+        ids(index.search(query, k=2)) for query in queries
+    ]
+
+
+def test_loaded_index_matches(tmp_path):
+    index = build(dtype='int8')
+    index.remove([0])
+    writer = SnapshotWriter()
+    index.write(writer, 'vec/')
+    writer.write(str(tmp_path / 'vec.bin'))
+    loaded = VectorIndex.load(Snapshot(str(tmp_path / 'vec.bin')), 'vec/')
+
+    assert len(loaded) == 4
+    for query in ('how much is it', 'my parcel is late', 'faulty app'):
+        assert ids(loaded.search(query, k=3)) == ids(index.search(query, k=3))
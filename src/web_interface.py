@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context
 from flask_socketio import SocketIO, emit
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from ai_enhanced_bot import AICustomerServiceBot
@@ -8,6 +8,9 @@ import os
 from dotenv import load_dotenv
 import logging
 import asyncio
+import concurrent.futures
+import threading
+import uuid
 from typing import Dict, Optional
 import sqlite3
 from functools import wraps
@@ -45,6 +48,42 @@ except Exception as e:
     company_data = {}
     bot = None
 
+# Shared event loop for bot coroutines, so request threads can drive
+# async generators and background work outlives a single request
+bot_loop = asyncio.new_event_loop()
+threading.Thread(target=bot_loop.run_forever, daemon=True).start()
+
+def run_async(coro, owner=None):
+    """Run a coroutine on the bot loop and wait for its result; owned work can be cancelled"""
+    if owner is not None:
+        coro = bot.cancellation.run(owner, coro)
+    return asyncio.run_coroutine_threadsafe(coro, bot_loop).result()
+
+def iterate_async(agen, owner=None):
+    """Iterate an async generator from a synchronous request thread"""
+    try:
+        while True:
+            try:
+                yield run_async(agen.__anext__(), owner)
+            except StopAsyncIteration:
+                break
+    finally:
+        # Client went away or iteration finished: close the generator on its loop
+        run_async(agen.aclose())
+
+def save_chat(user_id, message, response):
+    with sqlite3.connect('chat.db') as conn:
+        c = conn.cursor()
+        c.execute('''INSERT INTO chat_history 
+                    (user_id, message, response, timestamp) 
+                    VALUES (?, ?, ?, ?)''',
+                 (user_id, message, json.dumps(response),
+                  datetime.now()))
+        conn.commit()
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # Database setup
 def init_db():
     with sqlite3.connect('chat.db') as conn:
@@ -164,7 +203,7 @@ def analytics():
 
 # API Routes
 @app.route('/api/chat', methods=['POST'])
-async def chat_api():
+def chat_api():
     try:
         data = request.json
         user_id = current_user.id if current_user.is_authenticated else 'anonymous'
@@ -172,28 +211,120 @@ async def chat_api():
         # Log incoming message
         logger.info(f"Incoming message from {user_id}: {data['message']}")
         
+        # Clients may name the request so they can cancel it (POST /api/chat/<id>/cancel);
+        # only the session that started it may do so
+        request_id = str(data.get('request_id') or uuid.uuid4().hex)
+        client_id = client_key()
+        if not claim_request(request_id, client_id):
+            return jsonify({"error": "Request id already in use", "request_id": request_id}), 409
+        owner = request_owner_key(client_id, request_id)
+        
+        # Stream tokens as Server-Sent Events when the client asks for it
+        if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+            response = Response(
+                stream_with_context(stream_chat(data['message'], user_id, request_id, owner)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                         'X-Request-Id': request_id}
+            )
+            # Runs even if the body is never iterated, so the request id can't leak
+            response.call_on_close(lambda: release_request(request_id, owner))
+            return response
+        
         # Generate response
-        response = await bot.handle_complex_query(
-            data['message'],
-            user_id,
-            data.get('context')
-        )
+        try:
+            response = run_async(bot.handle_complex_query(
+                data['message'],
+                user_id,
+                data.get('context')
+            ), owner=owner)
+        except concurrent.futures.CancelledError:
+            return jsonify({"error": "Request cancelled", "request_id": request_id}), 499
+        finally:
+            release_request(request_id, owner)
         
         # Save to database
-        with sqlite3.connect('chat.db') as conn:
-            c = conn.cursor()
-            c.execute('''INSERT INTO chat_history 
-                        (user_id, message, response, timestamp) 
-                        VALUES (?, ?, ?, ?)''',
-                     (user_id, data['message'], json.dumps(response),
-                      datetime.now()))
-            conn.commit()
+        save_chat(user_id, data['message'], response)
         
         return jsonify(response)
     except Exception as e:
         logger.error(f"Error in chat API: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def stream_chat(message, user_id, request_id, owner):
+    """Forward streamed tokens as SSE 'token' events, then a trailing 'done' event"""
+    finished = False
+    try:
+        for frame in iterate_async(bot.stream_response(message, user_id), owner):
+            if frame['type'] == 'token':
+                yield sse_event('token', {'content': frame['content']})
+            else:
+                save_chat(user_id, message, frame['data'])
+                yield sse_event('done', frame['data'])
+        finished = True
+    except concurrent.futures.CancelledError:
+        yield sse_event('cancelled', {'request_id': request_id})
+    finally:
+        if not finished:
+            # The client hung up mid-stream: stop everything still running for it
+            bot_loop.call_soon_threadsafe(bot.cancel_requests, owner)
+
+# request id -> client session that started it
+active_requests = {}
+active_requests_lock = threading.Lock()
+
+def client_key():
+    """Id of the calling browser session; the session cookie is signed, so it can't be forged"""
+    if 'client_id' not in session:
+        session['client_id'] = uuid.uuid4().hex
+    return session['client_id']
+
+def claim_request(request_id, client_id):
+    """Reserve a request id; an id already in flight is refused, even for the same session"""
+    with active_requests_lock:
+        if request_id in active_requests:
+            return False
+        active_requests[request_id] = client_id
+        return True
+
+def release_request(request_id, owner):
+    with active_requests_lock:
+        active_requests.pop(request_id, None)
+    if bot is not None:
+        # Queued after any cancel for this owner, so the id is clean for its next use
+        bot_loop.call_soon_threadsafe(bot.cancellation.forget, owner)
+
+def request_owner_key(client_id, request_id):
+    return f"http:{client_id}:{request_id}"
+
+@app.route('/api/chat/<request_id>/cancel', methods=['POST'])
+def cancel_chat(request_id):
+    """Let a client abort a request it no longer needs, e.g. when the user navigates away"""
+    if bot is None:
+        return jsonify({"error": "Bot not initialized"}), 503
+    client_id = client_key()
+    with active_requests_lock:
+        started_by = active_requests.get(request_id)
+    if started_by is None:
+        return jsonify({"error": "Unknown or finished request", "request_id": request_id}), 404
+    if started_by != client_id:
+        return jsonify({"error": "Not your request", "request_id": request_id}), 403
+    cancelled = run_async(cancel_owned(request_owner_key(client_id, request_id)))
+    return jsonify({"request_id": request_id, "cancelled": cancelled})
+
+async def cancel_owned(owner):
+    return bot.cancel_requests(owner)
+
+@app.route('/api/chat/enrichment/<response_id>')
+def chat_enrichment(response_id):
+    """Follow-up poll for suggestions and related info computed after the answer"""
+    if bot is None:
+        return jsonify({"error": "Bot not initialized"}), 503
+    enrichment = bot.get_enrichment(response_id)
+    if enrichment is None:
+        return jsonify({"error": "Unknown response id"}), 404
+    return jsonify(enrichment)
+
 @app.route('/api/feedback', methods=['POST'])
 @login_required
 def feedback():
@@ -211,6 +342,32 @@ def feedback():
         logger.error(f"Error saving feedback: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/metrics')
+def metrics():
+    if bot is None:
+        return jsonify({"error": "Bot not initialized"}), 503
+    return jsonify(bot.get_metrics())
+
+@app.route('/api/kb/reload', methods=['POST'])
+@admin_required
+def reload_knowledge_base():
+    """Apply edits to company_config.json without restarting"""
+    if bot is None:
+        return jsonify({"error": "Bot not initialized"}), 503
+    try:
+        with open('company_config.json', 'r') as f:
+            return jsonify(bot.reload_knowledge_base(json.load(f)))
+    except Exception as e:
+        logger.error(f"Error reloading knowledge base: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Model call histograms and token/cost counters in Prometheus text format"""
+    if bot is None:
+        return Response("bot not initialized\n", status=503, mimetype='text/plain')
+    return Response(bot.telemetry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 # Socket.IO events
 @socketio.on('connect')
 def handle_connect():
@@ -219,11 +376,42 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     logger.info(f"Client disconnected: {request.sid}")
+    # Model calls and background work for this connection would only be billed and dropped
+    if bot is not None:
+        bot_loop.call_soon_threadsafe(bot.cancel_requests, request.sid)
 
 @socketio.on('user_message')
 def handle_message(data):
-    response = bot.generate_response(data['message'])
-    emit('bot_response', {'message': response})
+    user_id = current_user.id if current_user.is_authenticated else request.sid
+    try:
+        stream_to_socket(data, user_id, request.sid)
+    except concurrent.futures.CancelledError:
+        logger.info(f"Response cancelled for disconnected client {request.sid}")
+
+def stream_to_socket(data, user_id, sid):
+    """Emit streamed tokens and the final frame for one Socket.IO message"""
+    for frame in iterate_async(bot.stream_response(data['message'], user_id), sid):
+        if frame['type'] == 'token':
+            emit('bot_response', {'chunk': frame['content'], 'done': False})
+        else:
+            # Trailing frame carries the full text plus structured fields
+            response = frame['data']
+            save_chat(user_id, data['message'], response)
+            emit('bot_response', {
+                'message': response.get('response', ''),
+                'suggestions': response.get('suggestions', []),
+                'status': response.get('status'),
+                'data': response,
+                'done': True
+            })
+            if response.get('enrichment') == 'pending' or response.get('completion') == 'pending':
+                socketio.start_background_task(push_enrichment, sid, response['response_id'])
+
+def push_enrichment(sid, response_id):
+    """Send background enrichment to the client once it is ready"""
+    enrichment = run_async(bot.wait_for_enrichment(response_id))
+    if enrichment:
+        socketio.emit('bot_enrichment', enrichment, to=sid)
 
 # Error handlers
 @app.errorhandler(404)